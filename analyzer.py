@@ -0,0 +1,176 @@
+"""
+This module maps inflected forms back to their dictionary lemmas.
+
+The full-form index is built by generating the paradigm of every noun (both animacy
+values) and verb in the lexicon, so analyzing a form is a single dictionary lookup.
+Forms are keyed with search_handler.fold_lemma, like dictionary lookups.
+
+Usage:
+    $ python analyzer.py khereskero
+"""
+
+import sys
+from collections import namedtuple
+
+from search_handler import fold_lemma, get_lexicon, sense_information, set_lexicon, shared_lock
+from declension import decline
+from verbs import generate_verb_paradigms, determine_conjugation_class, define_pres_root, define_perf_root
+
+# cell is a noun case (e.g. 'genitív') or a verb tense key (e.g. 'pres');
+# person is None for nouns, number is 'Singulár'/'Plurál' for nouns and 'sg'/'pl' for verbs.
+Analysis = namedtuple("Analysis", ["lemma", "cell", "person", "number"])
+
+ANIMACY_VALUES = ("životné", "neživotné")
+PERFECT_TENSES = ("perf", "cond_perf")
+
+
+class FormIndex:
+    """Index of inflected forms -> list of Analysis tuples."""
+
+    def __init__(self, forms=None):
+        # folded form -> list of Analysis; may be a read-only mapping (see mmap_index)
+        self._forms = {} if forms is None else forms
+
+    @classmethod
+    def from_lexicon(cls, lexicon):
+        """Build the index from every noun and single-word verb Sense of a Lexicon, homographs included."""
+        try:
+            senses = lexicon.indexes.senses
+        except ValueError:
+            # A Lexicon built from entries only knows the first Sense of every lemma
+            return cls.from_words(lexicon.words())
+        return cls.from_words(word for records in senses.values() for word in sense_words(records))
+
+    @classmethod
+    def from_words(cls, words):
+        """Build the index from word information dicts like those of Lexicon.words."""
+        index = cls()
+        for result in words:
+            index.add_word(result)
+        return index
+
+    def updated(self, removed=(), added=()):
+        """
+        Return a copy without the forms of removed and with those of added words (word
+        information dicts like those of Lexicon.words); this index is not changed.
+        """
+        forms = dict(self._forms)
+        for key, analyses in FormIndex.from_words(removed).items():
+            remaining = [analysis for analysis in forms.get(key, ()) if analysis not in analyses]
+            if remaining:
+                forms[key] = remaining
+            else:
+                forms.pop(key, None)
+        for key, analyses in FormIndex.from_words(added).items():
+            existing = forms.get(key, [])
+            forms[key] = existing + [analysis for analysis in analyses if analysis not in existing]
+        return FormIndex(forms)
+
+    def __len__(self):
+        return len(self._forms)
+
+    def items(self):
+        """Return (folded form, analyses) pairs."""
+        return self._forms.items()
+
+    def _add(self, form, analysis):
+        analyses = self._forms.setdefault(fold_lemma(form.rstrip("!")), [])
+        if analysis not in analyses:
+            analyses.append(analysis)
+
+    def add_word(self, result):
+        """Add the forms of a noun or single-word verb given as word information; other words are skipped."""
+        if result["part_of_speech"] == "noun":
+            self.add_noun(result["word"], result["gender"])
+        elif result["part_of_speech"] == "verb" and is_single_verb(result["word"]):
+            self.add_verb(result["word"])
+
+    def add_noun(self, word, gender):
+        """Add every case form of a noun, for both animacy values."""
+        for animacy in ANIMACY_VALUES:
+            paradigms = decline(word, gender, animacy)
+            for number, cases in paradigms.items():
+                for case, form in cases.items():
+                    self._add(form, Analysis(word, case, None, number))
+
+    def add_verb(self, verb):
+        """Add every conjugated form of a verb."""
+        conj_class = determine_conjugation_class(verb)
+        # Perfect forms of verbs with an unknown perfect root are not generated reliably
+        has_perf_root = define_perf_root(define_pres_root(verb, conj_class), conj_class) not in (None, "xxx")
+        for tense, persons in generate_verb_paradigms(verb).items():
+            if tense in PERFECT_TENSES and not has_perf_root:
+                continue
+            for person, numbers in persons.items():
+                for number, form in numbers.items():
+                    self._add(form, Analysis(verb, tense, person, number))
+
+    def analyze(self, form):
+        """Return every analysis of form, or an empty list when it is unknown."""
+        return list(self._forms.get(fold_lemma(form).rstrip("!"), ()))
+
+
+def sense_words(senses):
+    """Return the distinct word information dicts of indexed senses that have a posROM element."""
+    words = {}
+    for sense in senses:
+        result = sense_information(sense)
+        if result["part_of_speech"] is not None:
+            key = (result["word"], result["part_of_speech"], result["gender"])
+            words.setdefault(key, {"word": key[0], "part_of_speech": key[1], "gender": key[2]})
+    return list(words.values())
+
+
+def is_single_verb(word):
+    '''Return True if word is a single verb lemma (not a phrase)'''
+    return word.endswith("l") and " " not in word
+
+
+_form_index = None
+
+
+def get_form_index():
+    """Return the shared FormIndex, building it from the shared Lexicon on first use."""
+    global _form_index
+    with shared_lock:
+        if _form_index is not None:
+            return _form_index
+        lexicon = get_lexicon()
+    # Built without the lock, so searches are not held up meanwhile
+    form_index = FormIndex.from_lexicon(lexicon)
+    with shared_lock:
+        if _form_index is None and get_lexicon() is lexicon:
+            _form_index = form_index
+    return form_index
+
+
+def set_form_index(form_index):
+    """Replace the shared FormIndex, e.g. with one backed by a memory-mapped file."""
+    global _form_index
+    with shared_lock:
+        _form_index = form_index
+
+
+def publish(lexicon, removed=(), added=()):
+    """
+    Make lexicon the shared Lexicon and update the shared FormIndex, if it was built, for the
+    changed words (word information dicts); both are replaced at once under shared_lock.
+    """
+    global _form_index
+    with shared_lock:
+        current = _form_index
+    form_index = None if current is None else current.updated(removed, added)
+    with shared_lock:
+        # An index built meanwhile from the previous Lexicon is dropped and rebuilt on first use
+        _form_index = form_index if _form_index is current else None
+        set_lexicon(lexicon)
+
+
+def analyze(form):
+    """Return every (lemma, cell, person, number) analysis of an inflected form."""
+    return get_form_index().analyze(form)
+
+
+if __name__ == "__main__":
+    for analysis in analyze(sys.argv[1] if len(sys.argv) > 1 else "phraleske"):
+        print(analysis)
@@ -0,0 +1,156 @@
+"""
+This module tags running Roma text with the lemma and grammatical cell of every word.
+
+Text is read line by line and split into word tokens lazily; every token is looked up in
+the full-form index of analyzer, which holds the forms generated by nouns and verbs for
+every dictionary lemma. Annotations are produced by generators, so inputs of any size are
+annotated in constant memory; the analyses of recent tokens are kept in a bounded table, as
+running text repeats the same words over and over.
+
+With several workers, chunks of lines are annotated and formatted by worker processes and
+written in input order. The workers share the memory-mapped full-form index of mmap_index,
+which is built once (and rebuilt when the XML file changes) instead of in every worker.
+
+Usage:
+    $ python annotator.py text.txt -o annotations.jsonl --workers 4
+    $ cat text.txt | python annotator.py --format tsv
+    $ python annotator.py --examples          # the Example.Translation texts of SRO.xml
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+import analyzer
+from analyzer import get_form_index
+from batch import load_dictionary, ordered_map
+from mmap_index import ensure_indexes, load_form_index
+from xml_parser import iter_example_translations
+
+# Letters, optionally joined by an apostrophe or hyphen (e.g. "dikh-tuke")
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+DEFAULT_CHUNKSIZE = 1024
+TOKEN_CACHE_SIZE = 1 << 16  # Distinct tokens whose analyses are remembered; the table is emptied when full
+OUTPUT_FORMATS = ("jsonl", "tsv")
+
+# line is 1-based, column the 0-based offset of token in the line; analyses are analyzer.Analysis tuples
+Annotation = namedtuple("Annotation", ["line", "column", "token", "analyses"])
+
+
+def tokenize(line):
+    '''Yield (column, token) for every word of line.'''
+    for match in TOKEN_PATTERN.finditer(line):
+        yield match.start(), match.group()
+
+
+def annotate(lines, form_index=None, start=1):
+    '''
+    Yield an Annotation for every token of lines (any iterable of strings, e.g. a file).
+
+    Unknown tokens get no analyses. Lines are numbered from start.
+    '''
+    analyze = (form_index or get_form_index()).analyze
+    known = {}
+    for number, line in enumerate(lines, start):
+        for column, token in tokenize(line):
+            analyses = known.get(token)
+            if analyses is None:
+                if len(known) >= TOKEN_CACHE_SIZE:
+                    known.clear()
+                analyses = known[token] = tuple(analyze(token))
+            yield Annotation(number, column, token, analyses)
+
+
+def format_annotation(annotation, output_format="jsonl"):
+    '''Return an Annotation as a JSON line or as a tab-separated row (without the newline).'''
+    if output_format == "jsonl":
+        return json.dumps({
+            "line": annotation.line,
+            "column": annotation.column,
+            "token": annotation.token,
+            "analyses": [analysis._asdict() for analysis in annotation.analyses],
+        }, ensure_ascii=False)
+    analyses = ";".join(f"{lemma}|{cell}|{'' if person is None else person}|{number}"
+                        for lemma, cell, person, number in annotation.analyses)
+    return f"{annotation.line}\t{annotation.column}\t{annotation.token}\t{analyses or '_'}"
+
+
+def annotate_chunk(numbered_lines, output_format="jsonl"):
+    '''Return the formatted annotations of a chunk of (line number, line) pairs.'''
+    if not numbered_lines:
+        return []
+    # Chunks come from enumerate, so their line numbers are consecutive
+    return [format_annotation(annotation, output_format)
+            for annotation in annotate([line for _, line in numbered_lines], start=numbered_lines[0][0])]
+
+
+def _use_mapped_form_index(index_dir):
+    analyzer.set_form_index(load_form_index(index_dir))
+
+
+def annotated_lines(lines, output_format="jsonl", workers=1, chunksize=DEFAULT_CHUNKSIZE,
+                    xml_file_path=None, index_dir=None):
+    '''
+    Yield the formatted annotations of lines in input order.
+
+    With workers > 1 the memory-mapped full-form index in index_dir is brought up to date
+    and chunks of chunksize lines are annotated by a ProcessPoolExecutor.
+    '''
+    if workers <= 1:
+        load_dictionary(xml_file_path)
+        if xml_file_path is not None:
+            # Rebuilt from the Lexicon just loaded on first use
+            analyzer.set_form_index(None)
+        for annotation in annotate(lines):
+            yield format_annotation(annotation, output_format)
+        return
+    ensure_indexes(xml_file_path, index_dir)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_use_mapped_form_index,
+                             initargs=(index_dir,)) as executor:
+        yield from ordered_map(executor, partial(annotate_chunk, output_format=output_format),
+                               enumerate(lines, 1), chunksize, max_pending=2 * workers)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Tag Roma text with lemmas and grammatical cells.")
+    parser.add_argument("input", nargs="?", default="-", help="text file (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl", help="output format")
+    parser.add_argument("--examples", action="store_true",
+                        help="annotate the Example.Translation texts of the dictionary instead of input")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="lines submitted to a worker at once")
+    parser.add_argument("--xml", default=None, help="dictionary file (default: data/SRO.xml)")
+    parser.add_argument("--index-dir", default=None, help="directory of the memory-mapped indexes (default: data)")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    '''Annotate a text from the command line.'''
+    arguments = parse_arguments(argv)
+    if arguments.examples:
+        input_file = None
+        lines = iter_example_translations(arguments.xml)
+    else:
+        input_file = sys.stdin if arguments.input == "-" else open(arguments.input, encoding="utf-8")
+        lines = input_file
+    output_file = sys.stdout if arguments.output == "-" else open(arguments.output, "w", encoding="utf-8")
+    try:
+        for row in annotated_lines(islice(lines, arguments.limit), arguments.format, arguments.workers,
+                                   arguments.chunksize, arguments.xml, arguments.index_dir):
+            output_file.write(row + "\n")
+    finally:
+        if input_file not in (None, sys.stdin):
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+
+if __name__ == "__main__":
+    main()
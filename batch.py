@@ -0,0 +1,182 @@
+"""
+This module generates paradigms for a list of words from the command line.
+
+Words are read one per line from a file or stdin, resolved through the dictionary like
+in the user interface and their paradigms are written in input order, either as JSON
+lines or as the formatted text shown by the user interface. The work is split into
+chunks processed by a pool of worker processes.
+
+Usage:
+    $ python batch.py words.txt -o paradigms.jsonl --workers 4
+    $ cat words.txt | python batch.py --format text --animacy životné
+    $ python batch.py words.txt -o paradigms.jsonl --profile batch   # see profiling.py
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from search_handler import search_word, get_lexicon, set_lexicon, Lexicon
+from nouns import cached_noun_paradigms, format_noun_paradigms
+from paradigm_cache import thaw
+from verbs import verb_paradigms, format_verb_paradigms
+
+ANIMACY_CHOICES = ("neživotné", "životné")
+
+
+def paradigm_record(search_term, animacy="neživotné"):
+    '''
+    Resolve search_term through the dictionary and return a JSON-serializable record
+    with its word information and paradigms, or an "error" message.
+    '''
+    record = {"input": search_term}
+    search_results = search_word(search_term)
+    if not isinstance(search_results, dict):
+        record["error"] = search_results
+        return record
+
+    record.update(search_results)
+    word = search_results["word"]
+    part_of_speech = search_results["part_of_speech"]
+    paradigms = None
+    if part_of_speech == "množné":
+        record["error"] = "Ma ruš! No paradigms for plural forms available."
+        return record
+    elif part_of_speech == "noun":
+        record["animacy"] = animacy
+        paradigms = cached_noun_paradigms(word, search_results["gender"], animacy)
+    elif part_of_speech == "verb":
+        paradigms = verb_paradigms(word)
+
+    if paradigms is None:
+        record["error"] = f"Ma ruš! No paradigms for {word} available."
+    else:
+        record["paradigms"] = thaw(paradigms)
+    return record
+
+
+def paradigm_records(search_terms, animacy="neživotné"):
+    '''Return the paradigm records for a chunk of search terms.'''
+    return [paradigm_record(search_term, animacy) for search_term in search_terms]
+
+
+def format_record(record):
+    '''Format a paradigm record like the user interface does.'''
+    if "error" in record:
+        return f"{record['input']}: {record['error']}\n"
+    paradigms = record["paradigms"]
+    if record["part_of_speech"] == "noun":
+        body = ("Singulár:\n\n" + format_noun_paradigms(paradigms["Singulár"])
+                + "\n\nPlurál:\n\n" + format_noun_paradigms(paradigms["Plurál"]))
+    else:
+        body = format_verb_paradigms(paradigms)
+    return f"{record['word']}\n\n{body}\n"
+
+
+def ordered_map(executor, function, items, chunksize=64, max_pending=8):
+    '''
+    Apply function to chunks of items on executor and yield the results in input order.
+
+    function receives a list of up to chunksize items and returns a list of results.
+    At most max_pending chunks are submitted at a time, so items can be a stream.
+    '''
+    iterator = iter(items)
+    pending = deque()
+    while True:
+        while len(pending) < max_pending:
+            chunk = list(islice(iterator, chunksize))
+            if not chunk:
+                break
+            pending.append(executor.submit(function, chunk))
+        if not pending:
+            return
+        yield from pending.popleft().result()
+
+
+def load_dictionary(xml_file_path=None):
+    '''Load the shared Lexicon, from xml_file_path if given.'''
+    if xml_file_path is None:
+        get_lexicon()
+    else:
+        set_lexicon(Lexicon.load(xml_file_path))
+
+
+def generate_records(search_terms, animacy="neživotné", workers=None, chunksize=64, xml_file_path=None):
+    '''
+    Yield paradigm records for search_terms in input order.
+
+    With workers > 1 the chunks are processed by a ProcessPoolExecutor; each worker
+    loads the dictionary once when it starts.
+    '''
+    workers = workers or os.cpu_count() or 1
+    function = partial(paradigm_records, animacy=animacy)
+    if workers == 1:
+        load_dictionary(xml_file_path)
+        for search_term in search_terms:
+            yield paradigm_record(search_term, animacy)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_dictionary,
+                             initargs=(xml_file_path,)) as executor:
+        yield from ordered_map(executor, function, search_terms, chunksize, max_pending=2 * workers)
+
+
+def read_search_terms(input_file):
+    '''Yield the non-empty, stripped lines of input_file.'''
+    for line in input_file:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Roma paradigms for a list of words.")
+    parser.add_argument("input", nargs="?", default="-", help="file with one word per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=("jsonl", "text"), default="jsonl", help="output format")
+    parser.add_argument("--animacy", choices=ANIMACY_CHOICES, default="neživotné", help="animacy used for nouns")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64, help="words submitted to a worker at once")
+    parser.add_argument("--xml", default=None, help="dictionary file (default: data/SRO.xml)")
+    parser.add_argument("--profile", default=None, metavar="PREFIX",
+                        help="profile the run and write PREFIX.txt, .prof, .collapsed and .heap "
+                             "(uses one worker unless --workers is given)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    '''Run the batch generation from the command line.'''
+    arguments = parse_arguments(argv)
+    input_file = sys.stdin if arguments.input == "-" else open(arguments.input, encoding="utf-8")
+    output_file = sys.stdout if arguments.output == "-" else open(arguments.output, "w", encoding="utf-8")
+    profiler = None
+    if arguments.profile:
+        from profiling import Profiler
+        # Only this process is profiled, so generate the paradigms in it by default
+        arguments.workers = arguments.workers or 1
+        profiler = Profiler().start()
+    try:
+        records = generate_records(read_search_terms(input_file), arguments.animacy,
+                                   arguments.workers, arguments.chunksize, arguments.xml)
+        for record in records:
+            if arguments.format == "jsonl":
+                output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                output_file.write(format_record(record) + "\n")
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            paths = profiler.save(arguments.profile)
+            print(f"Profile written to {', '.join(paths)}", file=sys.stderr)
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+This module measures the speed and memory use of the paradigm generator.
+
+Each benchmark is timed over several repeats (the number of calls per repeat is calibrated
+so a repeat takes at least min_time seconds) and its peak memory is measured with
+tracemalloc. Benchmarks that depend on the dictionary size run once per size, on
+dictionaries scaled from the bundled SRO.xml, or on synthetic dictionaries of that many
+senses (see synthetic_sro.py). Results are saved as JSON and can be compared against a
+saved baseline to spot regressions.
+
+Usage:
+    $ python benchmark.py -o baseline.json
+    $ python benchmark.py --baseline baseline.json --sizes 100 1000
+    $ python benchmark.py --synthetic 0 --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+from search_handler import Lexicon, set_lexicon, search_word
+from nouns import generate_obliquus, generate_noun_paradigms, format_noun_paradigms
+from verbs import generate_verb_paradigms, process_verb, format_verb_paradigms
+from synthetic_sro import generate_sro
+from xml_parser import default_xml_path, parse_xml_data
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_THRESHOLD = 0.2
+NOUNS = [("phral", "masculine"), ("džuvľi", "feminine"), ("kher", "masculine"), ("čhaj", "feminine"),
+         ("lavutaris", "masculine"), ("kamiben", "masculine"), ("mas", "other"), ("voďi", "feminine")]
+VERBS = ["dikhel", "kamel", "chuťel", "xal", "pijol", "phendel", "dživel", "sikhľol"]
+PHRASES = ["dikhel pes", "kerel buti", "asal pes", "phenel čačipen"]
+
+Benchmark = namedtuple("Benchmark", ["name", "sized", "setup"])
+Result = namedtuple("Result", ["name", "size", "calls", "repeat", "best", "median", "peak_memory"])
+
+
+def _letters(number):
+    # 0 -> 'a', 25 -> 'z', 26 -> 'ba', ... (suffixes that keep generated lemmas alphabetic)
+    letters = ""
+    while True:
+        number, remainder = divmod(number, 26)
+        letters = chr(ord("a") + remainder) + letters
+        if number == 0:
+            return letters
+
+
+def scaled_xml(size, directory, xml_file_path=None):
+    '''
+    Write a dictionary with size Lemma elements to directory and return its path.
+
+    Lemmas of xml_file_path are repeated in turn; copies get an alphabetic suffix on
+    their lemmaROM so every lemma stays unique.
+    '''
+    source = ET.parse(xml_file_path or default_xml_path()).getroot()
+    lemmas = source.findall("Lemma")
+    root = ET.Element(source.tag)
+    for index in range(size):
+        lemma = ET.fromstring(ET.tostring(lemmas[index % len(lemmas)]))
+        copy = index // len(lemmas)
+        if copy:
+            for lemma_rom in lemma.iter("lemmaROM"):
+                lemma_rom.text = (lemma_rom.text or "").rstrip() + _letters(copy)
+        root.append(lemma)
+    file_path = os.path.join(directory, f"SRO.{size}.xml")
+    ET.ElementTree(root).write(file_path, encoding="utf-8", xml_declaration=True)
+    return file_path
+
+
+def _search_setup(hit):
+    def setup(xml_file_path):
+        lexicon = Lexicon.load(xml_file_path, use_cache=False)
+        set_lexicon(lexicon)
+        words = [result["word"] for result in lexicon.words()]
+        terms = words[::max(1, len(words) // 50)]
+        if not hit:
+            terms = [term + "qx" for term in terms]
+        search_word(terms[0])  # A miss builds the fuzzy index; keep that out of the timings
+        return lambda: [search_word(term) for term in terms], len(terms)
+    return setup
+
+
+def _each(function, arguments):
+    return lambda xml_file_path: (lambda: [function(*argument) for argument in arguments], len(arguments))
+
+
+def _formatting_setup(kind):
+    def setup(xml_file_path):
+        if kind == "noun":
+            forms = [cases for word, gender in NOUNS
+                     for cases in generate_noun_paradigms(word, gender, "neživotné").values()]
+            return lambda: [format_noun_paradigms(cases) for cases in forms], len(forms)
+        paradigms = [generate_verb_paradigms(verb) for verb in VERBS]
+        return lambda: [format_verb_paradigms(verb_paradigms) for verb_paradigms in paradigms], len(paradigms)
+    return setup
+
+
+BENCHMARKS = [
+    Benchmark("parse_xml_data", True, lambda path: (lambda: parse_xml_data(path), 1)),
+    Benchmark("search_word_hit", True, _search_setup(hit=True)),
+    Benchmark("search_word_miss", True, _search_setup(hit=False)),
+    Benchmark("generate_obliquus", False, _each(generate_obliquus, NOUNS)),
+    Benchmark("generate_noun_paradigms", False,
+              _each(generate_noun_paradigms, [(word, gender, animacy) for word, gender in NOUNS
+                                              for animacy in ("životné", "neživotné")])),
+    Benchmark("generate_verb_paradigms", False, _each(generate_verb_paradigms, [(verb,) for verb in VERBS])),
+    Benchmark("process_verb_phrase", False, _each(process_verb, [(phrase,) for phrase in PHRASES])),
+    Benchmark("format_noun_paradigms", False, _formatting_setup("noun")),
+    Benchmark("format_verb_paradigms", False, _formatting_setup("verb")),
+]
+
+
+def measure(function, items=1, repeat=5, min_time=0.2):
+    '''
+    Time function and return (calls, best, median, peak_memory).
+
+    best and median are seconds per item (function processes items items per call);
+    peak_memory is the peak traced allocation of one call in bytes.
+    '''
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or calls >= 1 << 20:
+            break
+        calls *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = [elapsed]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        timings.append(time.perf_counter() - started)
+    timings = [timing / calls / items for timing in timings]
+
+    tracemalloc.start()
+    try:
+        function()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return calls, min(timings), statistics.median(timings), peak_memory
+
+
+def synthetic_xml(size, directory, seed=0):
+    '''Write a synthetic dictionary with size senses to directory and return its path.'''
+    file_path = os.path.join(directory, f"SRO.synthetic.{size}.xml")
+    generate_sro(file_path, size, seed)
+    return file_path
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=5, min_time=0.2, names=None, xml_file_path=None, progress=None,
+                   synthetic_seed=None):
+    '''
+    Run the benchmarks (all, or those whose name contains one of names) and return Result tuples.
+
+    Sizes are lemmas of dictionaries scaled from xml_file_path or, when synthetic_seed
+    is given, senses of synthetic dictionaries generated with that seed.
+    '''
+    selected = [benchmark for benchmark in BENCHMARKS
+                if not names or any(name in benchmark.name for name in names)]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        if synthetic_seed is None:
+            paths = {size: scaled_xml(size, directory, xml_file_path) for size in sizes}
+        else:
+            paths = {size: synthetic_xml(size, directory, synthetic_seed) for size in sizes}
+        try:
+            for benchmark in selected:
+                for size in (sizes if benchmark.sized else [None]):
+                    function, items = benchmark.setup(paths[size] if size else xml_file_path or default_xml_path())
+                    calls, best, median, peak_memory = measure(function, items, repeat, min_time)
+                    result = Result(benchmark.name, size, calls, repeat, best, median, peak_memory)
+                    results.append(result)
+                    if progress is not None:
+                        progress.write(format_result(result) + "\n")
+        finally:
+            set_lexicon(None)
+    return results
+
+
+def format_result(result, baseline=None):
+    '''Format one result as a table row, with the change against a baseline Result if given.'''
+    row = (f"{result.name:<26} {'-' if result.size is None else result.size:>6} "
+           f"{result.median * 1e6:>12.2f} us {result.peak_memory / 1024:>10.1f} KiB")
+    if baseline is not None:
+        row += f" {(result.median / baseline.median - 1) * 100:>+8.1f}%"
+    return row
+
+
+def save_results(results, output_path):
+    '''Write results as JSON together with a description of the machine.'''
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [result._asdict() for result in results],
+    }
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(document, output_file, indent=2)
+
+
+def load_results(input_path):
+    '''Read results saved by save_results.'''
+    with open(input_path, encoding="utf-8") as input_file:
+        return [Result(**result) for result in json.load(input_file)["results"]]
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    '''
+    Return (result, baseline result) pairs whose median time grew by more than threshold
+    (a fraction, 0.2 = 20 %). Results missing from the baseline are skipped.
+    '''
+    baseline_by_key = {(result.name, result.size): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get((result.name, result.size))
+        if previous is not None and result.median > previous.median * (1 + threshold):
+            regressions.append((result, previous))
+    return regressions
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Roma paradigm generator.")
+    parser.add_argument("-o", "--output", default=None, help="save the results as JSON")
+    parser.add_argument("--baseline", default=None, help="compare against results saved with -o")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown reported as a regression (default: 0.2 = 20%%)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="dictionary sizes in lemmas")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repeats per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per repeat")
+    parser.add_argument("--only", nargs="+", default=None, help="run the benchmarks whose name contains one of these")
+    parser.add_argument("--xml", default=None, help="dictionary the scaled dictionaries are made from")
+    parser.add_argument("--synthetic", type=int, default=None, metavar="SEED",
+                        help="use synthetic dictionaries of --sizes senses generated with SEED")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    print(f"{'benchmark':<26} {'size':>6} {'median/item':>15} {'peak memory':>14}")
+    results = run_benchmarks(arguments.sizes, arguments.repeat, arguments.min_time, arguments.only, arguments.xml,
+                             progress=sys.stdout, synthetic_seed=arguments.synthetic)
+    if arguments.output:
+        save_results(results, arguments.output)
+
+    if arguments.baseline:
+        baseline = load_results(arguments.baseline)
+        baseline_by_key = {(result.name, result.size): result for result in baseline}
+        print(f"\nCompared with {arguments.baseline}:")
+        for result in results:
+            print(format_result(result, baseline_by_key.get((result.name, result.size))))
+        regressions = compare_results(results, baseline, arguments.threshold)
+        for result, previous in regressions:
+            print(f"Regression: {result.name} (size {result.size}) "
+                  f"{previous.median * 1e6:.2f} us -> {result.median * 1e6:.2f} us")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,16 +3,22 @@ This script automates the process of building the executable for the Roma Paradi
 
 Functions:
 - run_tests(): Run tests using pytest. Aborts the executable build if tests fail.
+- compile_lexicon(): Compile the lexicon from SRO.xml into a versioned, checksummed artifact.
 - build_executable(): Build the executable using PyInstaller after running tests.
+- measure_cold_start(): Report the executable's time from launch to the first search result.
 
 Usage:
 Run this script directly to build the executable:
     $ python build_script.py
+Use --onedir for a directory build, which starts faster because nothing is unpacked at launch.
 """
 
+import argparse
+import json
 import os
 import sys
 import subprocess
+import time
 import pkg_resources
 
 def run_tests():
@@ -38,7 +44,32 @@ def get_package_location(package_name):
 
 
 
-def build_executable():
+def compile_lexicon(xml_path, output_path):
+    '''Compile the lexicon from xml_path into an artifact at output_path and return its header.'''
+    from search_handler import Lexicon
+    from xml_parser import file_digest
+
+    lexicon = Lexicon.load(xml_path, use_cache=False)
+    header = lexicon.save_artifact(output_path, source_digest=file_digest(xml_path))
+    print(f"Compiled {len(lexicon)} words into {output_path} "
+          f"(version {header['version']}, sha256 {header['sha256'][:12]})")
+    return header
+
+
+def measure_cold_start(executable_path):
+    '''Launch the executable with --startup-benchmark and return its startup timings.'''
+    started = time.perf_counter()
+    result = subprocess.run([executable_path, "--startup-benchmark"],
+                            capture_output=True, text=True, check=False, timeout=300)
+    wall_time = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"exit code {result.returncode}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["wall_time"] = round(wall_time, 4)
+    return timings
+
+
+def build_executable(onedir=False):
     '''Build the executable using PyInstaller after running tests.'''
     run_tests()
 
@@ -51,13 +82,45 @@ def build_executable():
     # Construct the path to the data file relative to the script's location
     data_path = os.path.join(script_directory, "data", "SRO.xml")
  
+    # The executable loads the precompiled lexicon instead of parsing the XML at launch
+    from xml_parser import artifact_path
+    lexicon_path = artifact_path("lexicon", os.path.join(script_directory, "data"))
+    compile_lexicon(data_path, lexicon_path)
+
     # Construct the PyInstaller command
+    bundle_option = "--onedir" if onedir else "--onefile"
     pyinstaller_command = (
-        f'pyinstaller --onefile --add-data "{data_path}{os.pathsep}data" user_interface.py'
+        f'pyinstaller --noconfirm {bundle_option} '
+        f'--add-data "{data_path}{os.pathsep}data" '
+        f'--add-data "{lexicon_path}{os.pathsep}data" user_interface.py'
     )
 
     # Run the PyInstaller command
-    subprocess.run(pyinstaller_command, shell=True)
+    subprocess.run(pyinstaller_command, shell=True, check=True)
+
+    executable_name = "user_interface.exe" if sys.platform == "win32" else "user_interface"
+    if onedir:
+        executable_path = os.path.join(script_directory, "dist", "user_interface", executable_name)
+    else:
+        executable_path = os.path.join(script_directory, "dist", executable_name)
+
+    try:
+        timings = measure_cold_start(executable_path)
+    except (OSError, RuntimeError, ValueError, subprocess.TimeoutExpired) as e:
+        print(f"Cold start could not be measured: {e}")
+    else:
+        print(f"Cold start to first result: {timings['first_result']:.3f}s "
+              f"(first paint {timings.get('first_paint', 0):.3f}s, wall time {timings['wall_time']:.3f}s)")
+
+
+def parse_arguments(argv=None):
+    '''Parse the command line arguments.'''
+    parser = argparse.ArgumentParser(description="Build the Roma Paradigm Generator executable.")
+    parser.add_argument("--onedir", action="store_true",
+                        help="build a directory instead of a single file (faster start)")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    build_executable()
+    arguments = parse_arguments()
+    build_executable(onedir=arguments.onedir)
@@ -0,0 +1,187 @@
+"""
+This module declines nouns with a compiled rule table.
+
+It produces the same paradigms as nouns.generate_noun_paradigms, but the case rules are
+written down as data: every stem class (the branches of nouns.generate_obliquus) defines
+its stems and every (noun_type, gender) defines how each case is built from them.
+The table is compiled once into cell templates of the form "strip k characters from the
+word, then append a suffix", so declining a word is one classification followed by
+16 string concatenations.
+
+Usage:
+    $ python declension.py
+    (checks that decline matches generate_noun_paradigms for every noun in SRO.xml)
+"""
+
+from exceptions import masc_xeno, fem_oiko_i, masc_xeno_nom_pl_a
+
+CASES = ["nominatív", "genitív", "datív", "akuzatív", "vokatív", "lokál", "ablativ", "inštrumentál"]
+NUMBERS = ["Singulár", "Plurál"]
+ANIMATE = "životné"
+
+# Stem classes in the order generate_obliquus tests them. Every stem is a
+# (strip, suffix) pair applied to the word:
+# (noun_type, gender, bare stem, obliquus singular, obliquus plural, nominative plural)
+STEM_CLASSES = {
+    "abstract": ("oiko", "masculine", (0, ""), (2, "nas"), (2, "nen"), (0, "a")),
+    "xeno_masculine": ("xeno", "masculine", (0, ""), (0, ""), (2, "en"), (2, "i")),
+    "xeno_masculine_nom_pl_a": ("xeno", "masculine", (0, ""), (0, ""), (2, "en"), (2, "a")),
+    "xeno_feminine": ("xeno", "feminine", (0, ""), (0, ""), (1, "en"), (1, "i")),
+    "oiko_feminine_i": ("oiko", "feminine", (1, ""), (1, "a"), (1, "en"), (1, "a")),
+    "oiko_masculine_o": ("oiko", "masculine", (1, ""), (1, "es"), (1, "en"), (1, "e")),
+    "oiko_masculine_i": ("oiko", "masculine", (0, ""), (1, "es"), (1, "en"), (1, "a")),
+    "oiko_masculine": ("oiko", "masculine", (0, ""), (0, "es"), (0, "en"), (0, "a")),
+    "oiko_feminine": ("oiko", "feminine", (0, ""), (0, "a"), (0, "en"), (0, "a")),
+    "other": ("other", "other", (0, ""), (0, ""), (0, ""), (0, "")),
+}
+
+# Suffixes of the cases that are always built from the obliquus stems: (singular, plural)
+OBLIQUE_SUFFIXES = {
+    "genitív": ("kero", "gero"),
+    "datív": ("ke", "ge"),
+    "lokál": ("te", "de"),
+    "ablativ": ("tar", "dar"),
+}
+
+# Remaining cases per (noun_type, gender). A rule is (base, strip, suffix) with base one of
+# "word", "stem", "obl_sg", "obl_pl" or "nom_pl". A case maps to a (singular, plural) pair
+# of rules, or to {animacy: pair} when animacy matters.
+WORD = ("word", 0, "")
+OBL_SG = ("obl_sg", 0, "")
+OBL_PL = ("obl_pl", 0, "")
+NOM_PL = ("nom_pl", 0, "")
+INSTRUMENTAL = (("obl_sg", 0, "ha"), ("obl_pl", 0, "ca"))
+
+CASE_RULES = {
+    ("xeno", "masculine"): {
+        "nominatív": (WORD, NOM_PL),
+        "akuzatív": (WORD, OBL_PL),
+        "vokatív": {"animate": (("word", 2, "ona"), ("word", 2, "ale")), "inanimate": (WORD, OBL_PL)},
+        "inštrumentál": (("word", 1, "ha"), ("obl_pl", 0, "ca")),
+    },
+    ("xeno", "feminine"): {
+        "nominatív": (WORD, NOM_PL),
+        "akuzatív": (WORD, OBL_PL),
+        "vokatív": {"animate": (WORD, NOM_PL), "inanimate": (WORD, OBL_PL)},
+        "inštrumentál": INSTRUMENTAL,
+    },
+    ("oiko", "masculine"): {
+        "nominatív": (WORD, NOM_PL),
+        "akuzatív": {"animate": (OBL_SG, OBL_PL), "inanimate": (WORD, NOM_PL)},
+        "vokatív": {"animate": (("stem", 0, "eja"), ("stem", 0, "ale")), "inanimate": (WORD, NOM_PL)},
+        "inštrumentál": (("obl_sg", 1, "ha"), ("obl_pl", 0, "ca")),
+    },
+    ("oiko", "feminine"): {
+        "nominatív": (WORD, NOM_PL),
+        "akuzatív": {"animate": (OBL_SG, OBL_PL), "inanimate": (WORD, OBL_PL)},
+        "vokatív": {"animate": (("stem", 0, "ije"), ("stem", 0, "ale")), "inanimate": (WORD, OBL_PL)},
+        "inštrumentál": INSTRUMENTAL,
+    },
+    ("other", "other"): {
+        "nominatív": (WORD, NOM_PL),
+        "akuzatív": (("obl_sg", 0, "a"), ("obl_pl", 0, "en")),
+        "vokatív": (("obl_sg", 0, "ije"), ("obl_pl", 0, "ale")),
+        "inštrumentál": INSTRUMENTAL,
+    },
+}
+
+
+def classify(word, gender):
+    '''Return the stem class of a noun, following the branches of nouns.generate_obliquus.'''
+    if word.endswith(("ben", "pen", "ipen", "iben")):
+        return "abstract"
+    elif word.endswith(("is", "as", "os", "us")) and word not in masc_xeno:
+        return "xeno_masculine_nom_pl_a" if word in masc_xeno_nom_pl_a else "xeno_masculine"
+    elif word.endswith("a"):
+        return "xeno_feminine"
+    elif word.endswith("i") and word not in fem_oiko_i:
+        return "oiko_feminine_i"
+    elif word.endswith("o"):
+        return "oiko_masculine_o"
+    elif word in fem_oiko_i:
+        return "oiko_masculine_i"
+    elif gender == "masculine" or word in masc_xeno:
+        return "oiko_masculine"
+    elif gender == "feminine":
+        return "oiko_feminine"
+    return "other"
+
+
+def _compose(stem, strip, suffix):
+    # Apply (strip, suffix) to a stem that is itself (strip, suffix) applied to the word
+    stem_strip, stem_suffix = stem
+    if strip <= len(stem_suffix):
+        return stem_strip, stem_suffix[:len(stem_suffix) - strip] + suffix
+    return stem_strip + strip - len(stem_suffix), suffix
+
+
+def _compile_class(stem_class, animacy_key):
+    noun_type, gender, stem, obl_sg, obl_pl, nom_pl = STEM_CLASSES[stem_class]
+    bases = {"word": (0, ""), "stem": stem, "obl_sg": obl_sg, "obl_pl": obl_pl, "nom_pl": nom_pl}
+    rules = CASE_RULES[(noun_type, gender)]
+
+    singular, plural = [], []
+    for case in CASES:
+        if case in OBLIQUE_SUFFIXES:
+            suffix_singular, suffix_plural = OBLIQUE_SUFFIXES[case]
+            pair = (("obl_sg", 0, suffix_singular), ("obl_pl", 0, suffix_plural))
+        else:
+            pair = rules[case]
+            if isinstance(pair, dict):
+                pair = pair[animacy_key]
+        for cells, (base, strip, suffix) in zip((singular, plural), pair):
+            cells.append(_compose(bases[base], strip, suffix))
+    return tuple(singular + plural)
+
+
+def compile_templates():
+    '''Return {(stem_class, animate): 16 (strip, suffix) templates, singular cases first}.'''
+    return {
+        (stem_class, animate): _compile_class(stem_class, "animate" if animate else "inanimate")
+        for stem_class in STEM_CLASSES
+        for animate in (True, False)
+    }
+
+
+TEMPLATES = compile_templates()
+MAX_STRIP = max(strip for templates in TEMPLATES.values() for strip, _ in templates)
+
+
+def decline_cells(word, gender, animacy):
+    '''Return the 16 forms of a noun as a tuple: singular cases, then plural cases, in CASES order.'''
+    templates = TEMPLATES[(classify(word, gender), animacy == ANIMATE)]
+    stems = [word[:len(word) - strip] if strip <= len(word) else "" for strip in range(MAX_STRIP + 1)]
+    return tuple([stems[strip] + suffix for strip, suffix in templates])
+
+
+def decline(word, gender, animacy):
+    '''Return the same paradigms as nouns.generate_noun_paradigms using the compiled templates.'''
+    cells = decline_cells(word, gender, animacy)
+    return {
+        NUMBERS[0]: dict(zip(CASES, cells[:8])),
+        NUMBERS[1]: dict(zip(CASES, cells[8:])),
+    }
+
+
+def find_mismatches(nouns, animacy_values=(ANIMATE, "neživotné")):
+    '''Return the (word, gender, animacy) triples for which decline differs from generate_noun_paradigms.'''
+    from nouns import generate_noun_paradigms
+
+    return [
+        (word, gender, animacy)
+        for word, gender in nouns
+        for animacy in animacy_values
+        if decline(word, gender, animacy) != generate_noun_paradigms(word, gender, animacy)
+    ]
+
+
+if __name__ == "__main__":
+    from search_handler import get_lexicon
+
+    dictionary_nouns = [(result["word"], gender)
+                        for result in get_lexicon().words() if result["part_of_speech"] == "noun"
+                        for gender in (result["gender"], "masculine", "feminine", "other")]
+    mismatches = find_mismatches(dictionary_nouns)
+    print(f"{len(dictionary_nouns)} nouns checked, {len(mismatches)} mismatches")
+    for mismatch in mismatches:
+        print(mismatch)
@@ -0,0 +1,240 @@
+"""
+This module exports the paradigms of every noun and verb in the dictionary.
+
+The export is a streaming pipeline: senses are read from SRO.xml with iter_senses,
+paradigms are generated in chunks by worker processes with a bounded number of chunks
+in flight, and each record is written to the output as soon as its chunk is done.
+Output is JSON lines (one lemma per line) or CSV (one form per row).
+
+After every written chunk a checkpoint (<output>.checkpoint) records how many lemmas
+are complete, so an interrupted export can continue with --resume. The checkpoint also
+records the digest of SRO.xml and the last exported lemma, and a resume is refused when
+either no longer matches, as the remaining lemmas would not line up with the output.
+
+Usage:
+    $ python export.py paradigms.jsonl
+    $ python export.py paradigms.csv --format csv --workers 4 --resume
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+
+from analyzer import is_single_verb
+from batch import ordered_map
+from search_handler import clean_text, fold_lemma, get_pos_category, get_gender_category
+from xml_parser import default_xml_path, file_digest, iter_senses
+from declension import decline
+from verbs import generate_verb_paradigms
+
+ANIMACY_VALUES = ("životné", "neživotné")
+CSV_HEADER = ["word", "part_of_speech", "gender", "animacy", "cell", "person", "number", "form"]
+
+
+def iter_lemmas(xml_file_path=None):
+    '''
+    Yield (word, part_of_speech, gender) for every noun and single-word verb in SRO.xml.
+
+    Like search_word, only the first Sense of each folded lemma is used.
+    '''
+    seen = set()
+    for sense in iter_senses(xml_file_path):
+        if sense.lemma_rom is None or sense.pos_rom is None:
+            continue
+        word = clean_text(sense.lemma_rom)
+        key = fold_lemma(word)
+        if key in seen:
+            continue
+        seen.add(key)
+        pos_rom = clean_text(sense.pos_rom)
+        part_of_speech = get_pos_category(pos_rom)
+        if part_of_speech == "noun" or (part_of_speech == "verb" and is_single_verb(word)):
+            yield word, part_of_speech, get_gender_category(pos_rom)
+
+
+def export_record(word, part_of_speech, gender):
+    '''Return the export record of a lemma with all of its paradigms.'''
+    record = {"word": word, "part_of_speech": part_of_speech, "gender": gender}
+    if part_of_speech == "noun":
+        record["paradigms"] = {
+            animacy: decline(word, gender, animacy) for animacy in ANIMACY_VALUES
+        }
+    else:
+        record["paradigms"] = generate_verb_paradigms(word)
+    return record
+
+
+def export_records(lemmas):
+    '''Return the export records for a chunk of (word, part_of_speech, gender) tuples.'''
+    return [export_record(*lemma) for lemma in lemmas]
+
+
+def record_rows(record):
+    '''Yield the CSV rows (one per form) of an export record.'''
+    base = [record["word"], record["part_of_speech"], record["gender"]]
+    if record["part_of_speech"] == "noun":
+        for animacy, paradigms in record["paradigms"].items():
+            for number, cases in paradigms.items():
+                for case, form in cases.items():
+                    yield base + [animacy, case, "", number, form]
+    else:
+        for tense, persons in record["paradigms"].items():
+            for person, numbers in persons.items():
+                for number, form in numbers.items():
+                    yield base + ["", tense, person, number, form]
+
+
+def serialize_record(record, output_format):
+    '''Return the text written to the output for a record.'''
+    if output_format == "jsonl":
+        return json.dumps(record, ensure_ascii=False) + "\n"
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(record_rows(record))
+    return buffer.getvalue()
+
+
+def checkpoint_path(output_path):
+    '''Return the path of the checkpoint file of an export.'''
+    return output_path + ".checkpoint"
+
+
+def read_checkpoint(output_path):
+    '''Return the saved checkpoint of an export, or None if there is none.'''
+    try:
+        with open(checkpoint_path(output_path), encoding="utf-8") as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_checkpoint(output_path, checkpoint):
+    temp_path = checkpoint_path(output_path) + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file, ensure_ascii=False)
+    os.replace(temp_path, checkpoint_path(output_path))
+
+
+class ProgressReport:
+    """Print the number of exported lemmas and the throughput at most every interval seconds."""
+
+    def __init__(self, stream=sys.stderr, interval=1.0, start_count=0):
+        self.stream = stream
+        self.interval = interval
+        self.start_count = start_count
+        self.start_time = self.last_report = time.perf_counter()
+
+    def update(self, count, force=False):
+        now = time.perf_counter()
+        if self.stream is None or (not force and now - self.last_report < self.interval):
+            return
+        self.last_report = now
+        elapsed = now - self.start_time
+        rate = (count - self.start_count) / elapsed if elapsed > 0 else 0.0
+        self.stream.write(f"\r{count} lemmas exported, {rate:.0f} lemmas/s")
+        if force:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+def export_paradigms(output_path, output_format="jsonl", xml_file_path=None, workers=None,
+                     chunksize=64, max_pending=None, resume=False, progress=sys.stderr):
+    '''
+    Export the paradigms of every noun and verb in SRO.xml to output_path.
+
+    With resume=True the export continues after the last checkpointed lemma. Returns the
+    total number of exported lemmas. Raises ValueError when the checkpoint does not match
+    the dictionary or the output file.
+    '''
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    source_digest = file_digest(xml_file_path or default_xml_path())
+
+    checkpoint = read_checkpoint(output_path) if resume else None
+    if checkpoint is not None:
+        if checkpoint.get("format") != output_format:
+            raise ValueError(f"Checkpoint of {output_path} was written for the {checkpoint.get('format')} format.")
+        if checkpoint.get("source_sha256") != source_digest:
+            raise ValueError(f"Checkpoint of {output_path} was written for another version of the dictionary; "
+                             "export again without --resume.")
+        if not os.path.exists(output_path) or os.path.getsize(output_path) < checkpoint["offset"]:
+            raise ValueError(f"{output_path} is missing or shorter than its checkpoint; export again without --resume.")
+    completed = checkpoint["completed"] if checkpoint else 0
+
+    lemmas = iter_lemmas(xml_file_path)
+    last_lemma = checkpoint["last_lemma"] if checkpoint else None
+    if completed:
+        exported = deque(islice(lemmas, completed), maxlen=1)
+        if not exported or exported[0][0] != last_lemma:
+            raise ValueError(f"Lemma {completed} of the dictionary is not {last_lemma!r} as in the checkpoint "
+                             f"of {output_path}; export again without --resume.")
+
+    output_file = open(output_path, "r+b" if checkpoint else "wb")
+    try:
+        if checkpoint:
+            output_file.truncate(checkpoint["offset"])
+            output_file.seek(checkpoint["offset"])
+        elif output_format == "csv":
+            output_file.write((",".join(CSV_HEADER) + "\n").encode("utf-8"))
+
+        report = ProgressReport(progress, start_count=completed)
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            if executor is None:
+                records = (export_record(*lemma) for lemma in lemmas)
+            else:
+                records = ordered_map(executor, export_records, lemmas, chunksize, max_pending)
+
+            for record in records:
+                output_file.write(serialize_record(record, output_format).encode("utf-8"))
+                completed += 1
+                last_lemma = record["word"]
+                if completed % chunksize == 0:
+                    output_file.flush()
+                    write_checkpoint(output_path, {"format": output_format, "completed": completed,
+                                                   "offset": output_file.tell(), "last_lemma": last_lemma,
+                                                   "source_sha256": source_digest})
+                report.update(completed)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        output_file.flush()
+        write_checkpoint(output_path, {"format": output_format, "completed": completed,
+                                       "offset": output_file.tell(), "last_lemma": last_lemma,
+                                       "source_sha256": source_digest, "done": True})
+        report.update(completed, force=True)
+    finally:
+        output_file.close()
+    return completed
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Export the paradigms of every noun and verb in the dictionary.")
+    parser.add_argument("output", help="output file")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="output format")
+    parser.add_argument("--xml", default=None, help="dictionary file (default: data/SRO.xml)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64, help="lemmas submitted to a worker at once")
+    parser.add_argument("--max-pending", type=int, default=None, help="chunks in flight (default: 2 per worker)")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export")
+    parser.add_argument("--quiet", action="store_true", help="do not report progress")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    '''Run the export from the command line.'''
+    arguments = parse_arguments(argv)
+    export_paradigms(arguments.output, arguments.format, arguments.xml, arguments.workers,
+                     arguments.chunksize, arguments.max_pending, arguments.resume,
+                     None if arguments.quiet else sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
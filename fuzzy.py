@@ -0,0 +1,111 @@
+"""
+This module finds dictionary keys close to a misspelled search term.
+
+It implements the symmetric delete algorithm (SymSpell): every key is indexed under
+the strings obtained by deleting up to max_distance characters from its prefix, so
+a query only generates its own deletes and compares against the few keys sharing
+one of them, instead of computing an edit distance to every key in the lexicon.
+
+Keys and queries are expected to be folded already (see search_handler.fold_lemma).
+"""
+
+
+def edit_distance(source, target, max_distance):
+    """
+    Return the optimal string alignment distance between source and target.
+
+    Adjacent transpositions count as one edit. Returns max_distance + 1 as soon as
+    the distance is known to exceed max_distance.
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and source[i - 1] == target[j - 2]
+                    and source[i - 2] == target[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+def generate_deletes(word, max_distance):
+    """Return word and every string obtained by deleting up to max_distance characters."""
+    deletes = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for candidate in frontier:
+            for i in range(len(candidate)):
+                next_frontier.add(candidate[:i] + candidate[i + 1:])
+        next_frontier -= deletes
+        deletes |= next_frontier
+        frontier = next_frontier
+    return deletes
+
+
+class FuzzyIndex:
+    """
+    Deletion dictionary over a set of keys.
+
+    Only the first prefix_length characters of each key are expanded, which bounds
+    the index size for long phrases; candidates are verified on the full key.
+    """
+
+    def __init__(self, keys, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._deletes = {}
+        for key in keys:
+            for delete in generate_deletes(key[:prefix_length], max_distance):
+                self._deletes.setdefault(delete, []).append(key)
+
+    @classmethod
+    def from_deletes(cls, deletes, max_distance=2, prefix_length=7):
+        """Return an index over a deletion dictionary (delete -> keys) built with the same parameters, e.g. a mapped one."""
+        index = cls((), max_distance, prefix_length)
+        index._deletes = deletes
+        return index
+
+    def items(self):
+        """Return the (delete, keys) pairs of the deletion dictionary."""
+        return self._deletes.items()
+
+    def updated(self, removed=(), added=()):
+        """Return a copy without the removed keys and with the added ones; this index is not changed."""
+        index = FuzzyIndex.from_deletes(dict(self._deletes), self.max_distance, self.prefix_length)
+        removed = set(removed)
+        for key in removed:
+            for delete in generate_deletes(key[:self.prefix_length], self.max_distance):
+                keys = [other for other in index._deletes.get(delete, ()) if other not in removed]
+                if keys:
+                    index._deletes[delete] = keys
+                else:
+                    index._deletes.pop(delete, None)
+        for key in added:
+            for delete in generate_deletes(key[:self.prefix_length], self.max_distance):
+                # New lists only: the ones in self._deletes are still read by this index
+                index._deletes[delete] = index._deletes.get(delete, []) + [key]
+        return index
+
+    def candidates(self, term, limit=5):
+        """Return up to limit (distance, key) pairs within max_distance, closest first."""
+        seen = set()
+        matches = []
+        for delete in generate_deletes(term[:self.prefix_length], self.max_distance):
+            for key in self._deletes.get(delete, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                distance = edit_distance(term, key, self.max_distance)
+                if distance <= self.max_distance:
+                    matches.append((distance, key))
+        matches.sort()
+        return matches[:limit]
@@ -0,0 +1,223 @@
+"""
+This module collects counters and latency histograms for the hot paths of the generator.
+
+Functions are instrumented with the timed decorator and events with count. Collection is
+off unless the ROMA_METRICS environment variable is set or enable() is called; while it is
+off, an instrumented call costs one flag check and counting costs nothing else.
+
+The collected metrics can be exported as Prometheus text or as a JSON snapshot with export;
+other formats can be added with register_exporter.
+
+Usage:
+    $ ROMA_METRICS=1 python service.py      # then GET /metrics
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+
+# Upper bounds of the latency buckets in seconds (Prometheus 'le'); the last bucket is +Inf
+DEFAULT_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_enabled = bool(os.environ.get("ROMA_METRICS"))
+
+
+class Counter:
+    """Monotonic count per combination of label values."""
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label_name, "") for label_name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """Return {label values tuple: count}."""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets, with their sum and count."""
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def state(self):
+        """Return (cumulative counts per bucket including +Inf, sum, count)."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+
+
+class Registry:
+    """Named counters and histograms; metrics are created on first use."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _get(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name, description="", label_names=()):
+        return self._get(name, lambda: Counter(name, description, label_names))
+
+    def histogram(self, name, description="", buckets=DEFAULT_BUCKETS):
+        return self._get(name, lambda: Histogram(name, description, buckets))
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def reset(self):
+        """Zero every metric, keeping their definitions."""
+        for metric in self.metrics():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+def enable(enabled=True):
+    '''Turn metric collection on or off.'''
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    '''Return True while metrics are collected.'''
+    return _enabled
+
+
+def timed(name, description=""):
+    '''Decorate a function to record its latency in the histogram {name}_seconds.'''
+    def decorator(function):
+        histogram = REGISTRY.histogram(f"{name}_seconds", description or f"Latency of {name} in seconds")
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def count(name, description="", **labels):
+    '''Increment the counter name for the given label values.'''
+    if _enabled:
+        REGISTRY.counter(name, description, sorted(labels)).inc(**labels)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_le(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def to_prometheus(registry=REGISTRY):
+    '''Return the metrics in the Prometheus text exposition format.'''
+    lines = []
+    for metric in registry.metrics():
+        if metric.description:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+        if isinstance(metric, Counter):
+            lines.append(f"# TYPE {metric.name} counter")
+            for label_values, value in sorted(metric.values().items()):
+                labels = ",".join(f'{label_name}="{_escape_label(label_value)}"'
+                                  for label_name, label_value in zip(metric.label_names, label_values))
+                lines.append(f"{metric.name}{{{labels}}} {value}" if labels else f"{metric.name} {value}")
+        else:
+            lines.append(f"# TYPE {metric.name} histogram")
+            cumulative, total, observations = metric.state()
+            for bound, value in zip(metric.buckets + (float("inf"),), cumulative):
+                lines.append(f'{metric.name}_bucket{{le="{_format_le(bound)}"}} {value}')
+            lines.append(f"{metric.name}_sum {total}")
+            lines.append(f"{metric.name}_count {observations}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot(registry=REGISTRY):
+    '''Return the metrics as a JSON-serializable dictionary.'''
+    counters, histograms = {}, {}
+    for metric in registry.metrics():
+        if isinstance(metric, Counter):
+            counters[metric.name] = {
+                ",".join(f"{label_name}={label_value}"
+                         for label_name, label_value in zip(metric.label_names, label_values)): value
+                for label_values, value in sorted(metric.values().items())
+            }
+        else:
+            cumulative, total, observations = metric.state()
+            histograms[metric.name] = {
+                "count": observations,
+                "sum": total,
+                "mean": total / observations if observations else None,
+                "buckets": {_format_le(bound): value
+                            for bound, value in zip(metric.buckets + (float("inf"),), cumulative)},
+            }
+    return {"enabled": _enabled, "counters": counters, "histograms": histograms}
+
+
+EXPORTERS = {
+    "prometheus": to_prometheus,
+    "json": lambda registry=REGISTRY: json.dumps(snapshot(registry), indent=2),
+}
+
+
+def register_exporter(name, exporter):
+    '''Add an export format: exporter(registry) returns the exported text.'''
+    EXPORTERS[name] = exporter
+
+
+def export(format="prometheus", registry=REGISTRY):
+    '''Return the metrics as text in format (see EXPORTERS).'''
+    try:
+        exporter = EXPORTERS[format]
+    except KeyError as exc:
+        raise ValueError(f"Unknown metrics format '{format}', use one of: {', '.join(EXPORTERS)}") from exc
+    return exporter(registry)
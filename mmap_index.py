@@ -0,0 +1,372 @@
+"""
+This module stores the lexicon and the full-form index in read-only memory-mapped files.
+
+Several processes (e.g. service workers) can open the same index files: the operating
+system shares the mapped pages between them, nothing is parsed at startup and lookups
+read the key and value bytes straight from the mapping.
+
+File layout (integers are little-endian):
+    header         magic, format version, kind, count, SHA-256 of the source XML
+    key offsets    count + 1 unsigned 64-bit offsets into the key block
+    value offsets  count + 1 unsigned 64-bit offsets into the value block
+    key block      UTF-8 keys sorted by their bytes (which is also str order)
+    value block    UTF-8 values, fields separated by FIELD_SEPARATOR and
+                   records by RECORD_SEPARATOR
+
+Keys are folded with search_handler.fold_lemma, so Lexicon and FormIndex objects backed by
+these files behave like the in-memory ones. The secondary indexes of the Lexicon share one
+'senses' file; their keys start with SENSES_PREFIX, TRANSLATIONS_PREFIX or CATEGORIES_PREFIX.
+The 'fuzzy' file holds the deletion dictionary of fuzzy.FuzzyIndex (built with its default
+parameters), so did-you-mean suggestions need no per-process index either.
+
+Usage:
+    $ python mmap_index.py [--xml data/SRO.xml] [--index-dir data]
+"""
+
+import argparse
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+import analyzer
+from analyzer import Analysis, FormIndex
+from fuzzy import FuzzyIndex
+from search_handler import Lexicon, LexiconIndexes, set_lexicon
+from xml_parser import default_xml_path, file_digest
+
+MAGIC = b"RPGMIDX\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sI16sQ32s")
+OFFSET = struct.Struct("<Q")
+FIELD_SEPARATOR = "\x1f"
+RECORD_SEPARATOR = "\x1e"
+SENSES_PREFIX = "s" + FIELD_SEPARATOR
+TRANSLATIONS_PREFIX = "t" + FIELD_SEPARATOR
+CATEGORIES_PREFIX = "c" + FIELD_SEPARATOR
+INDEX_KINDS = ("lexicon", "forms", "senses", "fuzzy")
+
+
+def index_path(kind, index_dir=None):
+    '''Return the path of the index file of kind ('lexicon', 'forms', 'senses' or 'fuzzy')'''
+    if index_dir is None:
+        index_dir = os.path.dirname(default_xml_path())
+    return os.path.join(index_dir, f"SRO.{kind}.idx")
+
+
+def write_table(file_path, kind, items, source_digest=None):
+    '''
+    Write (key, value) string pairs as an index file of kind.
+
+    source_digest is the SHA-256 hex digest of the XML file the items were built from.
+    '''
+    items = sorted((key.encode("utf-8"), value.encode("utf-8")) for key, value in items)
+    for (key, _), (next_key, _) in zip(items, items[1:]):
+        if key == next_key:
+            raise ValueError(f"Duplicate key in {kind} index: {key.decode('utf-8')!r}")
+
+    key_offsets, value_offsets = [0], [0]
+    for key, value in items:
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(value))
+    digest = bytes.fromhex(source_digest) if source_digest else bytes(32)
+
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as index_file:
+        index_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind.encode("ascii"), len(items), digest))
+        for offset in key_offsets + value_offsets:
+            index_file.write(OFFSET.pack(offset))
+        for key, _ in items:
+            index_file.write(key)
+        for _, value in items:
+            index_file.write(value)
+    os.replace(temp_path, file_path)
+
+
+class MappedTable:
+    """Sorted string table in a memory-mapped index file."""
+
+    def __init__(self, file_path, kind):
+        self.file_path = file_path
+        with open(file_path, "rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, file_kind, count, digest = HEADER.unpack_from(self._map, 0)
+        except struct.error as e:
+            self._map.close()
+            raise ValueError(f"{file_path} is not an index file") from e
+        if magic != MAGIC or version != FORMAT_VERSION or file_kind.rstrip(b"\0") != kind.encode("ascii"):
+            self._map.close()
+            raise ValueError(f"{file_path} is not a {kind} index of version {FORMAT_VERSION}")
+
+        self.kind = kind
+        self.source_digest = digest.hex() if any(digest) else None
+        self._count = count
+        self._key_offsets = HEADER.size
+        self._value_offsets = self._key_offsets + (count + 1) * OFFSET.size
+        self._keys = self._value_offsets + (count + 1) * OFFSET.size
+        self._values = self._keys + self._offset(self._key_offsets, count)
+
+    def __len__(self):
+        return self._count
+
+    def _offset(self, table, index):
+        return OFFSET.unpack_from(self._map, table + index * OFFSET.size)[0]
+
+    def key_bytes(self, index):
+        """Return the UTF-8 bytes of the key at index."""
+        return self._map[self._keys + self._offset(self._key_offsets, index):
+                         self._keys + self._offset(self._key_offsets, index + 1)]
+
+    def key(self, index):
+        """Return the key at index."""
+        return self.key_bytes(index).decode("utf-8")
+
+    def value(self, index):
+        """Return the value at index."""
+        return self._map[self._values + self._offset(self._value_offsets, index):
+                         self._values + self._offset(self._value_offsets, index + 1)].decode("utf-8")
+
+    def find(self, key):
+        """Return the index of key, or -1 when it is missing."""
+        key = key.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self.key_bytes(low) == key:
+            return low
+        return -1
+
+    def close(self):
+        """Unmap the file."""
+        self._map.close()
+
+
+class MappedKeys(Sequence):
+    """The sorted keys of a MappedTable as a sequence of strings (usable with bisect)."""
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._table.key(index)
+
+
+class MappedEntries(Mapping):
+    """Lexicon entries (folded lemma -> (lemma_rom, pos_rom or None)) read from a MappedTable."""
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, key):
+        index = self._table.find(key)
+        if index < 0:
+            raise KeyError(key)
+        lemma_rom, separator, pos_rom = self._table.value(index).partition(FIELD_SEPARATOR)
+        return lemma_rom, pos_rom if separator else None
+
+    def __iter__(self):
+        return iter(MappedKeys(self._table))
+
+    def __len__(self):
+        return len(self._table)
+
+
+class MappedForms(Mapping):
+    """Full-form index entries (folded form -> list of Analysis) read from a MappedTable."""
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, key):
+        index = self._table.find(key)
+        if index < 0:
+            raise KeyError(key)
+        analyses = []
+        for record in self._table.value(index).split(RECORD_SEPARATOR):
+            lemma, cell, person, number = record.split(FIELD_SEPARATOR)
+            analyses.append(Analysis(lemma, cell, int(person) if person else None, number))
+        return analyses
+
+    def __iter__(self):
+        return iter(MappedKeys(self._table))
+
+    def __len__(self):
+        return len(self._table)
+
+
+class MappedDeletes(Mapping):
+    """FuzzyIndex deletion dictionary entries (delete -> list of folded keys) read from a MappedTable."""
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, key):
+        index = self._table.find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self._table.value(index).split(RECORD_SEPARATOR)
+
+    def __iter__(self):
+        return iter(MappedKeys(self._table))
+
+    def __len__(self):
+        return len(self._table)
+
+
+class MappedPrefixed(Mapping):
+    """The entries of a MappedTable whose keys start with prefix, decoded by the given functions."""
+
+    __slots__ = ("_table", "_prefix", "_encode_key", "_decode_key", "_decode_value")
+
+    def __init__(self, table, prefix, decode_value, encode_key=str, decode_key=str):
+        self._table = table
+        self._prefix = prefix
+        self._encode_key = encode_key
+        self._decode_key = decode_key
+        self._decode_value = decode_value
+
+    def __getitem__(self, key):
+        index = self._table.find(self._prefix + self._encode_key(key))
+        if index < 0:
+            raise KeyError(key)
+        return self._decode_value(self._table.value(index))
+
+    def _range(self):
+        keys = MappedKeys(self._table)
+        # Keys with the prefix sort between it and the prefix letter followed by the next character
+        return range(bisect_left(keys, self._prefix), bisect_left(keys, self._prefix[0] + chr(ord(FIELD_SEPARATOR) + 1)))
+
+    def __iter__(self):
+        for index in self._range():
+            yield self._decode_key(self._table.key(index)[len(self._prefix):])
+
+    def __len__(self):
+        return len(self._range())
+
+
+def _encode_senses(senses):
+    return RECORD_SEPARATOR.join(FIELD_SEPARATOR.join(field or "" for field in sense) for sense in senses)
+
+
+def _decode_senses(value):
+    return tuple(tuple(field or None for field in record.split(FIELD_SEPARATOR))
+                 for record in value.split(RECORD_SEPARATOR))
+
+
+def _lexicon_items(lexicon):
+    for key, (lemma_rom, pos_rom) in lexicon.items():
+        yield key, lemma_rom if pos_rom is None else lemma_rom + FIELD_SEPARATOR + pos_rom
+
+
+def _form_items(form_index):
+    for key, analyses in form_index.items():
+        yield key, RECORD_SEPARATOR.join(
+            FIELD_SEPARATOR.join([lemma, cell, "" if person is None else str(person), number])
+            for lemma, cell, person, number in analyses)
+
+
+def _senses_items(lexicon):
+    senses, translations, categories = lexicon.indexes
+    for key, records in senses.items():
+        yield SENSES_PREFIX + key, _encode_senses(records)
+    for key, records in translations.items():
+        yield TRANSLATIONS_PREFIX + key, _encode_senses(records)
+    for (part_of_speech, gender), lemmas in categories.items():
+        yield CATEGORIES_PREFIX + part_of_speech + FIELD_SEPARATOR + gender, RECORD_SEPARATOR.join(lemmas)
+
+
+def _fuzzy_items(fuzzy_index):
+    for delete, keys in fuzzy_index.items():
+        yield delete, RECORD_SEPARATOR.join(keys)
+
+
+def build_indexes(xml_file_path=None, index_dir=None):
+    '''Build the lexicon, full-form, senses and fuzzy index files from the XML file and return their paths.'''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    digest = file_digest(xml_file_path)
+    lexicon = Lexicon.load(xml_file_path)
+    paths = tuple(index_path(kind, index_dir) for kind in INDEX_KINDS)
+    write_table(paths[0], "lexicon", _lexicon_items(lexicon), digest)
+    write_table(paths[1], "forms", _form_items(FormIndex.from_lexicon(lexicon)), digest)
+    write_table(paths[2], "senses", _senses_items(lexicon), digest)
+    write_table(paths[3], "fuzzy", _fuzzy_items(lexicon.fuzzy_index), digest)
+    return paths
+
+
+def ensure_indexes(xml_file_path=None, index_dir=None):
+    '''Build the index files unless they exist and were built from the current XML file.'''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    digest = file_digest(xml_file_path)
+    for kind in INDEX_KINDS:
+        try:
+            table = MappedTable(index_path(kind, index_dir), kind)
+        except (OSError, ValueError):
+            return build_indexes(xml_file_path, index_dir)
+        current = table.source_digest == digest
+        table.close()
+        if not current:
+            return build_indexes(xml_file_path, index_dir)
+    return tuple(index_path(kind, index_dir) for kind in INDEX_KINDS)
+
+
+def load_lexicon(index_dir=None):
+    '''Return a Lexicon backed by the memory-mapped lexicon, senses and fuzzy indexes.'''
+    table = MappedTable(index_path("lexicon", index_dir), "lexicon")
+    senses = MappedTable(index_path("senses", index_dir), "senses")
+    indexes = LexiconIndexes(
+        MappedPrefixed(senses, SENSES_PREFIX, _decode_senses),
+        MappedPrefixed(senses, TRANSLATIONS_PREFIX, _decode_senses),
+        MappedPrefixed(senses, CATEGORIES_PREFIX, lambda value: tuple(value.split(RECORD_SEPARATOR)),
+                       encode_key=FIELD_SEPARATOR.join, decode_key=lambda key: tuple(key.split(FIELD_SEPARATOR))),
+    )
+    fuzzy_index = FuzzyIndex.from_deletes(MappedDeletes(MappedTable(index_path("fuzzy", index_dir), "fuzzy")))
+    return Lexicon(MappedEntries(table), MappedKeys(table), indexes, fuzzy_index)
+
+
+def load_form_index(index_dir=None):
+    '''Return a FormIndex backed by the memory-mapped full-form index.'''
+    return FormIndex(MappedForms(MappedTable(index_path("forms", index_dir), "forms")))
+
+
+def use_mapped_indexes(index_dir=None):
+    '''Make the memory-mapped indexes the shared Lexicon and FormIndex of this process.'''
+    set_lexicon(load_lexicon(index_dir))
+    analyzer.set_form_index(load_form_index(index_dir))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the memory-mapped lexicon, full-form, senses and fuzzy indexes.")
+    parser.add_argument("--xml", default=None, help="path of the dictionary XML file")
+    parser.add_argument("--index-dir", default=None, help="directory of the index files (default: data)")
+    arguments = parser.parse_args(argv)
+    for path in build_indexes(arguments.xml, arguments.index_dir):
+        print(f"Wrote {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
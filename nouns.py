@@ -4,7 +4,12 @@ This module processes nouns to return paradigms.
 '''
 
 from exceptions import masc_xeno, fem_oiko_i, masc_xeno_nom_pl_a
+from paradigm_cache import memoize
+from declension import decline_cells
+from paradigm_types import NounParadigm
+from metrics import timed
 
+@timed("generate_obliquus")
 def generate_obliquus(word,gender):
     """
     Generate obliquus forms of a given word based on its gender and type.
@@ -54,6 +59,7 @@ def generate_obliquus(word,gender):
     return obliquus_singular, obliquus_plural, gender, noun_type
 
 
+@timed("generate_noun_paradigms")
 def generate_noun_paradigms(word, gender, animacy):
     """
     Generate noun paradigms (singular and plural forms) based on the word's properties.
@@ -81,6 +87,16 @@ def generate_noun_paradigms(word, gender, animacy):
     return paradigms
 
 
+@timed("cached_noun_paradigms")
+@memoize("noun_paradigms", convert=None)
+def cached_noun_paradigms(word, gender, animacy):
+    """
+    Return the paradigms of generate_noun_paradigms(word, gender, animacy) from the paradigm cache
+    as a read-only NounParadigm. Misses are declined with the compiled rule table in declension.py.
+    """
+    return NounParadigm(decline_cells(word, gender, animacy))
+
+
 def apply_case_rules(word, obliquus_singular, obliquus_plural, gender, noun_type, animacy, case, suffix_singular, suffix_plural):
     if case == "nominatív":
         return nominative_case(word, gender, noun_type, obliquus_plural)
@@ -163,6 +179,7 @@ def instrumental_case(word, obliquus_singular,obliquus_plural, gender, noun_type
         return obliquus_singular + suffix_singular, obliquus_plural + suffix_plural
 
 
+@timed("format_noun_paradigms")
 def format_noun_paradigms(forms):
     """
     Format noun paradigms for display.
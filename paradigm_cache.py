@@ -0,0 +1,152 @@
+"""
+This module memoizes paradigm generation.
+
+Paradigm generation is a pure function of its arguments and of the word lists in
+exceptions.py, so results are kept in bounded LRU caches created with memoize.
+The same cached object is returned to every caller, so results must be immutable:
+either paradigm_types objects or nested dicts frozen into read-only mappings. Use thaw
+to get a mutable (e.g. JSON-serializable) copy.
+
+Call invalidate() after changing the lists in exceptions.py, or invalidate_words() to
+drop the cached paradigms of some words (e.g. after they changed in the dictionary).
+"""
+
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import wraps
+from threading import Lock
+from types import MappingProxyType
+
+DEFAULT_MAXSIZE = 4096
+
+_caches = {}
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry beyond maxsize."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_compute(self, key, compute):
+        """Return the value cached for key, calling compute() to create it on a miss."""
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+        return value
+
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """Change the maximum number of entries, evicting the oldest ones if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self._data.clear()
+
+    def discard(self, predicate):
+        """Drop the entries whose key satisfies predicate and return how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def stats(self):
+        """Return the hit, miss and eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+def freeze(paradigms):
+    '''Return a read-only copy of nested paradigm dictionaries.'''
+    if isinstance(paradigms, dict):
+        return MappingProxyType({key: freeze(value) for key, value in paradigms.items()})
+    return paradigms
+
+
+def thaw(paradigms):
+    '''Return a mutable copy of (possibly frozen) nested paradigm mappings.'''
+    if isinstance(paradigms, Mapping):
+        return {key: thaw(value) for key, value in paradigms.items()}
+    return paradigms
+
+
+def memoize(name, maxsize=DEFAULT_MAXSIZE, convert=freeze):
+    '''
+    Decorate a paradigm function with an LRU cache registered under name.
+
+    Results are passed through convert (freeze by default) before they are cached;
+    use convert=None for functions that already return immutable objects.
+    '''
+    cache = LRUCache(maxsize)
+    _caches[name] = cache
+
+    def decorator(function):
+        def compute(args, kwargs):
+            result = function(*args, **kwargs)
+            return result if convert is None else convert(result)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return cache.get_or_compute(key, lambda: compute(args, kwargs))
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def configure(maxsize, name=None):
+    '''Set the maximum size of the cache called name, or of every cache.'''
+    for cache_name, cache in _caches.items():
+        if name is None or cache_name == name:
+            cache.resize(maxsize)
+
+
+def invalidate():
+    '''Clear every paradigm cache, e.g. after the lists in exceptions.py changed.'''
+    for cache in _caches.values():
+        cache.clear()
+
+
+def invalidate_words(words):
+    '''Drop the cached paradigms whose first argument is one of words; return how many were dropped.'''
+    words = set(words)
+    return sum(cache.discard(lambda key: bool(key[0]) and key[0][0] in words) for cache in _caches.values())
+
+
+def cache_stats():
+    '''Return the statistics of every cache by name.'''
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,123 @@
+"""
+This module defines compact, immutable paradigm objects.
+
+A NounParadigm or VerbParadigm stores its forms in one flat tuple whose layout is derived
+from the case list in declension.py and from tense_mapping in verbs_endings.py, instead of
+two or three levels of dicts. Identical forms within a paradigm (e.g. nominative and
+accusative, or imperfect and present conditional) share one string object.
+
+Both types are read-only mappings with the same keys as the nested dicts returned by
+generate_noun_paradigms and generate_verb_paradigms, so they work with
+format_noun_paradigms, format_verb_paradigms and anything else reading those dicts.
+"""
+
+from collections.abc import Mapping
+
+from declension import CASES, NUMBERS
+from verbs_endings import tense_mapping
+
+VERB_PERSONS = {tense: [2] if tense == 'imper' else [1, 2, 3] for tense in tense_mapping}
+VERB_NUMBERS = ['sg', 'pl']
+
+NOUN_CELLS = [(number, case) for number in NUMBERS for case in CASES]
+VERB_CELLS = [(tense, person, number)
+              for tense in tense_mapping
+              for person in VERB_PERSONS[tense]
+              for number in VERB_NUMBERS]
+
+
+def _build_layout(cells):
+    # Nested dict of keys with the cell index in the leaves
+    layout = {}
+    for index, keys in enumerate(cells):
+        level = layout
+        for key in keys[:-1]:
+            level = level.setdefault(key, {})
+        level[keys[-1]] = index
+    return layout
+
+
+class ParadigmView(Mapping):
+    """Read-only mapping over part of a paradigm's flat cell tuple."""
+
+    __slots__ = ("_cells", "_layout")
+
+    def __init__(self, cells, layout):
+        self._cells = cells
+        self._layout = layout
+
+    def __getitem__(self, key):
+        value = self._layout[key]
+        if isinstance(value, int):
+            return self._cells[value]
+        return ParadigmView(self._cells, value)
+
+    def __iter__(self):
+        return iter(self._layout)
+
+    def __len__(self):
+        return len(self._layout)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        """Return the forms as nested dicts."""
+        return {key: value.to_dict() if isinstance(value, ParadigmView) else value
+                for key, value in self.items()}
+
+
+class _Paradigm(ParadigmView):
+    __slots__ = ()
+    CELLS = []
+    LAYOUT = {}
+
+    def __init__(self, cells):
+        shared = {}
+        cells = tuple([shared.setdefault(cell, cell) for cell in cells])
+        if len(cells) != len(self.CELLS):
+            raise ValueError(f"{type(self).__name__} needs {len(self.CELLS)} forms, got {len(cells)}.")
+        super().__init__(cells, self.LAYOUT)
+
+    @classmethod
+    def from_dict(cls, paradigms):
+        """Create a paradigm from the nested dicts returned by the generator functions."""
+        cells = []
+        for keys in cls.CELLS:
+            value = paradigms
+            for key in keys:
+                value = value[key]
+            cells.append(value)
+        return cls(cells)
+
+    @property
+    def cells(self):
+        """The forms as a flat tuple in CELLS order."""
+        return self._cells
+
+    def __reduce__(self):
+        return type(self), (self._cells,)
+
+    def __hash__(self):
+        return hash((type(self).__name__, self._cells))
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self._cells == other._cells
+        return super().__eq__(other)
+
+
+class NounParadigm(_Paradigm):
+    """The 16 forms of a noun: singular cases, then plural cases, in CASES order."""
+
+    __slots__ = ()
+    CELLS = NOUN_CELLS
+    LAYOUT = _build_layout(NOUN_CELLS)
+
+
+class VerbParadigm(_Paradigm):
+    """The forms of a verb in VERB_CELLS order (tense, person, number)."""
+
+    __slots__ = ()
+    CELLS = VERB_CELLS
+    LAYOUT = _build_layout(VERB_CELLS)
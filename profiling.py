@@ -0,0 +1,185 @@
+"""
+This module profiles batch runs and user interface sessions.
+
+A Profiler combines three views of the same run:
+- a cProfile CPU profile, reported as the functions with the most time spent in them,
+- a tracemalloc snapshot, reported as the source lines that allocated the most memory,
+- stack samples taken every few milliseconds, written as collapsed stacks
+  ('module:function;module:function count' per line) for flamegraph.pl or speedscope.
+
+Profiling the current thread from start to stop suits batch runs; work done on another
+thread (such as the SearchWorker of the user interface) is profiled by calling it through
+wrap. cProfile slows the profiled code down, so compare timings only between profiled runs.
+
+Usage:
+    $ python batch.py words.txt -o paradigms.jsonl --profile batch
+    $ ROMA_PROFILE=session python user_interface.py
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.002
+DEFAULT_TOP = 25
+MEMORY_FRAMES = 10
+
+
+class Profiler:
+    """CPU profile, allocation snapshot and stack samples of the profiled code."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, memory_frames=MEMORY_FRAMES):
+        self.interval = interval
+        self.memory_frames = memory_frames
+        self.samples = Counter()
+        self.snapshot = None
+        self.peak_memory = None
+        self._profile = cProfile.Profile()
+        self._profiled_thread = None
+        self._active_threads = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+
+    def start(self, current_thread=True):
+        """
+        Start tracing allocations and sampling stacks.
+
+        With current_thread the calling thread is CPU-profiled and sampled until stop;
+        otherwise only calls made through wrap are.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.memory_frames)
+            self._started_tracemalloc = True
+        if current_thread:
+            self._enter()
+        self._stopped.clear()
+        self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        """Stop profiling and take the allocation snapshot."""
+        if self._profiled_thread == threading.get_ident():
+            self._exit()
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        if tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            self.snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _enter(self):
+        # cProfile traces a single thread, the one that first runs profiled code
+        with self._lock:
+            if self._profiled_thread is None:
+                self._profiled_thread = threading.get_ident()
+            if self._profiled_thread != threading.get_ident() or self._profiled_thread in self._active_threads:
+                return False
+            self._active_threads.add(self._profiled_thread)
+        self._profile.enable()
+        return True
+
+    def _exit(self):
+        self._profile.disable()
+        with self._lock:
+            self._active_threads.discard(threading.get_ident())
+
+    def wrap(self, function):
+        """Return function profiled whenever it is called (on the profiled thread)."""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self._enter():
+                return function(*args, **kwargs)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._exit()
+        return wrapper
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                threads = list(self._active_threads)
+            frames = sys._current_frames()
+            for thread in threads:
+                frame = frames.get(thread)
+                if frame is not None:
+                    self.samples[collapse_stack(frame)] += 1
+
+    def cpu_report(self, top=DEFAULT_TOP):
+        """Return the top functions by own time as a table."""
+        stats = pstats.Stats(self._profile, stream=io.StringIO()).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        lines = [f"{'calls':>10} {'own s':>9} {'total s':>9}  function"]
+        for (file_name, line, function_name), (_, calls, own_time, total_time, _) in ranked:
+            location = function_name if file_name == "~" else f"{os.path.basename(file_name)}:{line}({function_name})"
+            lines.append(f"{calls:>10} {own_time:>9.4f} {total_time:>9.4f}  {location}")
+        return "\n".join(lines)
+
+    def memory_report(self, top=DEFAULT_TOP):
+        """Return the top source lines by allocated memory still alive at stop."""
+        if self.snapshot is None:
+            return "No allocation snapshot."
+        lines = [f"Peak traced memory: {self.peak_memory / 1024:.1f} KiB",
+                 f"{'KiB':>10} {'blocks':>8}  allocation site"]
+        for statistic in self.snapshot.statistics("lineno")[:top]:
+            frame = statistic.traceback[0]
+            lines.append(f"{statistic.size / 1024:>10.1f} {statistic.count:>8}  "
+                         f"{os.path.basename(frame.filename)}:{frame.lineno}")
+        return "\n".join(lines)
+
+    def report(self, top=DEFAULT_TOP):
+        """Return the CPU and memory reports."""
+        return (f"Top functions by own time ({sum(self.samples.values())} stack samples):\n"
+                f"{self.cpu_report(top)}\n\nTop allocation sites:\n{self.memory_report(top)}\n")
+
+    def collapsed_stacks(self):
+        """Return the stack samples in the collapsed-stack format, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def save(self, prefix, top=DEFAULT_TOP):
+        '''
+        Write prefix.txt (report), prefix.prof (pstats), prefix.collapsed (stack samples)
+        and prefix.heap (tracemalloc snapshot); return the paths written.
+        '''
+        paths = [prefix + ".txt", prefix + ".prof", prefix + ".collapsed"]
+        with open(paths[0], "w", encoding="utf-8") as report_file:
+            report_file.write(self.report(top))
+        self._profile.dump_stats(paths[1])
+        with open(paths[2], "w", encoding="utf-8") as collapsed_file:
+            collapsed_file.write(self.collapsed_stacks())
+        if self.snapshot is not None:
+            paths.append(prefix + ".heap")
+            self.snapshot.dump(paths[3])
+        return paths
+
+
+def collapse_stack(frame):
+    '''Return the stack of frame as 'module:function;...' from the outermost call, without this module.'''
+    names = []
+    while frame is not None:
+        if frame.f_code.co_filename != __file__:
+            names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
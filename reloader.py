@@ -0,0 +1,157 @@
+"""
+This module reloads the dictionary while a program keeps running.
+
+A DictionaryReloader remembers a content hash of every Lemma element of SRO.xml. When the
+file changes, only Lemma elements with new hashes are parsed, and only the lexicon keys,
+Slovak lemmas and part of speech/gender lists touched by inserted, updated or deleted Lemma
+elements are rebuilt. At startup the Lexicon and the hashed and indexed Lemma elements come
+from compiled caches next to the XML file (see xml_parser.load_compiled), so a restart
+parses nothing unless the file changed. The new Lexicon (and FormIndex, if one was built)
+share everything else with the current ones and replace them together under
+search_handler.shared_lock (see analyzer.publish), so a search that is running keeps the
+objects it started with and never sees a half-updated index. Cached paradigms of the changed
+words are dropped.
+
+Usage:
+    reloader = DictionaryReloader()     # loads data/SRO.xml as the shared Lexicon
+    reloader.watch(interval=2.0)        # or call reloader.reload() after editing the file
+"""
+
+import os
+import threading
+from collections import Counter, namedtuple
+
+import analyzer
+from paradigm_cache import invalidate_words
+from search_handler import LEXICON_CACHE_VERSION, Lexicon, index_sense, set_lexicon
+from xml_parser import default_xml_path, iter_lemma_chunks, load_compiled, parse_lemma
+
+DEFAULT_INTERVAL = 2.0
+
+# Folded lemmas whose first Sense was inserted, changed or deleted by a reload
+ReloadResult = namedtuple("ReloadResult", ["inserted", "updated", "deleted"])
+
+
+def _file_state(file_path):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _senses(lemmas):
+    return (sense for _, senses in lemmas for sense in senses)
+
+
+def _index(chunk):
+    return tuple(filter(None, map(index_sense, parse_lemma(chunk))))
+
+
+def index_lemmas(xml_file_path):
+    """Return (content hash, index_sense tuples) of every Lemma element of the XML file in document order."""
+    return [(digest, _index(chunk)) for digest, chunk in iter_lemma_chunks(xml_file_path)]
+
+
+def _words(lexicon, key):
+    # Word information of every Sense of key, as indexed by the FormIndex
+    return analyzer.sense_words(lexicon.indexes.senses.get(key, ()))
+
+
+class DictionaryReloader:
+    """Keeps the shared Lexicon and FormIndex in step with a dictionary XML file."""
+
+    def __init__(self, xml_file_path=None, on_reload=None):
+        self.xml_file_path = xml_file_path or default_xml_path()
+        # Called with the ReloadResult after every reload that changed the dictionary
+        self.on_reload = on_reload
+        self.error = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watcher = None
+
+        while True:
+            # Both caches must describe the same version of the file
+            self._state = _file_state(self.xml_file_path)
+            self.lexicon = Lexicon.load(self.xml_file_path)
+            # (content hash, index_sense tuples) of every Lemma element in document order
+            self._lemmas = load_compiled("lemmas", index_lemmas, self.xml_file_path,
+                                         version=LEXICON_CACHE_VERSION)
+            if _file_state(self.xml_file_path) == self._state:
+                break
+        set_lexicon(self.lexicon)
+
+    def reload(self):
+        """Apply the changes of the XML file and return a ReloadResult."""
+        with self._lock:
+            state = _file_state(self.xml_file_path)
+            known = dict(self._lemmas)
+            lemmas = []
+            for digest, chunk in iter_lemma_chunks(self.xml_file_path):
+                if digest not in known:
+                    known[digest] = _index(chunk)
+                lemmas.append((digest, known[digest]))
+
+            old_counts = Counter(digest for digest, _ in self._lemmas)
+            new_counts = Counter(digest for digest, _ in lemmas)
+            changed = (old_counts - new_counts) + (new_counts - old_counts)
+            if not changed and [digest for digest, _ in lemmas] != [digest for digest, _ in self._lemmas]:
+                # Only the order changed: every Lemma counts as changed, as order decides the first Sense
+                changed = new_counts
+            keys, translation_keys, category_keys = set(), set(), set()
+            for digest in changed:
+                for key, translation_key, category, _ in known[digest]:
+                    keys.add(key)
+                    if translation_key:
+                        translation_keys.add(translation_key)
+                    if category is not None:
+                        category_keys.add(category)
+
+            previous = self.lexicon
+            lexicon = previous.updated(_senses(lemmas), keys, translation_keys, category_keys)
+            inserted, updated, deleted, removed_words, added_words = [], [], [], [], []
+            for key in sorted(keys):
+                old_senses = previous.indexes.senses.get(key)
+                new_senses = lexicon.indexes.senses.get(key)
+                if old_senses == new_senses:
+                    continue
+                (inserted if old_senses is None else deleted if new_senses is None else updated).append(key)
+                old_words, new_words = _words(previous, key), _words(lexicon, key)
+                removed_words += [word for word in old_words if word not in new_words]
+                added_words += [word for word in new_words if word not in old_words]
+
+            self._lemmas, self.lexicon = lemmas, lexicon
+            # The new FormIndex is built first, then both are replaced at once
+            analyzer.publish(lexicon, removed_words, added_words)
+            invalidate_words({word["word"] for word in removed_words + added_words})
+            self._state = state
+            result = ReloadResult(inserted, updated, deleted)
+        if self.on_reload is not None and any(result):
+            self.on_reload(result)
+        return result
+
+    def check(self):
+        """Reload if the file's size or modification time changed; return the ReloadResult or None."""
+        if _file_state(self.xml_file_path) == self._state:
+            return None
+        return self.reload()
+
+    def watch(self, interval=DEFAULT_INTERVAL):
+        """Check the file every interval seconds on a background thread until stop is called."""
+        self._stopped.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="dictionary-reloader", daemon=True)
+        self._watcher.start()
+        return self
+
+    def _watch(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.check()
+                self.error = None
+            except (OSError, ValueError) as e:
+                # E.g. the file is being written; the current dictionary stays and the next check retries
+                self.error = e
+
+    def stop(self):
+        """Stop watching the file."""
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
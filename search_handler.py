@@ -1,19 +1,36 @@
 """
 This module provides functions to search for words in the xml file.
 
+The dictionary is parsed once into a Lexicon that is shared by all searches.
+Besides the first Sense of every lemma, the Lexicon indexes all senses of a lemma, the
+lemmas of every part of speech and gender, and the Roma senses of every Slovak lemma.
+The Lexicon is stored in a compiled cache next to SRO.xml, so later starts skip parsing.
+Packaged executables load it from an artifact compiled by build_script.py instead.
 """
 
-from xml_parser import parse_xml_data
+import sys
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+from fuzzy import FuzzyIndex
+from metrics import timed, count
+from xml_parser import iter_senses, load_compiled, artifact_path, read_artifact, write_artifact
+
+# Bump when the structure of Lexicon entries or indexes changes to invalidate compiled caches
+LEXICON_CACHE_VERSION = 2
+GENDER_CATEGORIES = ("masculine", "feminine", "other")
 
 def clean_text(text):
     """Clean and normalize text, removing invisible characters."""
     cleaned_text = text.lower().replace('\n', '').replace('\t', '').replace('\r', '').replace('\u00a0', ' ')
     return cleaned_text.strip()  # Remove leading and trailing spaces
 
+SPECIAL_CHARACTERS_TABLE = str.maketrans("čťľšžýáíéóúŕäôĺňď", "ctlszyaieouraolnd")
+
+
 def replace_special_characters(word):
     """Replace special characters in a word."""
-    translation_table = str.maketrans("čťľšžýáíéóúŕäôĺňď", "ctlszyaieouraolnd")
-    return word.translate(translation_table)
+    return word.translate(SPECIAL_CHARACTERS_TABLE)
 
 def get_pos_category(pos_rom):
     """Determine part of speech category."""
@@ -35,43 +52,338 @@ def get_gender_category(pos_rom):
     else:
         return "other"
 
-def search_word(search_term):
-    """Search for a word in the XML file and return information about it."""
+def fold_lemma(text):
+    """Return the lookup key of a lemma: cleaned text without diacritics."""
+    return replace_special_characters(clean_text(text))
+
+
+# Secondary indexes of a Lexicon; the mappings may be read-only (see mmap_index).
+# Senses are cleaned (lemma_sk, lemma_rom, pos_rom, sense_number) tuples like
+# xml_parser.SenseRecord; plain tuples keep the compiled cache fast to load.
+#   senses:       folded lemmaROM -> tuple of senses, in document order
+#   translations: folded lemmaSK -> tuple of its Roma senses
+#   categories:   (part of speech, gender) category -> tuple of lemmaROM
+LexiconIndexes = namedtuple("LexiconIndexes", ["senses", "translations", "categories"])
+
+
+def index_sense(sense):
+    """
+    Return (key, translation key, category, sense) for a SenseRecord, or None without lemmaROM.
+
+    key is the folded lemmaROM, the translation key the folded lemmaSK (None without one),
+    category the (part of speech, gender) pair (None without posROM) and sense the cleaned
+    tuple stored in the indexes.
+    """
+    if sense.lemma_rom is None:
+        return None
+    lemma_rom = clean_text(sense.lemma_rom)
+    pos_rom = None if sense.pos_rom is None else clean_text(sense.pos_rom)
+    lemma_sk = clean_text(sense.lemma_sk) if sense.lemma_sk else None
+    record = (lemma_sk, lemma_rom, pos_rom, clean_text(sense.sense_number) if sense.sense_number else None)
+    return (
+        replace_special_characters(lemma_rom),
+        replace_special_characters(lemma_sk) if lemma_sk else None,
+        None if pos_rom is None else (get_pos_category(pos_rom), get_gender_category(pos_rom)),
+        record,
+    )
+
+
+def _collect(indexed_senses, keys=None, translation_keys=None, category_keys=None):
+    # Build the entries and indexes of indexed_senses, limited to the given keys unless they are None
+    entries, senses, translations, categories = {}, {}, {}, {}
+    for key, translation_key, category, record in indexed_senses:
+        if keys is None or key in keys:
+            senses.setdefault(key, []).append(record)
+            if key not in entries:
+                entries[key] = (record[1], record[2])
+        if translation_key and (translation_keys is None or translation_key in translation_keys):
+            translations.setdefault(translation_key, []).append(record)
+        if category is not None and (category_keys is None or category in category_keys):
+            # A dict keeps the lemmas unique and in document order
+            categories.setdefault(category, {})[record[1]] = None
+    return entries, LexiconIndexes(
+        {key: tuple(records) for key, records in senses.items()},
+        {key: tuple(records) for key, records in translations.items()},
+        {category: tuple(lemmas) for category, lemmas in categories.items()},
+    )
+
+
+def _replaced(mapping, keys, values):
+    # Copy of mapping with keys removed and then values added
+    copy = dict(mapping)
+    for key in keys:
+        copy.pop(key, None)
+    copy.update(values)
+    return copy
+
+
+def sense_information(sense):
+    """Return the word information of an indexed sense (categories are None without posROM)."""
+    lemma_sk, lemma_rom, pos_rom, sense_number = sense
+    return {
+        "word": lemma_rom,
+        "part_of_speech": None if pos_rom is None else get_pos_category(pos_rom),
+        "gender": None if pos_rom is None else get_gender_category(pos_rom),
+        "slovak": lemma_sk,
+        "sense_number": sense_number,
+    }
+
+
+class Lexicon:
+    """
+    In-memory index of the dictionary keyed by the folded lemma.
+
+    The entries hold the first Sense of every folded lemma, which matches the
+    document-order scan search_word used to perform; homographs, part of speech and
+    gender lists and Slovak lemmas are answered from the secondary indexes.
+    """
+
+    def __init__(self, entries, sorted_keys=None, indexes=None, fuzzy_index=None):
+        # folded lemma -> (lemma_rom, pos_rom or None); may be a read-only mapping (see mmap_index)
+        self._entries = entries
+        self._sorted_keys = sorted_keys
+        self._indexes = indexes
+        self._fuzzy_index = fuzzy_index
+
+    @classmethod
+    def from_senses(cls, senses):
+        """Build the index from SenseRecord tuples produced by xml_parser.iter_senses."""
+        return cls.from_indexed(filter(None, map(index_sense, senses)))
+
+    @classmethod
+    def from_indexed(cls, indexed_senses):
+        """Build the index from index_sense tuples in document order."""
+        entries, indexes = _collect(indexed_senses)
+        return cls(entries, indexes=indexes)
+
+    def updated(self, indexed_senses, keys, translation_keys=(), category_keys=()):
+        """
+        Return a new Lexicon in which only the given keys are rebuilt from indexed_senses.
+
+        indexed_senses are the index_sense tuples of the whole changed dictionary in
+        document order; keys, translation_keys and category_keys are the folded lemmas,
+        folded Slovak lemmas and categories touched by the change. Everything else,
+        including the sorted keys and the fuzzy index, is carried over, and this Lexicon
+        is left unchanged for the searches still using it.
+        """
+        keys, translation_keys, category_keys = set(keys), set(translation_keys), set(category_keys)
+        entries, indexes = _collect(indexed_senses, keys, translation_keys, category_keys)
+        current = self.indexes
+        lexicon = Lexicon(_replaced(self._entries, keys, entries), indexes=LexiconIndexes(
+            _replaced(current.senses, keys, indexes.senses),
+            _replaced(current.translations, translation_keys, indexes.translations),
+            _replaced(current.categories, category_keys, indexes.categories),
+        ))
+        removed = [key for key in keys if key in self._entries and key not in entries]
+        added = [key for key in keys if key in entries and key not in self._entries]
+        if self._sorted_keys is not None:
+            sorted_keys = list(self._sorted_keys)
+            for key in removed:
+                del sorted_keys[bisect_left(sorted_keys, key)]
+            for key in added:
+                insort(sorted_keys, key)
+            lexicon._sorted_keys = sorted_keys
+        if self._fuzzy_index is not None:
+            lexicon._fuzzy_index = self._fuzzy_index.updated(removed, added)
+        return lexicon
+
+    @classmethod
+    @timed("lexicon_load")
+    def load(cls, xml_file_path=None, use_cache=True):
+        """
+        Build the index from the XML file, reusing the compiled cache when it is valid.
+
+        A packaged executable loads the bundled artifact instead and only falls back to
+        the XML file when the artifact is missing or fails its checksum.
+        """
+        if xml_file_path is None and use_cache and getattr(sys, "frozen", False):
+            try:
+                return cls.from_artifact()
+            except (OSError, ValueError):
+                pass
+        if not use_cache:
+            return cls.from_senses(iter_senses(xml_file_path))
+        entries, indexes = load_compiled(
+            "lexicon",
+            lambda path: cls.from_senses(iter_senses(path)).compiled(),
+            xml_file_path,
+            version=LEXICON_CACHE_VERSION,
+        )
+        return cls(entries, indexes=LexiconIndexes(*indexes))
+
+    def compiled(self):
+        """Return the (entries, indexes) stored in compiled caches."""
+        return self._entries, tuple(self._indexes)
+
+    @classmethod
+    def from_artifact(cls, file_path=None):
+        """Load the index from a compiled artifact written by write_artifact."""
+        if file_path is None:
+            file_path = artifact_path("lexicon")
+        entries, sorted_keys, indexes = read_artifact(file_path, "lexicon", version=LEXICON_CACHE_VERSION)
+        return cls(entries, sorted_keys, LexiconIndexes(*indexes))
+
+    def save_artifact(self, file_path=None, source_digest=None):
+        """Write the index to a compiled artifact and return the artifact header."""
+        if file_path is None:
+            file_path = artifact_path("lexicon")
+        return write_artifact(file_path, "lexicon", (self._entries, self.sorted_keys, tuple(self._indexes)),
+                              version=LEXICON_CACHE_VERSION, source_digest=source_digest)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self):
+        """Return (folded lemma, (lemma_rom, pos_rom or None)) pairs."""
+        return self._entries.items()
+
+    def __contains__(self, search_term):
+        return fold_lemma(search_term) in self._entries
+
+    def lookup(self, search_term):
+        """
+        Return the word information for search_term or None if it is missing.
+
+        Raises ValueError when the matching Sense has no posROM element.
+        """
+        entry = self._entries.get(fold_lemma(search_term))
+        if entry is None:
+            return None
+        lemma_rom, pos_rom = entry
+        if pos_rom is None:
+            raise ValueError(f"No valid posROM element found for '{lemma_rom}'.")
+        return {
+            "word": lemma_rom,
+            "part_of_speech": get_pos_category(pos_rom),
+            "gender": get_gender_category(pos_rom),
+        }
+
+    def words(self):
+        """Yield the word information of every lemma that has a posROM element."""
+        for lemma_rom, pos_rom in self._entries.values():
+            if pos_rom is not None:
+                yield {
+                    "word": lemma_rom,
+                    "part_of_speech": get_pos_category(pos_rom),
+                    "gender": get_gender_category(pos_rom),
+                }
+
+    @property
+    def indexes(self):
+        """The LexiconIndexes; raises ValueError for a Lexicon built from entries only."""
+        if self._indexes is None:
+            raise ValueError("This lexicon has no secondary indexes.")
+        return self._indexes
+
+    def senses(self, search_term):
+        """Return the word information of every Sense of search_term (homographs included)."""
+        return [sense_information(sense) for sense in self.indexes.senses.get(fold_lemma(search_term), ())]
+
+    def translate(self, slovak_term):
+        """Return the word information of the Roma senses of a Slovak lemma."""
+        return [sense_information(sense) for sense in self.indexes.translations.get(fold_lemma(slovak_term), ())]
+
+    def lemmas(self, part_of_speech, gender=None):
+        """
+        Return the lemmas of a part of speech category ('noun', 'verb', 'množné' or 'other'),
+        optionally of one gender category; lemmas of each gender are in document order.
+        """
+        categories = self.indexes.categories
+        if gender is not None:
+            return list(categories.get((part_of_speech, gender), ()))
+        return [lemma for gender in GENDER_CATEGORIES for lemma in categories.get((part_of_speech, gender), ())]
+
+    @property
+    def sorted_keys(self):
+        """The folded lemmas in sorted order, sorted on first use (e.g. while the user interface preloads)."""
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self._entries)
+        return self._sorted_keys
+
+    def suggest(self, prefix, limit=10):
+        """Return up to limit lemmas whose folded form starts with prefix, in folded order."""
+        folded_prefix = fold_lemma(prefix)
+        if not folded_prefix:
+            return []
+
+        sorted_keys = self.sorted_keys
+        suggestions = []
+        index = bisect_left(sorted_keys, folded_prefix)
+        while index < len(sorted_keys) and len(suggestions) < limit:
+            key = sorted_keys[index]
+            if not key.startswith(folded_prefix):
+                break
+            suggestions.append(self._entries[key][0])
+            index += 1
+        return suggestions
+
+    @property
+    def fuzzy_index(self):
+        """The FuzzyIndex over the keys, built on first use."""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self._entries)
+        return self._fuzzy_index
+
+    def did_you_mean(self, search_term, limit=5):
+        """Return up to limit lemmas within a small edit distance of search_term, closest first."""
+        candidates = self.fuzzy_index.candidates(fold_lemma(search_term), limit=limit)
+        return [self._entries[key][0] for _, key in candidates]
+
+
+_lexicon = None
+# Guards the shared Lexicon and the shared FormIndex of analyzer, which reloader.py replaces together
+shared_lock = threading.RLock()
+
+
+def get_lexicon():
+    """Return the shared Lexicon, building it on first use."""
+    global _lexicon
+    with shared_lock:
+        if _lexicon is None:
+            _lexicon = Lexicon.load()
+        return _lexicon
+
+
+def set_lexicon(lexicon):
+    """Replace the shared Lexicon, e.g. with one loaded from another XML file."""
+    global _lexicon
+    with shared_lock:
+        _lexicon = lexicon
+
+
+@timed("search_word")
+def find_word(search_term):
+    """
+    Return information about a word, or the not-found message for a word missing from the dictionary.
+
+    Unlike search_word, errors are raised: ValueError when the matching Sense has no posROM element.
+    """
     try:
-        # Search for a word in the dictionary
-        # First parse the XML
-        root = parse_xml_data()
         search_term = clean_text(search_term)
+        # One Lexicon for the whole search, even if it is replaced meanwhile (see reloader.py)
+        lexicon = get_lexicon()
+        result = lexicon.lookup(search_term)
+        if result is not None:
+            count("search_word_total", "Searches by outcome", outcome="hit")
+            return result
 
-        # Get the list of sense entries generated by xml_parser.py
-        sense_entries = root.findall('.//Sense')
-
-        # Iterate through the sense entries
-        for sense_element in sense_entries:
-            # Find the lemmaROM within the current Sense
-            lemmaROM_elem = sense_element.find('./Definition/lemmaROM')
-            if lemmaROM_elem is not None:
-                lemma_rom = clean_text(lemmaROM_elem.text)
-
-                # Compare search_term and lemma_rom
-                if replace_special_characters(search_term) == replace_special_characters(lemma_rom):
-                    posROM_elem = sense_element.find('./posROM')
-                    if posROM_elem is not None and posROM_elem.text is not None:
-                        pos_rom = clean_text(posROM_elem.text)
-                        part_of_speech = get_pos_category(pos_rom)
-                        gender = get_gender_category(pos_rom)
-
-                        return {
-                            "word": lemma_rom,
-                            "part_of_speech": part_of_speech,
-                            "gender": gender,
-                        }
-                    raise ValueError(f"No valid posROM element found for '{lemma_rom}'.")
-                
         # If the word is not found, set an appropriate message and return
-        return f"Ma ruš! We do not have '{search_term}' in our dictionary."
+        message = f"Ma ruš! We do not have '{search_term}' in our dictionary."
+        candidates = lexicon.did_you_mean(search_term)
+        if candidates:
+            message += f" Did you mean: {', '.join(candidates)}?"
+        count("search_word_total", "Searches by outcome", outcome="miss")
+        return message
 
+    except Exception:
+        count("search_word_total", "Searches by outcome", outcome="error")
+        raise
 
+
+def search_word(search_term):
+    """Search for a word in the dictionary and return information about it."""
+    try:
+        return find_word(search_term)
     except Exception as e:
         # Handle exceptions, log the error, and provide a meaningful message to the user
         return f"An error occurred: {str(e)}"
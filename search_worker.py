@@ -0,0 +1,105 @@
+"""
+This module runs searches for the user interface on a background thread.
+
+Tkinter widgets may only be touched from the main thread, so the worker only computes
+results; the user interface collects them by calling poll from a root.after loop.
+Requests are coalesced: a request submitted while another one is still waiting replaces
+it, and results of superseded requests are dropped, so only the latest search is shown.
+
+An optional initializer (e.g. loading the lexicon) runs on the worker thread before the
+first search; searches submitted meanwhile wait and run as soon as it has finished. If it
+fails, the worker is still ready and its error attribute holds the exception.
+"""
+
+import queue
+import threading
+
+
+class SearchWorker:
+    """Background thread that applies search_function to the latest submitted arguments."""
+
+    def __init__(self, search_function, initializer=None):
+        self._search_function = search_function
+        self._initializer = initializer
+        self._ready = threading.Event()
+        self.progress = ""
+        # The exception raised by the initializer, if any
+        self.error = None
+        self._condition = threading.Condition()
+        self._pending = None
+        self._running = None
+        self._generation = 0
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="search-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, *args):
+        """Queue a search, superseding any earlier one, and return its request id."""
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, args)
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self):
+        """Drop the waiting request and ignore the result of the running one."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    @property
+    def ready(self):
+        """True once the initializer has finished."""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """Block until the initializer has finished; return ready."""
+        return self._ready.wait(timeout)
+
+    def report(self, message):
+        """Set the progress message; the initializer receives this as its argument."""
+        self.progress = message
+
+    @property
+    def busy(self):
+        """True while the latest request is waiting or running."""
+        with self._condition:
+            return self._pending is not None or self._running == self._generation
+
+    def poll(self):
+        """Return the (request_id, result) pairs finished since the last poll that are still current."""
+        with self._condition:
+            generation = self._generation
+        finished = []
+        while True:
+            try:
+                request_id, result = self._results.get_nowait()
+            except queue.Empty:
+                return finished
+            if request_id == generation:
+                finished.append((request_id, result))
+
+    def _run(self):
+        if self._initializer is not None:
+            try:
+                self._initializer(self.report)
+            except Exception as e:
+                # Searches will report the error themselves when they retry the load
+                self.error = e
+                self.report(f"An error occurred: {str(e)}")
+        self._ready.set()
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                request_id, args = self._pending
+                self._pending = None
+                self._running = request_id
+            try:
+                result = self._search_function(*args)
+            except Exception as e:
+                result = f"An error occurred: {str(e)}"
+            with self._condition:
+                self._running = None
+                if request_id == self._generation:
+                    self._results.put((request_id, result))
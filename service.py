@@ -0,0 +1,380 @@
+"""
+This module serves searches and paradigms over a local HTTP/JSON interface.
+
+The service runs on asyncio.start_server, keeps one preloaded Lexicon in memory and
+supports keep-alive connections. Single words are answered on the event loop; batch
+requests are split into chunks that run on a process pool, so the loop stays responsive.
+
+Endpoints (all responses are JSON):
+    GET  /search?word=phral
+    GET  /noun?word=phral&animacy=životné[&gender=masculine]
+    GET  /verb?word=dikhel            (also phrases containing a verb, e.g. "dikhel pes")
+    POST /batch  {"words": ["phral", "dikhel"], "animacy": "neživotné"}
+    GET  /metrics                     (Prometheus text; format=json for a JSON snapshot)
+
+Add format=text to /noun and /verb for the text shown by the user interface.
+Metrics are only collected when ROMA_METRICS is set (see metrics.py).
+
+With --processes N, N service processes share the port (SO_REUSEPORT) and the memory-mapped
+indexes of mmap_index, so every extra process starts without parsing the dictionary and
+adds little memory. --mmap uses those indexes in a single process.
+
+With --reload SECONDS, a single service process checks the XML file at that interval and
+applies its changes without a restart (see reloader.py); batch worker processes are
+replaced after each change.
+
+Usage:
+    $ python service.py --port 8765 --workers 4
+    $ python service.py --processes 4
+    $ python service.py --reload 2
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from batch import ANIMACY_CHOICES, load_dictionary, paradigm_records
+import metrics
+from mmap_index import ensure_indexes, use_mapped_indexes
+from nouns import cached_noun_paradigms, format_noun_paradigms
+from paradigm_cache import thaw
+from reloader import DictionaryReloader
+from search_handler import clean_text, find_word, get_lexicon
+from verbs import verb_paradigms, format_verb_paradigms
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+BATCH_CHUNKSIZE = 64
+MAX_BATCH_WORDS = 10000
+MAX_BODY_SIZE = 1 << 20
+MAX_HEADERS = 64
+KEEP_ALIVE_TIMEOUT = 15
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 413: "Payload Too Large", 422: "Unprocessable Content",
+           500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """An error answered with status and a JSON {"error": message} body."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _parameter(query, name, default=None):
+    values = query.get(name)
+    if not values:
+        if default is None:
+            raise HTTPError(400, f"Missing query parameter '{name}'.")
+        return default
+    return values[0]
+
+
+def _find_word(word):
+    # 404 for a word missing from the dictionary, 422 for an entry that cannot be used;
+    # other errors are answered with 500 by handle_connection
+    try:
+        search_results = find_word(word)
+    except ValueError as e:
+        raise HTTPError(422, str(e)) from e
+    if not isinstance(search_results, dict):
+        raise HTTPError(404, search_results)
+    return search_results
+
+
+def _animacy(value):
+    if value not in ANIMACY_CHOICES:
+        raise HTTPError(400, f"animacy must be one of: {', '.join(ANIMACY_CHOICES)}.")
+    return value
+
+
+class ParadigmService:
+    """
+    Request handlers and connection loop of the HTTP service.
+
+    executor runs the batch chunks; by default a ProcessPoolExecutor whose workers load
+    the dictionary once when they start. With mapped=True the dictionary is read from the
+    memory-mapped indexes in index_dir (see mmap_index.ensure_indexes) instead of the XML file.
+    With reload_interval the XML file is watched and reloaded when it changes.
+    """
+
+    def __init__(self, xml_file_path=None, workers=None, executor=None, mapped=False, index_dir=None,
+                 reload_interval=None):
+        self.xml_file_path = xml_file_path
+        self.workers = workers or os.cpu_count() or 1
+        self.mapped = mapped
+        self.index_dir = index_dir
+        self.reload_interval = reload_interval
+        self.reloader = None
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._executor_lock = threading.Lock()
+        self.routes = {
+            "/search": ("GET", self.search),
+            "/noun": ("GET", self.noun),
+            "/verb": ("GET", self.verb),
+            "/batch": ("POST", self.batch),
+            "/metrics": ("GET", self.metrics),
+        }
+
+    def start(self):
+        """Load the dictionary and start the batch executor."""
+        if self.mapped:
+            use_mapped_indexes(self.index_dir)
+        elif self.reload_interval:
+            self.reloader = DictionaryReloader(self.xml_file_path, on_reload=self._replace_executor)
+            self.reloader.watch(self.reload_interval)
+        else:
+            load_dictionary(self.xml_file_path)
+        # Build the did-you-mean index now rather than on the event loop at the first miss
+        # (the mapped one is read from its index file)
+        get_lexicon().fuzzy_index
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+    def _create_executor(self):
+        if self.mapped:
+            initializer, initargs = use_mapped_indexes, (self.index_dir,)
+        else:
+            initializer, initargs = load_dictionary, (self.xml_file_path,)
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=initializer, initargs=initargs)
+
+    def _replace_executor(self, result):
+        # Workers hold a copy of the dictionary; new ones load the reloaded file and running chunks finish
+        if not self._owns_executor:
+            return
+        with self._executor_lock:
+            previous, self._executor = self._executor, self._create_executor()
+        previous.shutdown(wait=False)
+
+    def close(self):
+        """Stop watching the dictionary and shut the batch executor down."""
+        if self.reloader is not None:
+            self.reloader.stop()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    async def search(self, query, body):
+        return _find_word(_parameter(query, "word"))
+
+    async def noun(self, query, body):
+        word = clean_text(_parameter(query, "word"))
+        animacy = _animacy(_parameter(query, "animacy", "neživotné"))
+        gender = query.get("gender", [None])[0]
+        if gender is None:
+            search_results = _find_word(word)
+            if search_results["part_of_speech"] != "noun":
+                raise HTTPError(404, f"Ma ruš! {search_results['word']} is not a noun.")
+            word, gender = search_results["word"], search_results["gender"]
+        elif gender not in ("masculine", "feminine", "other"):
+            raise HTTPError(400, "gender must be one of: masculine, feminine, other.")
+
+        paradigms = cached_noun_paradigms(word, gender, animacy)
+        result = {"word": word, "gender": gender, "animacy": animacy}
+        if query.get("format") == ["text"]:
+            result["text"] = ("Singulár:\n\n" + format_noun_paradigms(paradigms["Singulár"])
+                              + "\n\nPlurál:\n\n" + format_noun_paradigms(paradigms["Plurál"]))
+        else:
+            result["paradigms"] = thaw(paradigms)
+        return result
+
+    async def verb(self, query, body):
+        word = _parameter(query, "word").strip()
+        paradigms = verb_paradigms(word)
+        if paradigms is None:
+            raise HTTPError(404, f"Ma ruš! No paradigms for {word} available.")
+        if query.get("format") == ["text"]:
+            return {"word": word, "text": format_verb_paradigms(paradigms)}
+        return {"word": word, "paradigms": thaw(paradigms)}
+
+    async def batch(self, query, body):
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}") from e
+        words = request.get("words") if isinstance(request, dict) else None
+        if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+            raise HTTPError(400, "The body must be a JSON object with a list of strings in 'words'.")
+        if len(words) > MAX_BATCH_WORDS:
+            raise HTTPError(413, f"At most {MAX_BATCH_WORDS} words per batch.")
+        animacy = _animacy(request.get("animacy", "neživotné"))
+
+        loop = asyncio.get_running_loop()
+        chunks = [words[start:start + BATCH_CHUNKSIZE] for start in range(0, len(words), BATCH_CHUNKSIZE)]
+        with self._executor_lock:
+            futures = [loop.run_in_executor(self._executor, paradigm_records, chunk, animacy) for chunk in chunks]
+        results = await asyncio.gather(*futures)
+        return {"records": [record for chunk_records in results for record in chunk_records]}
+
+    async def metrics(self, query, body):
+        # Metrics of this process; batch chunks run in the executor are not included
+        if _parameter(query, "format", "prometheus") == "json":
+            return metrics.snapshot()
+        return metrics.to_prometheus()
+
+    async def dispatch(self, method, target, body):
+        """Return the (status, payload) answering one request."""
+        url = urlsplit(target)
+        route = self.routes.get(url.path)
+        if route is None:
+            raise HTTPError(404, f"Unknown endpoint {url.path}.")
+        route_method, handler = route
+        if method != route_method:
+            raise HTTPError(405, f"Use {route_method} for {url.path}.")
+        return 200, await handler(parse_qs(url.query), body)
+
+    async def handle_connection(self, reader, writer):
+        """Answer requests on one connection until the client or the keep-alive timeout closes it."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    await self._write_response(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, target, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    status, payload = 500, {"error": f"An error occurred: {str(e)}"}
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        # Returns None when the client closed the connection between requests
+        request_line = await reader.readline()
+        while request_line in (b"\r\n", b"\n"):
+            # Tolerate blank lines after a previous request (RFC 9112 section 2.2)
+            request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError as e:
+            raise HTTPError(400, "Malformed request line.") from e
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(400, "Too many headers.")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError as e:
+            raise HTTPError(400, "Invalid Content-Length.") from e
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, f"The body may have at most {MAX_BODY_SIZE} bytes.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, version.upper(), headers, body
+
+    async def _write_response(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, xml_file_path=None,
+                mapped=False, index_dir=None, reuse_port=False, reload_interval=None):
+    '''Run the service until it is cancelled.'''
+    service = ParadigmService(xml_file_path, workers, mapped=mapped, index_dir=index_dir,
+                              reload_interval=reload_interval)
+    service.start()
+    try:
+        server = await asyncio.start_server(service.handle_connection, host, port, reuse_port=reuse_port or None)
+        print(f"Serving {len(get_lexicon())} words on http://{host}:{port}/ (process {os.getpid()})")
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def run_process(host, port, workers, xml_file_path, index_dir):
+    '''Entry point of one of several service processes sharing the port and the indexes.'''
+    try:
+        asyncio.run(serve(host, port, workers, xml_file_path, mapped=True, index_dir=index_dir, reuse_port=True))
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Roma paradigms over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for batch requests, per service process (default: CPUs / processes)")
+    parser.add_argument("--processes", type=int, default=1, help="service processes sharing the port (default: 1)")
+    parser.add_argument("--mmap", action="store_true", help="use the memory-mapped indexes (implied by --processes)")
+    parser.add_argument("--index-dir", default=None, help="directory of the memory-mapped indexes (default: data)")
+    parser.add_argument("--xml", default=None, help="path of the dictionary XML file")
+    parser.add_argument("--reload", type=float, default=None, metavar="SECONDS",
+                        help="check the XML file every SECONDS and apply its changes without a restart")
+    arguments = parser.parse_args(argv)
+    if arguments.processes > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        parser.error("--processes needs SO_REUSEPORT, which this platform does not support")
+    if arguments.reload and (arguments.processes > 1 or arguments.mmap):
+        parser.error("--reload works with a single process that reads the XML file (not with --processes or --mmap)")
+    return arguments
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    if arguments.processes > 1 or arguments.mmap:
+        # Build the shared indexes once, before any service process opens them
+        ensure_indexes(arguments.xml, arguments.index_dir)
+    try:
+        if arguments.processes == 1:
+            asyncio.run(serve(arguments.host, arguments.port, arguments.workers, arguments.xml,
+                              mapped=arguments.mmap, index_dir=arguments.index_dir,
+                              reload_interval=arguments.reload))
+            return
+        workers = arguments.workers or max(1, (os.cpu_count() or 1) // arguments.processes)
+        processes = [
+            multiprocessing.Process(target=run_process, args=(arguments.host, arguments.port, workers,
+                                                              arguments.xml, arguments.index_dir))
+            for _ in range(arguments.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
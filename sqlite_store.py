@@ -0,0 +1,253 @@
+"""
+This module stores the dictionary in a local SQLite database.
+
+It is an optional alternative to the in-memory Lexicon in search_handler: the data
+stays on disk, several processes can read the same database concurrently and besides
+exact lookups it supports prefix and substring searches (FTS5 over lemmas and their
+Slovak translations, or LIKE when SQLite was built without FTS5). All searches use the
+same folding as search_handler.fold_lemma.
+
+Usage:
+    $ python sqlite_store.py kam
+"""
+
+import os
+import sqlite3
+import sys
+
+from search_handler import clean_text, fold_lemma, get_pos_category, get_gender_category
+from xml_parser import default_xml_path, file_digest, iter_senses
+
+# Bump when the schema changes to force a rebuild of existing databases
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE senses (
+    id INTEGER PRIMARY KEY,
+    folded_lemma TEXT NOT NULL,
+    lemma_rom TEXT NOT NULL,
+    pos_rom TEXT,
+    pos_category TEXT NOT NULL,
+    gender TEXT NOT NULL,
+    lemma_sk TEXT,
+    sense_number TEXT
+);
+CREATE INDEX senses_folded_lemma ON senses (folded_lemma);
+CREATE INDEX senses_category ON senses (pos_category, gender);
+"""
+
+# The trigram tokenizer makes MATCH a substring search; older SQLite builds
+# fall back to the default tokenizer and LIKE for substrings, and builds without
+# FTS5 to a plain table of the folded texts searched with LIKE.
+FTS_TABLES = (
+    ("trigram", "CREATE VIRTUAL TABLE senses_fts USING fts5(lemma_rom, lemma_sk, tokenize='trigram')"),
+    ("unicode61", "CREATE VIRTUAL TABLE senses_fts USING fts5(lemma_rom, lemma_sk)"),
+    ("none", "CREATE TABLE senses_fts (lemma_rom TEXT NOT NULL, lemma_sk TEXT NOT NULL)"),
+)
+
+
+def default_db_path(xml_file_path=None):
+    '''Return the database path used for xml_file_path'''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    return os.path.splitext(xml_file_path)[0] + ".sqlite3"
+
+
+def _source_meta(xml_file_path):
+    stat = os.stat(xml_file_path)
+    return {
+        "schema_version": str(SCHEMA_VERSION),
+        "size": str(stat.st_size),
+        "sha256": file_digest(xml_file_path),
+    }
+
+
+def build_store(db_path=None, xml_file_path=None):
+    '''Import SRO.xml into a new SQLite database at db_path and return the path.'''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    if db_path is None:
+        db_path = default_db_path(xml_file_path)
+    meta = _source_meta(xml_file_path)
+
+    temp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.executescript(SCHEMA)
+        for tokenizer, statement in FTS_TABLES:
+            try:
+                connection.execute(statement)
+                meta["fts_tokenizer"] = tokenizer
+                break
+            except sqlite3.OperationalError:
+                continue
+
+        with connection:
+            for sense in iter_senses(xml_file_path):
+                if sense.lemma_rom is None:
+                    continue
+                lemma_rom = clean_text(sense.lemma_rom)
+                pos_rom = None if sense.pos_rom is None else clean_text(sense.pos_rom)
+                lemma_sk = None if sense.lemma_sk is None else clean_text(sense.lemma_sk)
+                cursor = connection.execute(
+                    "INSERT INTO senses (folded_lemma, lemma_rom, pos_rom, pos_category, gender, lemma_sk, sense_number)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        fold_lemma(lemma_rom),
+                        lemma_rom,
+                        pos_rom,
+                        get_pos_category(pos_rom or ""),
+                        get_gender_category(pos_rom or ""),
+                        lemma_sk,
+                        None if sense.sense_number is None else sense.sense_number.strip(),
+                    ),
+                )
+                connection.execute(
+                    "INSERT INTO senses_fts (rowid, lemma_rom, lemma_sk) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, fold_lemma(lemma_rom), fold_lemma(lemma_sk or "")),
+                )
+            connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+    except BaseException:
+        connection.close()
+        os.remove(temp_path)
+        raise
+    connection.close()
+
+    os.replace(temp_path, db_path)
+    return db_path
+
+
+def _is_current(db_path, xml_file_path):
+    try:
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return False
+    try:
+        stored = dict(connection.execute("SELECT key, value FROM meta"))
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+    if stored.get("schema_version") != str(SCHEMA_VERSION):
+        return False
+    if stored.get("size") != str(os.stat(xml_file_path).st_size):
+        return False
+    return stored.get("sha256") == file_digest(xml_file_path)
+
+
+def _row_to_result(row):
+    lemma_rom, pos_rom, lemma_sk = row
+    return {
+        "word": lemma_rom,
+        "part_of_speech": get_pos_category(pos_rom or ""),
+        "gender": get_gender_category(pos_rom or ""),
+        "translation": lemma_sk,
+    }
+
+
+class LexiconStore:
+    """
+    Read-only access to a dictionary database created by build_store.
+
+    Each instance owns one connection; open one store per thread or process.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'fts_tokenizer'").fetchone()
+        self._tokenizer = None if row is None else row[0]
+
+    @classmethod
+    def open(cls, db_path=None, xml_file_path=None):
+        """Open the database for xml_file_path, (re)building it when it is missing or stale."""
+        if xml_file_path is None:
+            xml_file_path = default_xml_path()
+        if db_path is None:
+            db_path = default_db_path(xml_file_path)
+        if not _is_current(db_path, xml_file_path):
+            build_store(db_path, xml_file_path)
+        return cls(db_path)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def lookup(self, search_term):
+        """
+        Return the word information for search_term or None, like Lexicon.lookup.
+
+        Raises ValueError when the matching Sense has no posROM element.
+        """
+        row = self._connection.execute(
+            "SELECT lemma_rom, pos_rom FROM senses WHERE folded_lemma = ? ORDER BY id LIMIT 1",
+            (fold_lemma(search_term),),
+        ).fetchone()
+        if row is None:
+            return None
+        lemma_rom, pos_rom = row
+        if pos_rom is None:
+            raise ValueError(f"No valid posROM element found for '{lemma_rom}'.")
+        return {
+            "word": lemma_rom,
+            "part_of_speech": get_pos_category(pos_rom),
+            "gender": get_gender_category(pos_rom),
+        }
+
+    def search_prefix(self, prefix, limit=20):
+        """Return senses whose folded lemma starts with prefix, ordered by lemma."""
+        folded = fold_lemma(prefix)
+        rows = self._connection.execute(
+            "SELECT lemma_rom, pos_rom, lemma_sk FROM senses"
+            " WHERE folded_lemma >= ? AND folded_lemma < ? ORDER BY folded_lemma, id LIMIT ?",
+            (folded, folded + "\U0010ffff", limit),
+        )
+        return [_row_to_result(row) for row in rows]
+
+    def search_substring(self, text, limit=20):
+        """Return senses whose lemma or Slovak translation contains text."""
+        folded = fold_lemma(text)
+        if self._tokenizer == "trigram" and len(folded) >= 3:
+            rows = self._connection.execute(
+                "SELECT s.lemma_rom, s.pos_rom, s.lemma_sk FROM senses_fts"
+                " JOIN senses AS s ON s.id = senses_fts.rowid"
+                " WHERE senses_fts MATCH ? ORDER BY s.id LIMIT ?",
+                ('"' + folded.replace('"', '""') + '"', limit),
+            )
+        else:
+            pattern = "%" + folded.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = self._connection.execute(
+                "SELECT s.lemma_rom, s.pos_rom, s.lemma_sk FROM senses_fts"
+                " JOIN senses AS s ON s.id = senses_fts.rowid"
+                " WHERE senses_fts.lemma_rom LIKE ? ESCAPE '\\' OR senses_fts.lemma_sk LIKE ? ESCAPE '\\'"
+                " ORDER BY s.id LIMIT ?",
+                (pattern, pattern, limit),
+            )
+        return [_row_to_result(row) for row in rows]
+
+    def find_by_category(self, part_of_speech, gender=None, limit=None):
+        """Return senses of a part of speech (and gender) using the category index."""
+        query = "SELECT lemma_rom, pos_rom, lemma_sk FROM senses WHERE pos_category = ?"
+        parameters = [part_of_speech]
+        if gender is not None:
+            query += " AND gender = ?"
+            parameters.append(gender)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        return [_row_to_result(row) for row in self._connection.execute(query, parameters)]
+
+
+if __name__ == "__main__":
+    with LexiconStore.open() as store:
+        for result in store.search_prefix(sys.argv[1] if len(sys.argv) > 1 else "kam"):
+            print(result)
@@ -0,0 +1,186 @@
+"""
+This module generates synthetic dictionaries in the SRO.xml format for scale testing.
+
+The output has the structure of data/SRO.xml (Lemma, lemmaSK, posSK, Sense,
+Sense.SenseNumber, Definition, lemmaROM, posROM, Example, Example.Example,
+Example.Translation) and is written as a stream, so dictionaries of a million senses
+need little memory. The same seed always produces the same file.
+
+Romani lemmas are built from syllables with the endings of the generate_obliquus noun
+classes and of the -al/-el/-ol verb classes. Every lemmaROM starts with a fixed number of
+syllables encoding its sequence number in an alphabet that stays unambiguous after
+search_handler.fold_lemma, so lemmas are unique without remembering the ones already written.
+
+Usage:
+    $ python synthetic_sro.py SRO.large.xml --senses 1000000 --seed 7
+"""
+
+import argparse
+import random
+from xml.sax.saxutils import escape
+
+# Onsets that remain distinct after replace_special_characters (e.g. 'čh' but not 'ch')
+CODE_ONSETS = ["b", "č", "čh", "d", "dž", "g", "j", "k", "kh", "ľ", "m", "ň", "p", "ph",
+               "r", "š", "t", "th", "v", "x", "ž"]
+VOWELS = ["a", "e", "i", "o", "u"]
+CODE_SYLLABLES = [onset + vowel for onset in CODE_ONSETS for vowel in VOWELS]
+FILLER_SYLLABLES = ["ka", "ro", "ľi", "ňa", "ťo", "ďu", "bo", "mi", "sa", "ve", "do", "ga", "ču", "že"]
+CONSONANTS = ["ľ", "ň", "ť", "č", "š", "ž", "r", "l", "n", "k", "v", "m", "d", "s", "g", "j", "h"]
+# Stem-final consonants of -el verbs with a known perfect root (see verbs.define_perf_root)
+VERB_CONSONANTS = ["l", "n", "r", "v", "č", "g", "j", "k", "h", "m", "d", "s", "š", "ť"]
+
+# (weight, class name, posROM and posSK, lemmaROM endings)
+NOUN_CLASSES = [
+    (6, "abstract", "(podstatné meno, mužský rod)", ["iben", "ipen", "ben", "pen"]),
+    (8, "xeno_masculine", "(podstatné meno, mužský rod)", ["is", "os", "us", "as"]),
+    (8, "xeno_feminine", "(podstatné meno, ženský rod)", ["a"]),
+    (8, "oiko_feminine_i", "(podstatné meno, ženský rod)", ["i"]),
+    (10, "oiko_masculine_o", "(podstatné meno, mužský rod)", ["o"]),
+    (14, "oiko_masculine", "(podstatné meno, mužský rod)", [""]),
+    (6, "oiko_feminine", "(podstatné meno, ženský rod)", [""]),
+    (1, "plural", "(podstatné meno, množné číslo)", ["a"]),
+]
+VERB_CLASSES = [
+    (5, "verb_al", "(sloveso)", ["al"]),
+    (14, "verb_el", "(sloveso)", ["el"]),
+    (6, "verb_ol", "(sloveso)", ["ol"]),
+]
+OTHER_CLASSES = [
+    (6, "phrase", "(slovné spojenie)", None),
+    (5, "adjective", "(prídavné meno)", ["o"]),
+    (3, "adverb", "(príslovka)", ["es"]),
+]
+WORD_CLASSES = NOUN_CLASSES + VERB_CLASSES + OTHER_CLASSES
+
+SLOVAK_SYLLABLES = ["ná", "ko", "le", "pá", "ri", "to", "va", "ži", "mô", "ča", "ste", "ľu", "ďa",
+                    "ňo", "sú", "bý", "dé", "ho", "ja", "zá", "ťa", "pre", "kra", "vy", "šo", "te"]
+SLOVAK_WORDS = ["môj", "veľmi", "pekný", "dom", "v", "na", "je", "sa", "to", "ako", "čo", "ďaleko",
+                "ľudia", "žena", "deti", "robiť", "ísť", "starý", "mladý", "prísť"]
+ROMANI_WORDS = ["o", "miro", "andre", "pes", "na", "sar", "čačo", "phuro", "terno", "but", "khere",
+                "avel", "kerel", "le", "la", "te", "jekh", "duj", "šukar"]
+SENSE_COUNTS = ([1, 2, 3], [70, 20, 10])
+
+
+def _code(number, length):
+    # Fixed-length base-len(CODE_SYLLABLES) representation of number
+    syllables = []
+    for _ in range(length):
+        number, remainder = divmod(number, len(CODE_SYLLABLES))
+        syllables.append(CODE_SYLLABLES[remainder])
+    return "".join(syllables)
+
+
+def code_length(count):
+    '''Return the number of code syllables needed for count distinct lemmas'''
+    length = 1
+    while len(CODE_SYLLABLES) ** length < count:
+        length += 1
+    return length
+
+
+class SyntheticDictionary:
+    """Deterministic source of synthetic lemmas, senses and examples."""
+
+    def __init__(self, senses, seed=0, example_rate=0.6):
+        self.random = random.Random(seed)
+        self.senses = senses
+        self.example_rate = example_rate
+        self._code_length = max(2, code_length(senses))
+        self._counter = 0
+        self._weights = [weight for weight, *_ in WORD_CLASSES]
+
+    def _lemma_rom(self, word_class):
+        _, name, _, endings = word_class
+        stem = _code(self._counter, self._code_length)
+        self._counter += 1
+        if self.random.random() < 0.3:
+            stem += self.random.choice(FILLER_SYLLABLES)
+        if name == "phrase":
+            verb = stem + self.random.choice(VERB_CONSONANTS) + "el"
+            return f"{verb} {self.random.choice(['pes', 'buti', 'andre', 'avri', 'upre'])}"
+        ending = self.random.choice(endings)
+        if name == "abstract":
+            return stem + ending
+        return stem + self.random.choice(VERB_CONSONANTS if ending == "el" else CONSONANTS) + ending
+
+    def _slovak_word(self):
+        return "".join(self.random.choice(SLOVAK_SYLLABLES) for _ in range(self.random.randint(2, 3)))
+
+    def _example(self, lemma_sk, lemma_rom):
+        slovak = self.random.sample(SLOVAK_WORDS, self.random.randint(1, 4)) + [lemma_sk]
+        romani = self.random.sample(ROMANI_WORDS, self.random.randint(1, 4)) + [lemma_rom]
+        self.random.shuffle(slovak)
+        self.random.shuffle(romani)
+        return (f"<Example><Example.Example> {escape(' '.join(slovak))}</Example.Example>"
+                f"<Example.Translation> {escape(' '.join(romani))}</Example.Translation></Example>")
+
+    def _examples(self, lemma_sk, lemma_rom):
+        count = 0
+        while self.random.random() < self.example_rate / (1 + self.example_rate) and count < 5:
+            count += 1
+        if not count:
+            return ""
+        return ":" + "".join(self._example(lemma_sk, lemma_rom) for _ in range(count))
+
+    def lemmas(self):
+        """Yield (Lemma XML, number of senses, word class name) until the requested senses are written."""
+        remaining = self.senses
+        while remaining > 0:
+            word_class = self.random.choices(WORD_CLASSES, self._weights)[0]
+            _, name, pos, _ = word_class
+            lemma_sk = self._slovak_word()
+            count = min(remaining, self.random.choices(*SENSE_COUNTS)[0])
+            remaining -= count
+
+            parts = [f"<Lemma><lemmaSK>{escape(lemma_sk)}</lemmaSK> <posSK>{pos}</posSK>"]
+            lemma_rom = None
+            for number in range(1, count + 1):
+                parts.append("<Sense>")
+                if count > 1:
+                    parts.append(f" <Sense.SenseNumber>{number}</Sense.SenseNumber>")
+                # Later senses sometimes only add examples, like in SRO.xml
+                if number == 1 or self.random.random() < 0.85:
+                    lemma_rom = self._lemma_rom(word_class)
+                    parts.append(f"<Definition><lemmaROM> {escape(lemma_rom)}</lemmaROM></Definition> "
+                                 f"<posROM>{pos}</posROM>")
+                parts.append(self._examples(lemma_sk, lemma_rom))
+                parts.append("</Sense>")
+            parts.append("</Lemma>\n")
+            yield "".join(parts), count, name
+
+
+def generate_sro(output, senses=10000, seed=0, example_rate=0.6):
+    '''
+    Write a synthetic dictionary with senses Sense elements to output (a path or a text file).
+
+    example_rate is the mean number of examples per sense. Returns the number of
+    lemmas and senses written and the number of lemmas per word class.
+    '''
+    if isinstance(output, str):
+        with open(output, "w", encoding="utf-8") as output_file:
+            return generate_sro(output_file, senses, seed, example_rate)
+
+    statistics = {"lemmas": 0, "senses": 0, "classes": {}}
+    output.write("<root>\n")
+    for lemma, count, name in SyntheticDictionary(senses, seed, example_rate).lemmas():
+        output.write(lemma)
+        statistics["lemmas"] += 1
+        statistics["senses"] += count
+        statistics["classes"][name] = statistics["classes"].get(name, 0) + 1
+    output.write("</root>\n")
+    return statistics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic SRO.xml dictionary.")
+    parser.add_argument("output", help="path of the XML file to write")
+    parser.add_argument("--senses", type=int, default=10000, help="number of Sense elements (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--example-rate", type=float, default=0.6, help="mean examples per sense (default: 0.6)")
+    arguments = parser.parse_args(argv)
+    statistics = generate_sro(arguments.output, arguments.senses, arguments.seed, arguments.example_rate)
+    print(f"Wrote {statistics['lemmas']} lemmas with {statistics['senses']} senses to {arguments.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,49 @@ This module contains unit tests for the Roma Paradigm Generator application.
 
 import unittest
 import csv
-from search_handler import clean_text, replace_special_characters, get_pos_category, get_gender_category, search_word
-from nouns import generate_obliquus, generate_noun_paradigms
+import os
+import tempfile
+from search_handler import clean_text, replace_special_characters, get_pos_category, get_gender_category, search_word, Lexicon, set_lexicon, get_lexicon
+from xml_parser import iter_senses, iter_example_translations, SenseRecord, load_compiled, cache_path, write_artifact, read_artifact, file_digest
+from sqlite_store import LexiconStore
+import sqlite_store
+from fuzzy import FuzzyIndex, edit_distance
+import analyzer
+from analyzer import FormIndex, Analysis
+from reloader import DictionaryReloader
+from annotator import annotate, annotated_lines, format_annotation
+from batch import generate_records
+from export import export_paradigms, iter_lemmas, write_checkpoint
+from nouns import generate_obliquus, generate_noun_paradigms, cached_noun_paradigms
+from verbs import generate_verb_paradigms, cached_verb_paradigms, replace_pes_forms
+from paradigm_cache import LRUCache, invalidate, invalidate_words, thaw
+from declension import decline, classify, find_mismatches, decline_cells
+from paradigm_types import NounParadigm, VerbParadigm
+from nouns import format_noun_paradigms
+from verbs import format_verb_paradigms
+from search_worker import SearchWorker
+from user_interface import BENCHMARK_WORD, StartupTimer, parse_arguments
+from service import ParadigmService
+from benchmark import scaled_xml, run_benchmarks, compare_results
+from synthetic_sro import generate_sro
+import metrics
+from profiling import Profiler
+from mmap_index import build_indexes, ensure_indexes, load_lexicon, load_form_index, MappedTable
+import asyncio
+import http.client
+import io
+import json
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import time
+import tracemalloc
+try:
+    import numpy
+    from vectorized import conjugate_batch, decline_batch
+except ImportError:
+    numpy = None
 # from user_interface import perform_search
 
 
@@ -77,6 +118,447 @@ class TestSearchHandler(unittest.TestCase):
 
 
 
+SAMPLE_XML = """<root>
+<Lemma><lemmaSK>brat</lemmaSK> <posSK>(podstatné meno, mužský rod)</posSK><Sense><Definition><lemmaROM> phral</lemmaROM></Definition> <posROM>(podstatné meno, mužský rod)</posROM></Sense></Lemma>
+<Lemma><lemmaSK>žena</lemmaSK> <posSK>(podstatné meno, ženský rod)</posSK><Sense> <Sense.SenseNumber>1</Sense.SenseNumber><Definition><lemmaROM> džuvľi</lemmaROM></Definition> <posROM>(podstatné meno, ženský rod)</posROM></Sense></Lemma>
+<Lemma><lemmaSK>vidieť</lemmaSK> <posSK>(sloveso)</posSK><Sense> <Sense.SenseNumber>1</Sense.SenseNumber><Definition><lemmaROM> dikhel</lemmaROM></Definition> <posROM>(sloveso)</posROM>:<Example><Example.Example> vidím</Example.Example><Example.Translation> dikhav</Example.Translation></Example></Sense></Lemma>
+<Lemma><lemmaSK>vidieť</lemmaSK> <posSK>(sloveso)</posSK><Sense> <Sense.SenseNumber>2</Sense.SenseNumber><Definition><lemmaROM> Dikhel</lemmaROM></Definition> <posROM>(sloveso, zvratné)</posROM></Sense></Lemma>
+<Lemma><lemmaSK>dom</lemmaSK> <posSK>(podstatné meno, mužský rod)</posSK><Sense><Definition><lemmaROM> kher</lemmaROM></Definition></Sense></Lemma>
+</root>
+"""
+
+
+def write_sample_xml(directory, content=SAMPLE_XML):
+    """Write an XML dictionary into directory and return its path."""
+    xml_path = os.path.join(directory, "SRO.xml")
+    with open(xml_path, "w", encoding="utf-8") as xml_file:
+        xml_file.write(content)
+    return xml_path
+
+
+class TestXmlParser(unittest.TestCase):
+    '''Test cases for the xml_parser module.'''
+    def test_iter_senses(self):
+        '''iter_senses yields one record per Sense with its Slovak lemma.'''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            senses = list(iter_senses(write_sample_xml(tmp_dir)))
+
+        self.assertEqual(len(senses), 5)
+        self.assertEqual(senses[0], SenseRecord("brat", " phral", "(podstatné meno, mužský rod)", None))
+        self.assertEqual(senses[2], SenseRecord("vidieť", " dikhel", "(sloveso)", "1"))
+        self.assertEqual(senses[4].pos_rom, None)
+
+    def test_iter_senses_missing_file(self):
+        '''A missing file raises FileNotFoundError.'''
+        with self.assertRaises(FileNotFoundError):
+            list(iter_senses("missing/SRO.xml"))
+
+
+class TestCompiledCache(unittest.TestCase):
+    '''Test cases for the compiled cache in xml_parser.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+        self.builds = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def builder(self, xml_file_path):
+        self.builds += 1
+        return [sense.lemma_rom for sense in iter_senses(xml_file_path)]
+
+    def test_cache_is_reused(self):
+        '''The second load reads the cache instead of calling the builder.'''
+        first = load_compiled("test", self.builder, self.xml_path)
+        second = load_compiled("test", self.builder, self.xml_path)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.builds, 1)
+        self.assertTrue(os.path.exists(cache_path(self.xml_path, "test")))
+
+    def test_cache_survives_touch(self):
+        '''A new mtime with unchanged content keeps the cache valid.'''
+        load_compiled("test", self.builder, self.xml_path)
+        stat = os.stat(self.xml_path)
+        os.utime(self.xml_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        load_compiled("test", self.builder, self.xml_path)
+
+        self.assertEqual(self.builds, 1)
+        with open(cache_path(self.xml_path, "test"), "rb") as cache_file:
+            # The header is updated, so the next start does not hash the file again
+            self.assertEqual(pickle.load(cache_file)["mtime_ns"], stat.st_mtime_ns + 10**9)
+
+    def test_corrupt_cache_is_rebuilt(self):
+        '''A truncated cache is rebuilt instead of failing the load.'''
+        expected = load_compiled("test", self.builder, self.xml_path)
+        with open(cache_path(self.xml_path, "test"), "r+b") as cache_file:
+            cache_file.truncate(os.path.getsize(cache_path(self.xml_path, "test")) - 5)
+
+        self.assertEqual(load_compiled("test", self.builder, self.xml_path), expected)
+        self.assertEqual(self.builds, 2)
+
+    def test_cache_is_rebuilt_on_change(self):
+        '''Changing the XML file or the version rebuilds the cache.'''
+        load_compiled("test", self.builder, self.xml_path)
+        write_sample_xml(self.tmp_dir.name, SAMPLE_XML.replace("phral", "phralo"))
+        result = load_compiled("test", self.builder, self.xml_path)
+        load_compiled("test", self.builder, self.xml_path, version=2)
+
+        self.assertIn(" phralo", result)
+        self.assertEqual(self.builds, 3)
+
+    def test_artifact_round_trip_and_checksum(self):
+        '''Artifacts load back unchanged and are rejected when corrupted or of another version.'''
+        artifact = os.path.join(self.tmp_dir.name, "SRO.test.artifact")
+        write_artifact(artifact, "test", {"phral": 1}, version=3)
+        self.assertEqual(read_artifact(artifact, "test", version=3), {"phral": 1})
+        with self.assertRaises(ValueError):
+            read_artifact(artifact, "test", version=4)
+
+        with open(artifact, "r+b") as artifact_file:
+            artifact_file.seek(-2, os.SEEK_END)
+            last = artifact_file.read(1)
+            artifact_file.seek(-2, os.SEEK_END)
+            artifact_file.write(bytes([last[0] ^ 1]))
+        with self.assertRaises(ValueError):
+            read_artifact(artifact, "test", version=3)
+
+    def test_lexicon_artifact(self):
+        '''A Lexicon saved as an artifact answers the same lookups.'''
+        artifact = os.path.join(self.tmp_dir.name, "SRO.lexicon.artifact")
+        lexicon = Lexicon.load(self.xml_path, use_cache=False)
+        lexicon.save_artifact(artifact)
+        loaded = Lexicon.from_artifact(artifact)
+
+        self.assertEqual(len(loaded), len(lexicon))
+        self.assertEqual(loaded.lookup("phral"), lexicon.lookup("phral"))
+        self.assertEqual(loaded.suggest("dž"), lexicon.suggest("dž"))
+        self.assertEqual(loaded.senses("dikhel"), lexicon.senses("dikhel"))
+
+
+class TestLexicon(unittest.TestCase):
+    '''Test cases for the Lexicon index.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+        self.lexicon = Lexicon.load(self.xml_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lookup_folds_diacritics(self):
+        '''Lookups ignore case, whitespace and diacritics.'''
+        expected_output = {"word": "džuvľi", "part_of_speech": "noun", "gender": "feminine"}
+        self.assertEqual(self.lexicon.lookup("dzuvli"), expected_output)
+        self.assertEqual(self.lexicon.lookup(" DŽUVĽI\n"), expected_output)
+
+    def test_lookup_returns_first_sense(self):
+        '''The first Sense in document order wins.'''
+        self.assertEqual(self.lexicon.lookup("dikhel"), {"word": "dikhel", "part_of_speech": "verb", "gender": "other"})
+
+    def test_lookup_missing_word(self):
+        '''Missing words return None.'''
+        self.assertIsNone(self.lexicon.lookup("čambel"))
+        self.assertNotIn("čambel", self.lexicon)
+
+    def test_suggest(self):
+        '''Suggestions are lemmas starting with the folded prefix.'''
+        self.assertEqual(self.lexicon.suggest("D"), ["dikhel", "džuvľi"])
+        self.assertEqual(self.lexicon.suggest("dž"), ["džuvľi"])
+        self.assertEqual(self.lexicon.suggest("d", limit=1), ["dikhel"])
+        self.assertEqual(self.lexicon.suggest("x"), [])
+        self.assertEqual(self.lexicon.suggest(" "), [])
+        self.assertEqual(self.lexicon.sorted_keys, sorted(dict(self.lexicon.items())))
+
+    def test_did_you_mean(self):
+        '''Near misses return the closest lemmas.'''
+        self.assertEqual(self.lexicon.did_you_mean("phrall"), ["phral"])
+        self.assertEqual(self.lexicon.did_you_mean("dzuvlji"), ["džuvľi"])
+        self.assertEqual(self.lexicon.did_you_mean("xyz"), [])
+
+    def test_lookup_without_pos(self):
+        '''A Sense without posROM raises ValueError.'''
+        with self.assertRaises(ValueError):
+            self.lexicon.lookup("kher")
+
+    def test_senses_include_homographs(self):
+        '''Every Sense of a lemma is returned in document order.'''
+        self.assertEqual(self.lexicon.senses("DIKHEL"), [
+            {"word": "dikhel", "part_of_speech": "verb", "gender": "other", "slovak": "vidieť", "sense_number": "1"},
+            {"word": "dikhel", "part_of_speech": "verb", "gender": "other", "slovak": "vidieť", "sense_number": "2"},
+        ])
+        self.assertEqual(self.lexicon.senses("kher")[0]["part_of_speech"], None)
+        self.assertEqual(self.lexicon.senses("čambel"), [])
+
+    def test_translate_slovak(self):
+        '''Slovak lemmas map to their Roma senses, ignoring diacritics.'''
+        self.assertEqual([sense["word"] for sense in self.lexicon.translate("Brat")], ["phral"])
+        self.assertEqual([sense["word"] for sense in self.lexicon.translate("vidiet")], ["dikhel", "dikhel"])
+        self.assertEqual(self.lexicon.translate("mačka"), [])
+
+    def test_lemmas_by_category(self):
+        '''Lemmas are listed by part of speech and gender.'''
+        self.assertEqual(self.lexicon.lemmas("noun", "feminine"), ["džuvľi"])
+        self.assertEqual(self.lexicon.lemmas("noun"), ["phral", "džuvľi"])
+        self.assertEqual(self.lexicon.lemmas("verb"), ["dikhel"])
+        self.assertEqual(self.lexicon.lemmas("množné"), [])
+
+
+class TestFuzzy(unittest.TestCase):
+    '''Test cases for the fuzzy module.'''
+    def test_edit_distance(self):
+        '''Insertions, deletions, substitutions and transpositions cost one edit.'''
+        self.assertEqual(edit_distance("phral", "phral", 2), 0)
+        self.assertEqual(edit_distance("phral", "phrla", 2), 1)
+        self.assertEqual(edit_distance("chamiben", "camiben", 2), 1)
+        self.assertEqual(edit_distance("kher", "kamiben", 2), 3)
+
+    def test_candidates(self):
+        '''Candidates are ranked by distance, then alphabetically.'''
+        index = FuzzyIndex(["kamiben", "kamnipen", "kher", "khera"])
+        self.assertEqual(index.candidates("kamipen"), [(1, "kamiben"), (1, "kamnipen")])
+        self.assertEqual(index.candidates("khe"), [(1, "kher"), (2, "khera")])
+        self.assertEqual(index.candidates("khe", limit=1), [(1, "kher")])
+
+
+class TestAnalyzer(unittest.TestCase):
+    '''Test cases for the analyzer module.'''
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cls.index = FormIndex.from_lexicon(Lexicon.load(write_sample_xml(tmp_dir)))
+
+    def test_analyze_noun(self):
+        '''Noun forms map to their lemma, case and number.'''
+        self.assertEqual(self.index.analyze("phraleskero"), [Analysis("phral", "genitív", None, "Singulár")])
+        self.assertEqual(self.index.analyze("DŽUVĽENCA"), [Analysis("džuvľi", "inštrumentál", None, "Plurál")])
+
+    def test_analyze_verb(self):
+        '''Ambiguous verb forms return every analysis.'''
+        self.assertEqual(self.index.analyze("dikhavas"), [
+            Analysis("dikhel", "impf", 1, "sg"),
+            Analysis("dikhel", "cond_pres", 1, "sg"),
+        ])
+        self.assertEqual(self.index.analyze("dikh!"), [Analysis("dikhel", "imper", 2, "sg")])
+
+    def test_analyze_unknown(self):
+        '''Unknown forms and lemmas without posROM have no analyses.'''
+        self.assertEqual(self.index.analyze("khereskero"), [])
+
+    def test_homograph_noun_sense(self):
+        '''Noun forms are indexed even when the noun Sense of a lemma is not its first.'''
+        homograph = ('<Lemma><lemmaSK>starý</lemmaSK><Sense><Definition><lemmaROM> phuro</lemmaROM></Definition>'
+                     ' <posROM>(prídavné meno)</posROM></Sense></Lemma>\n'
+                     '<Lemma><lemmaSK>starec</lemmaSK><Sense><Definition><lemmaROM> phuro</lemmaROM></Definition>'
+                     ' <posROM>(podstatné meno, mužský rod)</posROM></Sense></Lemma>\n</root>')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lexicon = Lexicon.load(write_sample_xml(tmp_dir, SAMPLE_XML.replace("</root>", homograph)))
+        index = FormIndex.from_lexicon(lexicon)
+
+        self.assertEqual(lexicon.lookup("phuro")["part_of_speech"], "other")
+        self.assertIn(Analysis("phuro", "genitív", None, "Singulár"), index.analyze("phureskero"))
+
+
+class TestBatch(unittest.TestCase):
+    '''Test cases for the batch module.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+
+    def tearDown(self):
+        set_lexicon(None)
+        self.tmp_dir.cleanup()
+
+    def test_records_keep_input_order(self):
+        '''Records from worker processes come back in input order.'''
+        search_terms = ["dikhel", "phral", "xyz", "kher", "džuvľi"] * 3
+        records = list(generate_records(search_terms, workers=2, chunksize=2, xml_file_path=self.xml_path))
+
+        self.assertEqual([record["input"] for record in records], search_terms)
+        self.assertEqual(records[0]["paradigms"]["pres"][1]["sg"], "dikhav")
+        self.assertEqual(records[1]["paradigms"]["Singulár"]["genitív"], "phraleskero")
+        self.assertIn("error", records[2])
+        self.assertIn("error", records[3])
+
+    def test_records_in_process(self):
+        '''A single worker produces the same records without a pool.'''
+        search_terms = ["dikhel", "phral", "xyz"]
+        self.assertEqual(
+            list(generate_records(search_terms, workers=1, xml_file_path=self.xml_path)),
+            list(generate_records(search_terms, workers=2, chunksize=1, xml_file_path=self.xml_path)),
+        )
+
+
+class TestExport(unittest.TestCase):
+    '''Test cases for the export module.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+        self.output_path = os.path.join(self.tmp_dir.name, "paradigms.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_output(self):
+        with open(self.output_path, encoding="utf-8") as output_file:
+            return output_file.read()
+
+    def test_iter_lemmas(self):
+        '''Only the first sense of each noun and verb is exported.'''
+        self.assertEqual(list(iter_lemmas(self.xml_path)), [
+            ("phral", "noun", "masculine"),
+            ("džuvľi", "noun", "feminine"),
+            ("dikhel", "verb", "other"),
+        ])
+
+    def test_export_jsonl(self):
+        '''Worker processes write the same output as a single process.'''
+        count = export_paradigms(self.output_path, xml_file_path=self.xml_path, workers=2, chunksize=1, progress=None)
+        parallel_output = self.read_output()
+        export_paradigms(self.output_path, xml_file_path=self.xml_path, workers=1, progress=None)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(parallel_output, self.read_output())
+        self.assertIn('"phrales"', parallel_output)
+
+    def test_export_csv(self):
+        '''CSV exports have one row per form.'''
+        export_paradigms(self.output_path, "csv", xml_file_path=self.xml_path, workers=1, progress=None)
+        lines = self.read_output().splitlines()
+
+        self.assertEqual(lines[0], "word,part_of_speech,gender,animacy,cell,person,number,form")
+        self.assertIn("phral,noun,masculine,životné,akuzatív,,Singulár,phrales", lines)
+        self.assertIn("dikhel,verb,other,,impf,1,sg,dikhavas", lines)
+        self.assertEqual(len(lines), 1 + 2 * 2 * 16 + 38)
+
+    def test_resume(self):
+        '''A resumed export drops partial output and continues after the checkpoint.'''
+        export_paradigms(self.output_path, xml_file_path=self.xml_path, workers=1, progress=None)
+        expected_output = self.read_output()
+        first_line = expected_output.splitlines(keepends=True)[0]
+        with open(self.output_path, "w", encoding="utf-8") as output_file:
+            output_file.write(first_line + '{"word": "džu')
+        write_checkpoint(self.output_path, {"format": "jsonl", "completed": 1,
+                                            "offset": len(first_line.encode("utf-8")), "last_lemma": "phral",
+                                            "source_sha256": file_digest(self.xml_path)})
+
+        count = export_paradigms(self.output_path, xml_file_path=self.xml_path, workers=1, resume=True, progress=None)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(self.read_output(), expected_output)
+
+    def test_resume_refuses_mismatched_checkpoint(self):
+        '''A changed dictionary, another last lemma or a deleted output stop the resume.'''
+        checkpoint = {"format": "jsonl", "completed": 1, "offset": 0, "last_lemma": "phral",
+                      "source_sha256": file_digest(self.xml_path)}
+        open(self.output_path, "w").close()
+        for changes, message in (({"source_sha256": "0" * 64}, "another version"), ({"last_lemma": "džuvľi"}, "is not"),
+                                 ({"offset": 10}, "missing or shorter")):
+            write_checkpoint(self.output_path, dict(checkpoint, **changes))
+            with self.assertRaisesRegex(ValueError, message):
+                export_paradigms(self.output_path, xml_file_path=self.xml_path, workers=1, resume=True, progress=None)
+
+
+class TestParadigmCache(unittest.TestCase):
+    '''Test cases for the paradigm_cache module.'''
+    def test_lru_cache_counters(self):
+        '''Hits, misses and evictions are counted and the oldest entry is evicted.'''
+        cache = LRUCache(maxsize=2)
+        for key in ("a", "b", "a", "c", "b"):
+            cache.get_or_compute(key, lambda: key.upper())
+
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 4, "evictions": 2, "size": 2, "maxsize": 2})
+
+    def test_cached_paradigms_are_read_only(self):
+        '''Cached paradigms equal the generated ones and cannot be modified.'''
+        paradigms = cached_noun_paradigms("kher", "masculine", "neživotné")
+
+        self.assertEqual(paradigms, generate_noun_paradigms("kher", "masculine", "neživotné"))
+        self.assertIs(paradigms, cached_noun_paradigms("kher", "masculine", "neživotné"))
+        with self.assertRaises(TypeError):
+            paradigms["Singulár"]["nominatív"] = "xxx"
+        self.assertEqual(thaw(cached_verb_paradigms("dikhel")), generate_verb_paradigms("dikhel"))
+
+    def test_invalidate(self):
+        '''invalidate drops cached results.'''
+        paradigms = cached_noun_paradigms("kher", "masculine", "životné")
+        invalidate()
+        self.assertIsNot(paradigms, cached_noun_paradigms("kher", "masculine", "životné"))
+
+    def test_invalidate_words(self):
+        '''invalidate_words drops only the cached results of the given words.'''
+        kher = cached_noun_paradigms("kher", "masculine", "životné")
+        dikhel = cached_verb_paradigms("dikhel")
+        self.assertGreaterEqual(invalidate_words(["kher"]), 1)
+        self.assertIsNot(kher, cached_noun_paradigms("kher", "masculine", "životné"))
+        self.assertIs(dikhel, cached_verb_paradigms("dikhel"))
+
+    def test_replace_pes_forms_returns_copy(self):
+        '''replace_pes_forms leaves its input unchanged.'''
+        paradigms = {"pres": {1: {"sg": "pes dikhav", "pl": "pes dikhas"}}}
+        result = replace_pes_forms(paradigms)
+
+        self.assertEqual(result, {"pres": {1: {"sg": "man dikhav", "pl": "amen dikhas"}}})
+        self.assertEqual(paradigms["pres"][1]["sg"], "pes dikhav")
+
+
+class TestLexiconStore(unittest.TestCase):
+    '''Test cases for the SQLite lexicon store.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+        self.store = LexiconStore.open(xml_file_path=self.xml_path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_lookup_matches_lexicon(self):
+        '''Exact lookups return the same results as the in-memory Lexicon.'''
+        lexicon = Lexicon.load(self.xml_path, use_cache=False)
+        for term in ("phral", "dzuvli", "DIKHEL", "čambel"):
+            self.assertEqual(self.store.lookup(term), lexicon.lookup(term))
+        with self.assertRaises(ValueError):
+            self.store.lookup("kher")
+
+    def test_search_prefix(self):
+        '''Prefix searches ignore diacritics.'''
+        words = [result["word"] for result in self.store.search_prefix("dž")]
+        self.assertEqual(words, ["džuvľi"])
+
+    def test_search_substring(self):
+        '''Substring searches cover both lemmas and Slovak translations.'''
+        self.assertEqual([result["word"] for result in self.store.search_substring("ikhe")], ["dikhel", "dikhel"])
+        self.assertEqual([result["word"] for result in self.store.search_substring("zen")], ["džuvľi"])
+
+    def test_search_substring_without_fts5(self):
+        '''Without FTS5 the store is still built and substring searches use LIKE.'''
+        fts_tables = sqlite_store.FTS_TABLES
+        sqlite_store.FTS_TABLES = fts_tables[-1:]
+        try:
+            db_path = sqlite_store.build_store(os.path.join(self.tmp_dir.name, "plain.sqlite3"), self.xml_path)
+        finally:
+            sqlite_store.FTS_TABLES = fts_tables
+        with LexiconStore(db_path) as store:
+            self.assertEqual([result["word"] for result in store.search_substring("ikhe")], ["dikhel", "dikhel"])
+            self.assertEqual([result["word"] for result in store.search_substring("zen")], ["džuvľi"])
+
+    def test_failed_build_leaves_no_temporary_file(self):
+        '''A malformed dictionary raises and removes the partly built database.'''
+        broken_dir = os.path.join(self.tmp_dir.name, "broken")
+        os.mkdir(broken_dir)
+        xml_path = write_sample_xml(broken_dir, SAMPLE_XML.replace("</root>", "<Lemma>"))
+        with self.assertRaises(ValueError):
+            sqlite_store.build_store(xml_file_path=xml_path)
+        self.assertEqual(os.listdir(broken_dir), ["SRO.xml"])
+
+    def test_find_by_category(self):
+        '''Senses can be filtered by part of speech and gender.'''
+        words = [result["word"] for result in self.store.find_by_category("noun", "masculine")]
+        self.assertEqual(words, ["phral"])
+
+
 class TestLanguageProcessor(unittest.TestCase):
     '''Test cases for the language_processor module.'''
     def test_generate_obliquus(self):
@@ -148,6 +630,615 @@ class TestLanguageProcessor(unittest.TestCase):
 
 
 
+class TestDeclension(unittest.TestCase):
+    '''Test cases for the compiled declension engine.'''
+    def test_classify(self):
+        '''Stem classes follow the branches of generate_obliquus.'''
+        self.assertEqual(classify("kamiben", "masculine"), "abstract")
+        self.assertEqual(classify("lavutaris", "masculine"), "xeno_masculine_nom_pl_a")
+        self.assertEqual(classify("mas", "other"), "oiko_masculine")
+        self.assertEqual(classify("voďi", "feminine"), "oiko_masculine_i")
+        self.assertEqual(classify("kher", "feminine"), "oiko_feminine")
+        self.assertEqual(classify("kher", "other"), "other")
+
+    def test_decline_matches_csv_words(self):
+        '''decline matches generate_noun_paradigms for the words in the test CSVs.'''
+        nouns = []
+        for file_name in ('obliquus_test.csv', 'paradigms_test.csv'):
+            with open(file_name, newline='', encoding='utf-8') as csvfile:
+                nouns += [(row['input_word'], row['input_gender']) for row in csv.DictReader(csvfile)]
+        self.assertEqual(find_mismatches(nouns), [])
+
+    def test_decline_matches_every_stem_class(self):
+        '''decline matches generate_noun_paradigms for all endings, genders and exceptions.'''
+        stems = ["", "b", "kh", "phral", "džuv"]
+        endings = ["", "ben", "pen", "iben", "ipen", "is", "as", "os", "us", "a", "i", "o", "ľi", "e", "l", "s"]
+        words = [stem + ending for stem in stems for ending in endings] + ["mas", "voďi", "paňi", "lavutaris"]
+        nouns = [(word, gender) for word in words for gender in ("masculine", "feminine", "other")]
+        self.assertEqual(find_mismatches(nouns), [])
+
+    def test_decline(self):
+        '''decline returns the paradigms dict shape.'''
+        paradigms = decline("kher", "masculine", "životné")
+        self.assertEqual(paradigms["Singulár"]["akuzatív"], "kheres")
+        self.assertEqual(paradigms["Plurál"]["inštrumentál"], "kherenca")
+
+
+class TestParadigmTypes(unittest.TestCase):
+    '''Test cases for the compact paradigm types.'''
+    def test_noun_paradigm_matches_dict(self):
+        '''NounParadigm compares and formats like the nested dict.'''
+        expected = generate_noun_paradigms("kher", "masculine", "životné")
+        paradigm = NounParadigm(decline_cells("kher", "masculine", "životné"))
+
+        self.assertEqual(paradigm, expected)
+        self.assertEqual(paradigm.to_dict(), expected)
+        self.assertEqual(format_noun_paradigms(paradigm["Plurál"]), format_noun_paradigms(expected["Plurál"]))
+
+    def test_verb_paradigm_matches_dict(self):
+        '''VerbParadigm compares, formats and pickles like the nested dict.'''
+        expected = generate_verb_paradigms("dikhel")
+        paradigm = VerbParadigm.from_dict(expected)
+
+        self.assertEqual(paradigm, expected)
+        self.assertEqual(paradigm["imper"][2]["pl"], "dikhen!")
+        self.assertEqual(format_verb_paradigms(paradigm), format_verb_paradigms(expected))
+        self.assertEqual(pickle.loads(pickle.dumps(paradigm)), paradigm)
+        with self.assertRaises(TypeError):
+            paradigm["pres"][1]["sg"] = "xxx"
+
+    def test_paradigms_use_less_memory(self):
+        '''A VerbParadigm takes less memory than the nested dicts.'''
+        verbs = [f"dikh{index}el" for index in range(200)]
+
+        tracemalloc.start()
+        dicts = [generate_verb_paradigms(verb) for verb in verbs]
+        dict_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        tracemalloc.start()
+        paradigms = [VerbParadigm.from_dict(generate_verb_paradigms(verb)) for verb in verbs]
+        paradigm_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        self.assertEqual(len(dicts), len(paradigms))
+        self.assertLess(paradigm_size, dict_size / 2)
+
+
+@unittest.skipUnless(numpy, "NumPy is not installed")
+
+class TestVectorized(unittest.TestCase):
+    '''Test cases for the NumPy batch API.'''
+    def test_conjugate_batch_matches_scalar(self):
+        '''conjugate_batch matches generate_verb_paradigms for every conjugation class.'''
+        verbs = ["dikhel", "kamel", "chuťel", "urel", "phendel", "xal", "kamal", "pijol",
+                 "dživel", "sikhľol", "mangel", "bešel", "ašťel", "čhinel", "rodel", "džal"]
+        result = conjugate_batch(verbs)
+
+        for index, verb in enumerate(verbs):
+            self.assertEqual(result.paradigms(index), generate_verb_paradigms(verb))
+        self.assertEqual(result.column(("pres", 1, "sg")).tolist()[:2], ["dikhav", "kamav"])
+
+    def test_decline_batch_matches_scalar(self):
+        '''decline_batch matches generate_noun_paradigms for mixed genders and animacy.'''
+        nouns = ["kher", "phral", "kamiben", "lavutaris", "sudcas", "džuvľi", "voďi", "čhaj", "mas", "čhavo", "daj", "žila"]
+        genders = ["masculine", "masculine", "masculine", "masculine", "masculine", "feminine",
+                   "feminine", "feminine", "other", "masculine", "other", "feminine"]
+        animacy = ["životné", "neživotné"] * 6
+        result = decline_batch(nouns, genders, animacy)
+
+        for index, noun in enumerate(nouns):
+            self.assertEqual(result.paradigms(index), generate_noun_paradigms(noun, genders[index], animacy[index]))
+        self.assertEqual(result.column(("Plurál", "genitív")).tolist()[:2], ["kherengero", "phralengero"])
+
+
+class TestSearchWorker(unittest.TestCase):
+    def wait_until_idle(self, worker, timeout=5):
+        deadline = time.monotonic() + timeout
+        while worker.busy and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(worker.busy)
+
+    def test_only_latest_result_is_returned(self):
+        '''Requests submitted while the worker is busy are coalesced and superseded results dropped.'''
+        release = threading.Event()
+        calls = []
+
+        def search(term):
+            calls.append(term)
+            release.wait(5)
+            return term.upper()
+
+        worker = SearchWorker(search)
+        worker.submit("a")
+        while not calls:
+            time.sleep(0.01)
+        worker.submit("b")
+        last_id = worker.submit("c")
+        self.assertTrue(worker.busy)
+        release.set()
+        self.wait_until_idle(worker)
+
+        self.assertEqual(worker.poll(), [(last_id, "C")])
+        self.assertEqual(calls, ["a", "c"])
+
+    def test_cancel_and_errors(self):
+        '''Cancelled searches produce no result and exceptions become error messages.'''
+        def search(term):
+            if term == "boom":
+                raise RuntimeError("boom")
+            return term
+
+        worker = SearchWorker(search)
+        request_id = worker.submit("boom")
+        self.wait_until_idle(worker)
+        self.assertEqual(worker.poll(), [(request_id, "An error occurred: boom")])
+
+        worker.submit("phral")
+        worker.cancel()
+        self.wait_until_idle(worker)
+        self.assertEqual(worker.poll(), [])
+
+
+    def test_searches_wait_for_initializer(self):
+        '''Searches submitted while the initializer runs are answered once it has finished.'''
+        release = threading.Event()
+        loaded = []
+
+        def initializer(report):
+            report("loading")
+            release.wait(5)
+            loaded.append(True)
+
+        worker = SearchWorker(lambda term: (term, bool(loaded)), initializer=initializer)
+        request_id = worker.submit("phral")
+        time.sleep(0.05)
+        self.assertFalse(worker.ready)
+        self.assertEqual(worker.progress, "loading")
+        self.assertEqual(worker.poll(), [])
+        release.set()
+        self.assertTrue(worker.wait_ready(5))
+        self.wait_until_idle(worker)
+        self.assertEqual(worker.poll(), [(request_id, ("phral", True))])
+
+    def test_initializer_error_is_recorded(self):
+        '''A failing initializer leaves the worker ready with the error recorded.'''
+        def initializer(report):
+            raise FileNotFoundError("SRO.xml")
+
+        worker = SearchWorker(lambda term: term, initializer=initializer)
+        self.assertTrue(worker.wait_ready(5))
+        self.assertIsInstance(worker.error, FileNotFoundError)
+        self.assertEqual(worker.progress, "An error occurred: SRO.xml")
+
+
+class TestStartupTimer(unittest.TestCase):
+    '''Test cases for the startup timing of the user interface.'''
+    def test_mark_keeps_first_occurrence(self):
+        '''Marking a milestone again does not change its time.'''
+        timer = StartupTimer(started=time.perf_counter())
+        timer.mark("first_paint")
+        first = timer.marks["first_paint"]
+        time.sleep(0.01)
+        timer.mark("first_paint")
+        self.assertEqual(timer.marks, {"first_paint": first})
+
+    def test_report(self):
+        '''Milestones are written as one line of text or JSON.'''
+        timer = StartupTimer(started=0)
+        timer.marks = {"first_paint": 0.25, "first_result": 1.5}
+        text, as_json = io.StringIO(), io.StringIO()
+        timer.report(text)
+        timer.report(as_json, as_json=True)
+        self.assertEqual(text.getvalue(), "Startup: first_paint 0.250s, first_result 1.500s\n")
+        self.assertEqual(json.loads(as_json.getvalue()), {"first_paint": 0.25, "first_result": 1.5})
+
+    def test_parse_arguments(self):
+        '''Only --startup-benchmark selects a benchmark word, by default BENCHMARK_WORD.'''
+        self.assertIsNone(parse_arguments([]))
+        self.assertEqual(parse_arguments(["--startup-benchmark"]), BENCHMARK_WORD)
+        self.assertEqual(parse_arguments(["--startup-benchmark", "dikhel"]), "dikhel")
+
+
+class TestService(unittest.TestCase):
+    '''Test cases for the HTTP service, served from a background event loop.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.service = ParadigmService(write_sample_xml(self.tmp_dir.name), executor=ThreadPoolExecutor(2))
+        self.service.start()
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.service.handle_connection, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def shutdown(self):
+        self.server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        self.service.close()
+        set_lexicon(None)
+        self.tmp_dir.cleanup()
+
+    def request(self, connection, method, path, body=None):
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode("utf-8"))
+
+    def test_endpoints_on_one_connection(self):
+        '''All endpoints answer on a single keep-alive connection.'''
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        status, result = self.request(connection, "GET", "/search?word=phral")
+        self.assertEqual((status, result["gender"]), (200, "masculine"))
+        sock = connection.sock
+
+        status, result = self.request(connection, "GET", "/noun?word=phral&animacy=" + quote("životné"))
+        self.assertEqual(result["paradigms"]["Singulár"]["akuzatív"], "phrales")
+        status, result = self.request(connection, "GET", "/noun?word=%20Phral&gender=masculine&animacy=" + quote("životné"))
+        self.assertEqual((result["word"], result["paradigms"]["Singulár"]["akuzatív"]), ("phral", "phrales"))
+
+        status, result = self.request(connection, "GET", "/verb?word=dikhel")
+        self.assertEqual(result["paradigms"]["pres"]["1"]["sg"], "dikhav")
+
+        words = json.dumps({"words": ["phral", "kher"] * 40, "animacy": "životné"})
+        status, result = self.request(connection, "POST", "/batch", words.encode("utf-8"))
+        self.assertEqual(status, 200)
+        self.assertEqual(len(result["records"]), 80)
+        self.assertEqual(result["records"][78]["paradigms"]["Plurál"]["nominatív"], "phrala")
+        self.assertIn("error", result["records"][79])
+        self.assertIs(connection.sock, sock)
+        connection.close()
+
+    def test_errors(self):
+        '''Unknown words, endpoints, methods and bodies are answered with JSON errors.'''
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.assertEqual(self.request(connection, "GET", "/search?word=xyz")[0], 404)
+        # kher has no posROM: the entry exists but cannot be used
+        self.assertEqual(self.request(connection, "GET", "/search?word=kher")[0], 422)
+        self.assertEqual(self.request(connection, "GET", "/unknown")[0], 404)
+        self.assertEqual(self.request(connection, "GET", "/batch")[0], 405)
+        self.assertEqual(self.request(connection, "POST", "/batch", b"{")[0], 400)
+        self.assertEqual(self.request(connection, "GET", "/noun?word=phral&animacy=x")[0], 400)
+        connection.close()
+
+
+class TestMappedIndex(unittest.TestCase):
+    '''Test cases for the memory-mapped lexicon and full-form index.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+        build_indexes(self.xml_path, self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lexicon_matches_in_memory(self):
+        '''The mapped Lexicon answers like the one built from the XML file.'''
+        mapped = load_lexicon(self.tmp_dir.name)
+        lexicon = Lexicon.load(self.xml_path, use_cache=False)
+
+        self.assertEqual(len(mapped), len(lexicon))
+        for word in ("phral", "Džuvli", "dikhel", "xyz"):
+            self.assertEqual(mapped.lookup(word), lexicon.lookup(word))
+        self.assertEqual(mapped.suggest("d"), lexicon.suggest("d"))
+        self.assertEqual(mapped.did_you_mean("phrl"), ["phral"])
+        # Suggestions come from the mapped deletion dictionary, not an index built in this process
+        self.assertEqual(dict(mapped.fuzzy_index.items()), {delete: list(keys) for delete, keys in lexicon.fuzzy_index.items()})
+        with self.assertRaises(ValueError):
+            mapped.lookup("kher")
+        for word in ("dikhel", "kher", "xyz"):
+            self.assertEqual(mapped.senses(word), lexicon.senses(word))
+        self.assertEqual(mapped.translate("vidiet"), lexicon.translate("vidiet"))
+        self.assertEqual(mapped.lemmas("noun"), lexicon.lemmas("noun"))
+        self.assertEqual(dict(mapped.indexes.categories), lexicon.indexes.categories)
+
+    def test_form_index_matches_in_memory(self):
+        '''The mapped FormIndex returns the same analyses for every form.'''
+        mapped = load_form_index(self.tmp_dir.name)
+        form_index = FormIndex.from_lexicon(Lexicon.load(self.xml_path, use_cache=False))
+
+        self.assertEqual(len(mapped), len(form_index))
+        for form, analyses in form_index.items():
+            self.assertEqual(mapped.analyze(form), analyses)
+        self.assertIn(Analysis("dikhel", "pres", 1, "sg"), mapped.analyze("dikhav"))
+        self.assertEqual(mapped.analyze("xyz"), [])
+
+    def test_stale_and_invalid_indexes(self):
+        '''Indexes are rebuilt when the XML changes and other files are rejected.'''
+        write_sample_xml(self.tmp_dir.name, SAMPLE_XML.replace("phral", "phralo"))
+        ensure_indexes(self.xml_path, self.tmp_dir.name)
+        self.assertIsNotNone(load_lexicon(self.tmp_dir.name).lookup("phralo"))
+
+        with self.assertRaises(ValueError):
+            MappedTable(os.path.join(self.tmp_dir.name, "SRO.forms.idx"), "lexicon")
+        with self.assertRaises(ValueError):
+            MappedTable(self.xml_path, "lexicon")
+
+
+class TestBenchmark(unittest.TestCase):
+    '''Test cases for the benchmark suite.'''
+    def test_scaled_xml_has_unique_lemmas(self):
+        '''Scaled dictionaries have the requested number of distinct lemmas.'''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            xml_path = scaled_xml(30, tmp_dir, write_sample_xml(tmp_dir))
+            lemmas = [clean_text(sense.lemma_rom) for sense in iter_senses(xml_path)
+                      if sense.lemma_rom and sense.sense_number in (None, "1")]
+
+        self.assertEqual(len(set(lemmas)), len(lemmas))
+        self.assertIn("phralb", lemmas)
+
+    def test_run_and_compare(self):
+        '''Benchmarks produce one result per size and slowdowns are reported as regressions.'''
+        results = run_benchmarks(sizes=[10, 20], repeat=2, min_time=0.001,
+                                 names=["search_word_hit", "generate_obliquus"])
+        self.assertEqual([(result.name, result.size) for result in results],
+                         [("search_word_hit", 10), ("search_word_hit", 20), ("generate_obliquus", None)])
+        self.assertTrue(all(result.median > 0 and result.peak_memory > 0 for result in results))
+
+        faster = [result._replace(median=result.median / 2) for result in results]
+        self.assertEqual(len(compare_results(results, faster)), 3)
+        self.assertEqual(compare_results(results, results), [])
+
+
+class TestSyntheticDictionary(unittest.TestCase):
+    '''Test cases for the synthetic dictionary generator and scaling of the lexicon.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def generate(self, senses, seed=1):
+        xml_path = os.path.join(self.tmp_dir.name, f"SRO.{senses}.{seed}.xml")
+        generate_sro(xml_path, senses, seed)
+        return xml_path
+
+    def test_deterministic_and_schema_faithful(self):
+        '''The same seed gives the same file, with unique lemmas of every word class.'''
+        first, second = self.generate(3000), self.generate(3000)
+        with open(first, encoding="utf-8") as first_file, open(second, encoding="utf-8") as second_file:
+            self.assertEqual(first_file.read(), second_file.read())
+
+        senses = list(iter_senses(first))
+        self.assertEqual(len(senses), 3000)
+        lemmas = [clean_text(sense.lemma_rom) for sense in senses if sense.lemma_rom]
+        self.assertEqual(len({replace_special_characters(lemma) for lemma in lemmas}), len(lemmas))
+        categories = {get_pos_category(sense.pos_rom) for sense in senses if sense.pos_rom}
+        self.assertEqual(categories, {"noun", "verb", "množné", "other"})
+
+        lexicon = Lexicon.load(first, use_cache=False)
+        noun_types = {generate_obliquus(result["word"], result["gender"])[3]
+                      for result in lexicon.words() if result["part_of_speech"] == "noun"}
+        self.assertEqual(noun_types, {"oiko", "xeno"})
+
+    def test_scaling(self):
+        '''Parsing memory and memory per lemma stay flat as the dictionary grows.
+
+        Lookup latency by size is measured by the search_word_hit benchmark
+        (python benchmark.py --synthetic 0), not here, as timings vary on loaded machines.
+        '''
+        measurements = []
+        for senses in (1000, 8000):
+            xml_path = self.generate(senses)
+            tracemalloc.start()
+            for _ in iter_senses(xml_path):
+                pass
+            parse_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            tracemalloc.start()
+            lexicon = Lexicon.load(xml_path, use_cache=False)
+            bytes_per_lemma = tracemalloc.get_traced_memory()[0] / len(lexicon)
+            tracemalloc.stop()
+            measurements.append((parse_peak, bytes_per_lemma))
+
+        (small_peak, _), (large_peak, large_per_lemma) = measurements
+        self.assertLess(large_peak, 2 * small_peak)
+        self.assertLess(large_per_lemma, 1024)
+
+
+class TestMetrics(unittest.TestCase):
+    '''Test cases for the metrics instrumentation.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        set_lexicon(Lexicon.load(write_sample_xml(self.tmp_dir.name), use_cache=False))
+        metrics.REGISTRY.reset()
+
+    def tearDown(self):
+        metrics.enable(False)
+        metrics.REGISTRY.reset()
+        set_lexicon(None)
+        self.tmp_dir.cleanup()
+
+    def test_disabled_collects_nothing(self):
+        '''Nothing is recorded while metrics are disabled.'''
+        metrics.enable(False)
+        search_word("phral")
+        generate_obliquus("phral", "masculine")
+
+        state = metrics.snapshot()
+        self.assertEqual(state["counters"].get("search_word_total", {}), {})
+        self.assertEqual(state["histograms"]["generate_obliquus_seconds"]["count"], 0)
+
+    def test_search_outcomes_and_latency(self):
+        '''Hits, misses and errors are counted and latencies land in the histograms.'''
+        metrics.enable()
+        search_word("phral")
+        search_word("phral")
+        search_word("xyz")
+        search_word("kher")
+        generate_noun_paradigms("phral", "masculine", "životné")
+
+        state = metrics.snapshot()
+        self.assertEqual(state["counters"]["search_word_total"],
+                         {"outcome=hit": 2, "outcome=miss": 1, "outcome=error": 1})
+        self.assertEqual(state["histograms"]["search_word_seconds"]["count"], 4)
+        self.assertEqual(state["histograms"]["generate_obliquus_seconds"]["count"], 1)
+        self.assertEqual(state["histograms"]["generate_noun_paradigms_seconds"]["buckets"]["+Inf"], 1)
+
+        text = metrics.export("prometheus")
+        self.assertIn('search_word_total{outcome="hit"} 2', text)
+        self.assertIn("# TYPE search_word_seconds histogram", text)
+        self.assertIn('search_word_seconds_bucket{le="+Inf"} 4', text)
+        self.assertEqual(json.loads(metrics.export("json"))["counters"], state["counters"])
+        with self.assertRaises(ValueError):
+            metrics.export("xml")
+
+
+class TestProfiler(unittest.TestCase):
+    '''Test cases for the profiling mode.'''
+    def test_profile_current_thread(self):
+        '''The report ranks the profiled functions and the stack samples are collapsed stacks.'''
+        with Profiler(interval=0.0005) as profiler:
+            deadline = time.perf_counter() + 0.2
+            while time.perf_counter() < deadline:
+                format_verb_paradigms(generate_verb_paradigms("dikhel"))
+
+        self.assertIn("(format_verb_paradigms)", profiler.cpu_report())
+        self.assertIn("Top allocation sites:", profiler.report())
+        self.assertTrue(profiler.samples)
+        for line in profiler.collapsed_stacks().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertNotIn("profiling:", stack)
+        self.assertTrue(any("verbs:generate_verb_paradigms" in stack for stack in profiler.samples))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = profiler.save(os.path.join(tmp_dir, "run"))
+            self.assertEqual([os.path.splitext(path)[1] for path in paths], [".txt", ".prof", ".collapsed", ".heap"])
+            self.assertTrue(all(os.path.getsize(path) > 0 for path in paths))
+
+    def test_wrap_profiles_worker_thread(self):
+        '''Calls made through wrap on another thread are profiled.'''
+        profiler = Profiler().start(current_thread=False)
+        worker = SearchWorker(profiler.wrap(lambda word: format_verb_paradigms(generate_verb_paradigms(word))))
+        worker.submit("kerel")
+        deadline = time.monotonic() + 5
+        while not worker.poll() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        profiler.stop()
+
+        self.assertIn("(generate_verb_paradigms)", profiler.cpu_report())
+
+
+class TestReloader(unittest.TestCase):
+    '''Test cases for reloading a changed dictionary.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+        self.reloader = DictionaryReloader(self.xml_path)
+
+    def tearDown(self):
+        self.reloader.stop()
+        set_lexicon(None)
+        analyzer.set_form_index(None)
+        self.tmp_dir.cleanup()
+
+    def change_dictionary(self):
+        lines = SAMPLE_XML.splitlines()
+        lines[1] = lines[1].replace("phral", "phralo")
+        lines[4] = lines[4].replace("(sloveso, zvratné)", "(podstatné meno, ženský rod)")
+        lines.insert(5, lines[2].replace("žena", "matka").replace("džuvľi", "daj"))
+        # Replace the file at once, so a watcher never reads it half written
+        with tempfile.TemporaryDirectory(dir=self.tmp_dir.name) as new_dir:
+            os.replace(write_sample_xml(new_dir, "\n".join(lines)), self.xml_path)
+
+    def test_reload_matches_fresh_load(self):
+        '''A reloaded Lexicon and FormIndex equal ones built from the changed file.'''
+        previous = self.reloader.lexicon
+        previous.suggest("d")
+        previous.did_you_mean("phrall")
+        analyzer.set_form_index(FormIndex.from_lexicon(previous))
+        self.change_dictionary()
+
+        result = self.reloader.reload()
+        self.assertEqual(result, (["daj", "phralo"], ["dikhel"], ["phral"]))
+        lexicon, fresh = get_lexicon(), Lexicon.load(self.xml_path, use_cache=False)
+        self.assertIs(lexicon, self.reloader.lexicon)
+        self.assertEqual(dict(lexicon.items()), dict(fresh.items()))
+        self.assertEqual(lexicon.indexes, fresh.indexes)
+        self.assertEqual(lexicon.suggest("d"), ["daj", "dikhel", "džuvľi"])
+        self.assertEqual(lexicon.did_you_mean("phral"), ["phralo"])
+        self.assertEqual({form: sorted(analyses) for form, analyses in analyzer.get_form_index().items()},
+                         {form: sorted(analyses) for form, analyses in FormIndex.from_lexicon(fresh).items()})
+
+        # Searches holding the previous Lexicon still see the old dictionary
+        self.assertEqual(previous.lookup("phral")["word"], "phral")
+        self.assertEqual(previous.did_you_mean("phrall"), ["phral"])
+        self.assertEqual(self.reloader.reload(), ([], [], []))
+
+        # A restart reads the indexed Lemma elements from their cache
+        self.assertEqual(DictionaryReloader(self.xml_path)._lemmas, self.reloader._lemmas)
+        self.assertTrue(os.path.exists(cache_path(self.xml_path, "lemmas")))
+
+        # Reloads only rebuild the keys of changed Lemma elements
+        write_sample_xml(self.tmp_dir.name)
+        self.assertEqual(self.reloader.reload(), (["phral"], ["dikhel"], ["daj", "phralo"]))
+        self.assertEqual(self.reloader.lexicon.indexes, Lexicon.load(self.xml_path, use_cache=False).indexes)
+
+    def test_watch(self):
+        '''A watched file is reloaded when it changes.'''
+        reloaded = threading.Event()
+        self.reloader.on_reload = lambda result: reloaded.set()
+        self.reloader.watch(interval=0.01)
+        self.change_dictionary()
+
+        self.assertTrue(reloaded.wait(5))
+        self.assertEqual(search_word("phralo")["word"], "phralo")
+        self.assertEqual(get_lexicon().lemmas("noun", "feminine"), ["džuvľi", "dikhel", "daj"])
+
+
+class TestAnnotator(unittest.TestCase):
+    '''Test cases for the streaming annotator.'''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_path = write_sample_xml(self.tmp_dir.name)
+        self.form_index = FormIndex.from_lexicon(Lexicon.load(self.xml_path, use_cache=False))
+
+    def tearDown(self):
+        set_lexicon(None)
+        analyzer.set_form_index(None)
+        self.tmp_dir.cleanup()
+
+    def test_annotate(self):
+        '''Every word is tagged with its position and analyses; unknown words get none.'''
+        annotations = list(annotate(["Dikhav le phraleske!\n", "\n", "12 xyz, DŽUVĽENCA"], self.form_index))
+
+        self.assertEqual([(annotation.line, annotation.column, annotation.token) for annotation in annotations],
+                         [(1, 0, "Dikhav"), (1, 7, "le"), (1, 10, "phraleske"), (3, 3, "xyz"), (3, 8, "DŽUVĽENCA")])
+        self.assertIn(Analysis("dikhel", "pres", 1, "sg"), annotations[0].analyses)
+        self.assertEqual(annotations[2].analyses, (Analysis("phral", "datív", None, "Singulár"),))
+        self.assertEqual(annotations[3].analyses, ())
+        self.assertEqual(format_annotation(annotations[3], "tsv"), "3\t3\txyz\t_")
+        self.assertEqual(json.loads(format_annotation(annotations[2]))["analyses"],
+                         [{"lemma": "phral", "cell": "datív", "person": None, "number": "Singulár"}])
+
+    def test_annotate_is_lazy(self):
+        '''Lines are read only as annotations are consumed.'''
+        def lines():
+            yield "phral"
+            raise AssertionError("read too far")
+
+        self.assertEqual(next(annotate(lines(), self.form_index)).token, "phral")
+
+    def test_parallel_matches_single_process(self):
+        '''Worker processes produce the same rows in the same order.'''
+        lines = list(iter_example_translations(self.xml_path)) + ["phral dikhel", "", "le džuvľa"] * 3
+        single = list(annotated_lines(lines, "tsv", workers=1, xml_file_path=self.xml_path))
+        parallel = list(annotated_lines(lines, "tsv", workers=2, chunksize=2, xml_file_path=self.xml_path,
+                                        index_dir=self.tmp_dir.name))
+
+        self.assertEqual(parallel, single)
+        self.assertTrue(single[0].startswith("1\t0\tdikhav\tdikhel|pres|1|sg"))
+
 # class TestUserInterface(unittest.TestCase):
 #     def test_perform_search(self):
 #         # Add test cases for the perform_search function
@@ -1,15 +1,57 @@
 """
 This module defines a simple Tkinter-based user interface for the Roma Paradigm Generator.
 It allows users to enter a word, search for its paradigms, and displays the results.
+While typing, matching dictionary lemmas are suggested in a dropdown below the input field.
+Searches run on a background SearchWorker, so the window stays responsive while they run.
+
+The window is shown before the dictionary is loaded: the lexicon and the paradigm modules
+are imported and loaded by the worker thread, and searches made meanwhile wait for it.
 
 Usage:
 This module is intended to be used as the main entry point for the Roma Paradigm Generator application.
+
+Set ROMA_STARTUP_TIMING=1 (or =json) to print the time to first paint and to first result to
+stderr, or run with --startup-benchmark [WORD] to search for WORD, print the timings as JSON
+and exit. Set ROMA_PROFILE=PREFIX to profile the loading and the searches of the session
+(see profiling.py); the reports are written when the window is closed.
 """
 
+import time
+
+STARTED = time.perf_counter()
+
+import json
+import os
+import sys
 import tkinter as tk
-from search_handler import search_word
-from nouns import generate_noun_paradigms, format_noun_paradigms
-from verbs import process_verb
+from search_worker import SearchWorker
+
+SUGGESTION_COUNT = 8
+DEBOUNCE_MS = 150  # Requests within this delay are coalesced into one search
+POLL_MS = 50  # How often finished searches are collected from the worker
+BENCHMARK_WORD = "phral"
+
+
+class StartupTimer:
+    """Seconds from process start (module import) to named startup milestones."""
+
+    def __init__(self, started=STARTED):
+        self.started = started
+        self.marks = {}
+
+    def mark(self, name):
+        """Record the first occurrence of the milestone name."""
+        if name not in self.marks:
+            self.marks[name] = round(time.perf_counter() - self.started, 4)
+
+    def report(self, stream=sys.stderr, as_json=False):
+        """Write the milestones to stream as one line of text or JSON."""
+        if as_json:
+            stream.write(json.dumps(self.marks) + "\n")
+        else:
+            stream.write("Startup: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.marks.items()) + "\n")
+        stream.flush()
+
 
 def create_ui():
     """
@@ -41,9 +83,15 @@ def create_ui():
     search_button = tk.Button(input_frame, 
                               text="Search | Hľadať | Rodel", 
                               bg='#4FBCFF',
-                              command=lambda: perform_search(from_button=False, animacy=animacy_var.get()))
+                              command=lambda: perform_search(animacy=animacy_var.get()))
     search_button.grid(row=1, column=1)
 
+    # As-you-type suggestions, shown only while there are matches
+    suggestion_list = tk.Listbox(input_frame, width=50, height=SUGGESTION_COUNT, activestyle='none')
+    suggestion_list.bind('<<ListboxSelect>>', lambda event=None: select_suggestion(animacy_var.get()))
+    search_entry.bind('<KeyRelease>', update_suggestions)
+    search_entry.bind('<Escape>', lambda event=None: hide_suggestions())
+
     # Radiobuttons for animacy below the first line
     animacy_var = tk.StringVar(value="neživotné")  # Set default value
     animacy_frame = tk.Frame(root)
@@ -52,6 +100,10 @@ def create_ui():
     tk.Radiobutton(animacy_frame, text="Animate | Životné | Džide", variable=animacy_var, value="životné").pack(side=tk.LEFT)
     tk.Radiobutton(animacy_frame, text="Inanimate | Neživotné | Nadžide", variable=animacy_var, value="neživotné").pack(side=tk.LEFT)
 
+    # Busy indicator
+    status_label = tk.Label(root, text="", fg='#808080', font=("Helvetica", 10))
+    status_label.pack()
+
     
     # Result_text 
     result_text = tk.Text(root, 
@@ -69,11 +121,55 @@ def create_ui():
     # Set focus on the search entry
     search_entry.focus_set()
 
-    # Bind both the button click and Enter/Return key
-    root.bind('<Return>', lambda event=None: perform_search(event, from_button=False, animacy=animacy_var.get()))
-    search_button.bind('<Button-1>', lambda event=None: perform_search(event, from_button=True, animacy=animacy_var.get()))
+    # The button searches through its command; only Enter/Return needs a binding
+    root.bind('<Return>', lambda event=None: perform_search(event, animacy=animacy_var.get()))
+
+    return root, search_entry, result_text, animacy_var, suggestion_list, status_label
 
-    return root, search_entry, result_text, animacy_var
+
+def update_suggestions(event=None):
+    """
+    Refresh the suggestion dropdown with lemmas starting with the current input.
+
+    """
+    if event is not None and event.keysym in ('Return', 'Escape'):
+        return
+    if suggestion_lexicon is None:
+        # Never load the dictionary on the main thread: no suggestions until preload has
+        # finished, and none at all if it failed
+        return
+    suggestions = suggestion_lexicon.suggest(search_entry.get(), limit=SUGGESTION_COUNT)
+
+    suggestion_list.delete(0, tk.END)
+    if not suggestions:
+        hide_suggestions()
+        return
+    for suggestion in suggestions:
+        suggestion_list.insert(tk.END, suggestion)
+    suggestion_list.config(height=len(suggestions))
+    suggestion_list.grid(row=2, column=0, sticky='we')
+
+
+def hide_suggestions():
+    """
+    Hide the suggestion dropdown.
+
+    """
+    suggestion_list.grid_remove()
+
+
+def select_suggestion(animacy):
+    """
+    Copy the selected suggestion into the search entry and search for it.
+
+    """
+    selection = suggestion_list.curselection()
+    if not selection:
+        return
+    search_entry.delete(0, tk.END)
+    search_entry.insert(0, suggestion_list.get(selection[0]))
+    hide_suggestions()
+    perform_search(animacy=animacy)
 
 
 def update_result_text(result_message):
@@ -87,47 +183,149 @@ def update_result_text(result_message):
     result_text.config(state='disabled')  # Disable the Text widget for editing
 
 
-def perform_search(event=None, from_button=False, animacy="neživotné"):
+def preload(report):
+    """
+    Import the paradigm modules and load the lexicon. Runs on the search worker thread.
+
     """
-    Perform a search based on user input and update the result text.
+    global suggestion_lexicon
+    report("Loading dictionary... | Načítavam slovník... | Ladav o lavero...")
+    from search_handler import get_lexicon
+    lexicon = get_lexicon()
+    # Sort the keys for suggestions here rather than on the main thread at the first keystroke
+    lexicon.sorted_keys
+    suggestion_lexicon = lexicon
+    report("Preparing paradigms... | Pripravujem paradigmy...")
+    import nouns, verbs
+    report(f"{len(lexicon)} words loaded | Načítaných slov: {len(lexicon)}")
+
 
+def render_search(search_term, animacy="neživotné"):
     """
-    search_term = search_entry.get()
+    Search for search_term and return the text to display. Runs on the search worker thread.
+
+    """
+    from search_handler import search_word
+    from nouns import cached_noun_paradigms, format_noun_paradigms
+    from verbs import process_verb
+
     search_results = search_word(search_term)
 
-    if "word" in search_results:
+    if isinstance(search_results, dict):
         word = search_results["word"]
         part_of_speech = search_results["part_of_speech"]
-        
 
         if part_of_speech == "množné":
-            update_result_text("Ma ruš! No paradigms for plural forms available.")
-
+            return "Ma ruš! No paradigms for plural forms available."
 
         elif part_of_speech == "noun":
             gender = search_results["gender"]
-            paradigms = generate_noun_paradigms(word, gender, animacy=animacy)
-           
-            update_result_text("")
+            paradigms = cached_noun_paradigms(word, gender, animacy)
 
             # Display paradigms
-            formatted_paradigms = "Singulár:\n\n" + format_noun_paradigms(paradigms["Singulár"]) + "\n\nPlurál:\n\n" + format_noun_paradigms(paradigms["Plurál"])
+            return "Singulár:\n\n" + format_noun_paradigms(paradigms["Singulár"]) + "\n\nPlurál:\n\n" + format_noun_paradigms(paradigms["Plurál"])
 
-            update_result_text(formatted_paradigms)
-           
-        
         elif part_of_speech == "verb":
-            formatted_paradigms = process_verb(word)
-            update_result_text("")
-            update_result_text(formatted_paradigms)
-        
+            return process_verb(word)
+
         else:
-            update_result_text(f"Ma ruš! No paradigms for {word} available.")
-    
+            return f"Ma ruš! No paradigms for {word} available."
+
+    else:
+        return f"Result: {search_results}"
+
+
+def perform_search(event=None, animacy="neživotné"):
+    """
+    Schedule a search for the user input. Requests arriving within DEBOUNCE_MS are coalesced.
+
+    """
+    global pending_search
+    hide_suggestions()
+    if pending_search is not None:
+        root.after_cancel(pending_search)
+    pending_search = root.after(DEBOUNCE_MS, start_search, animacy)
+
+
+def start_search(animacy):
+    """
+    Hand the current input to the search worker, superseding any running search.
+
+    """
+    global pending_search
+    pending_search = None
+    worker.submit(search_entry.get(), animacy)
+    if worker.ready:
+        status_label.config(text="Searching... | Hľadám... | Rodav...")
+
+
+def poll_search_results():
+    """
+    Show finished search results and keep the busy indicator up to date.
+
+    """
+    global preload_error_shown
+    if worker.ready:
+        timer.mark("lexicon_loaded")
+        if worker.error is not None and not preload_error_shown:
+            # Shown once; searches retry the load on the worker thread
+            preload_error_shown = True
+            update_result_text(worker.progress)
+
+    results = worker.poll()
+    for _, result_message in results:
+        update_result_text(result_message)
+    if results and "first_result" not in timer.marks:
+        timer.mark("first_result")
+        if benchmark_word is not None:
+            timer.report(sys.stdout, as_json=True)
+            root.destroy()
+            return
+        if os.environ.get("ROMA_STARTUP_TIMING"):
+            timer.report(as_json=os.environ["ROMA_STARTUP_TIMING"] == "json")
+
+    if not worker.ready:
+        status_label.config(text=worker.progress)
+    elif worker.busy or pending_search is not None:
+        status_label.config(text="Searching... | Hľadám... | Rodav...")
     else:
-        update_result_text(f"Result: {search_results}")
+        status_label.config(text=worker.progress)
+    root.after(POLL_MS, poll_search_results)
+
+
+def parse_arguments(argv=None):
+    """
+    Return the startup benchmark word, or None when the application runs normally.
+
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--startup-benchmark":
+        return argv[1] if len(argv) > 1 else BENCHMARK_WORD
+    return None
 
 
 if __name__ == "__main__":
-    root, search_entry, result_text, animacy_var = create_ui()
-    root.mainloop()
\ No newline at end of file
+    timer = StartupTimer()
+    benchmark_word = parse_arguments()
+    # Set by preload on the search worker thread
+    suggestion_lexicon = None
+    profiler = None
+    if os.environ.get("ROMA_PROFILE"):
+        from profiling import Profiler
+        profiler = Profiler().start(current_thread=False)
+        worker = SearchWorker(profiler.wrap(render_search), initializer=profiler.wrap(preload))
+    else:
+        worker = SearchWorker(render_search, initializer=preload)
+    pending_search = None
+    preload_error_shown = False
+
+    root, search_entry, result_text, animacy_var, suggestion_list, status_label = create_ui()
+    root.after_idle(timer.mark, "first_paint")
+    if benchmark_word is not None:
+        search_entry.insert(0, benchmark_word)
+        worker.submit(benchmark_word, animacy_var.get())
+    poll_search_results()
+    root.mainloop()
+    if profiler is not None:
+        profiler.stop()
+        print(f"Profile written to {', '.join(profiler.save(os.environ['ROMA_PROFILE']))}", file=sys.stderr)
@@ -0,0 +1,203 @@
+"""
+This module conjugates and declines many words at once with NumPy.
+
+conjugate_batch and decline_batch group their input by conjugation class or noun stem
+class, slice the stems of each group as arrays and build every cell column with
+vectorized string operations against ending tables flattened once from endings_dict
+and the declension templates. The result is columnar (ParadigmColumns) instead of one
+nested dict per word.
+
+This module requires NumPy (see requirements.txt); the rest of the application does not.
+"""
+
+import numpy as np
+
+from verbs_endings import endings_dict
+from declension import CASES, NUMBERS, ANIMATE, TEMPLATES, classify
+from search_handler import SPECIAL_CHARACTERS_TABLE
+
+TENSES = ['pres', 'fut', 'impf', 'perf', 'cond_pres', 'cond_perf']
+PERSONS = [1, 2, 3]
+VERB_NUMBERS = ['sg', 'pl']
+
+VERB_COLUMNS = [(tense, person, number) for tense in TENSES for person in PERSONS for number in VERB_NUMBERS]
+VERB_COLUMNS += [('imper', 2, number) for number in VERB_NUMBERS]
+NOUN_COLUMNS = [(number, case) for number in NUMBERS for case in CASES]
+
+# Last letter of a class 2 present root -> perfect root suffix (see verbs.define_perf_root)
+PERF_SUFFIXES_CLASS_2 = {letter: suffix for letters, suffix in
+                         (('lnrv', 'ď'), ('čgjkhm', 'ľ'), ('d', 'ň'), ('sš', 'ť'), ('ť', 'iľ'))
+                         for letter in letters}
+IMPERATIVE_I_VERBS = ('chuťel', 'ušťel', 'urel')
+
+
+def _verb_templates(conj_class):
+    '''
+    Flatten endings_dict for one conjugation class into (root, ending) per VERB_COLUMNS entry,
+    following verbs.generate_verb_paradigms. root is 'pres', 'pres_short', 'perf' or 'perf_3pl';
+    the singular imperative ending is None because it depends on the verb.
+    '''
+    endings = endings_dict[conj_class]
+    templates = []
+    for tense, person, number in VERB_COLUMNS:
+        if tense == 'imper':
+            plural_endings = {1: 'n!', 2: 'en!', 3: 'on!'}
+            if number == 'pl':
+                templates.append(('pres', plural_endings[conj_class]))
+            else:
+                templates.append(('pres', 'uv!' if conj_class == 3 else None if conj_class == 2 else '!'))
+            continue
+
+        if tense == 'cond_pres':
+            ending = endings['impf'][person][number]
+        elif tense == 'cond_perf':
+            ending = endings['perf'][person][number]
+            if person == 3:
+                ending = ending[:-1] + 'has' if number == 'sg' else ending + 'has'
+            else:
+                ending = ending + 'as'
+        else:
+            ending = endings[tense][person][number]
+
+        if tense in ('pres', 'fut', 'impf', 'cond_pres') and conj_class == 1:
+            root = 'pres_short'
+        elif tense in ('perf', 'cond_perf'):
+            root = 'perf_3pl' if (person, number) == (3, 'pl') else 'perf'
+        else:
+            root = 'pres'
+        templates.append((root, ending))
+    return templates
+
+
+VERB_TEMPLATES = {conj_class: _verb_templates(conj_class) for conj_class in endings_dict}
+
+
+def strip_end(words, count):
+    '''Return words without their last count characters (vectorized word[:-count]).'''
+    if count == 0:
+        return words
+    if hasattr(np, "strings") and hasattr(np.strings, "slice"):
+        return np.strings.slice(words, 0, -count)
+    return np.array([word[:-count] for word in words.tolist()], dtype=str)
+
+
+def last_char(words):
+    '''Return the last character of every word ('' for empty words).'''
+    if hasattr(np, "strings") and hasattr(np.strings, "slice"):
+        return np.strings.slice(words, -1, None)
+    return np.array([word[-1:] for word in words.tolist()], dtype=str)
+
+
+class ParadigmColumns:
+    """
+    Columnar paradigms: forms[i, j] is the form of lemmas[i] in the cell columns[j].
+
+    Columns are (tense, person, number) for verbs and (number, case) for nouns.
+    """
+
+    def __init__(self, lemmas, columns, forms):
+        self.lemmas = lemmas
+        self.columns = columns
+        self.forms = forms
+        self._column_index = {column: index for index, column in enumerate(columns)}
+
+    def __len__(self):
+        return len(self.lemmas)
+
+    def column(self, key):
+        """Return the forms of every lemma in one cell."""
+        return self.forms[:, self._column_index[key]]
+
+    def paradigms(self, index):
+        """Return the paradigms of one lemma as nested dicts, like the scalar functions."""
+        paradigms = {}
+        for column, form in zip(self.columns, self.forms[index].tolist()):
+            level = paradigms
+            for key in column[:-1]:
+                level = level.setdefault(key, {})
+            level[column[-1]] = form
+        return paradigms
+
+
+def _assemble(lemmas, columns, groups):
+    # groups: list of (row indices, list of column arrays in `columns` order)
+    width = max([1] + [column.dtype.itemsize // 4 for _, group_columns in groups for column in group_columns])
+    forms = np.zeros((len(lemmas), len(columns)), dtype=f"<U{width}")
+    for rows, group_columns in groups:
+        forms[rows] = np.stack(group_columns, axis=1)
+    return ParadigmColumns(lemmas, columns, forms)
+
+
+def _conjugation_classes(verbs):
+    classes = np.full(len(verbs), 3)
+    classes[np.char.endswith(verbs, 'el')] = 2
+    classes[np.char.endswith(verbs, 'al')] = 1
+    return classes
+
+
+def _perf_roots(pres_roots, conj_class):
+    if conj_class == 1:
+        return np.char.add(pres_roots, 'nď')
+    if conj_class == 3:
+        return np.char.add(pres_roots, 'iľ')
+    letters = last_char(pres_roots).tolist()
+    suffixes = np.array([PERF_SUFFIXES_CLASS_2.get(letter, '') for letter in letters], dtype=str)
+    known = np.array([letter in PERF_SUFFIXES_CLASS_2 for letter in letters], dtype=bool)
+    return np.where(known, np.char.add(pres_roots, suffixes), 'xxx')
+
+
+def conjugate_batch(verbs):
+    '''Conjugate verbs (an iterable of single-word verbs) into ParadigmColumns over VERB_COLUMNS.'''
+    verbs = np.asarray(list(verbs), dtype=str)
+    classes = _conjugation_classes(verbs)
+    groups = []
+    for conj_class, templates in VERB_TEMPLATES.items():
+        rows = np.nonzero(classes == conj_class)[0]
+        if len(rows) == 0:
+            continue
+        group = verbs[rows]
+        pres = strip_end(group, 1 if conj_class == 1 else 2)
+        perf = _perf_roots(pres, conj_class)
+        roots = {
+            'pres': pres,
+            'pres_short': strip_end(pres, 1),
+            'perf': perf,
+            'perf_3pl': np.char.add(strip_end(perf, 1), np.char.translate(last_char(perf), SPECIAL_CHARACTERS_TABLE)),
+        }
+        if conj_class == 2:
+            imperative_sg = np.where(np.char.endswith(group, 'del'), 'e!',
+                                     np.where(np.isin(group, IMPERATIVE_I_VERBS), 'i!', '!'))
+        group_columns = [
+            np.char.add(roots[root], imperative_sg if ending is None else ending)
+            for root, ending in templates
+        ]
+        groups.append((rows, group_columns))
+    return _assemble(verbs, VERB_COLUMNS, groups)
+
+
+def decline_batch(nouns, genders, animacy):
+    '''
+    Decline nouns into ParadigmColumns over NOUN_COLUMNS.
+
+    genders and animacy are sequences aligned with nouns, or a single value for all nouns.
+    '''
+    nouns = np.asarray(list(nouns), dtype=str)
+    genders = np.broadcast_to(np.asarray(genders, dtype=str), nouns.shape)
+    animate = np.broadcast_to(np.asarray(animacy, dtype=str) == ANIMATE, nouns.shape)
+    classes = np.array([classify(noun, gender) for noun, gender in zip(nouns.tolist(), genders.tolist())],
+                       dtype=object)
+
+    groups = []
+    for (stem_class, is_animate), templates in TEMPLATES.items():
+        rows = np.nonzero((classes == stem_class) & (animate == is_animate))[0]
+        if len(rows) == 0:
+            continue
+        group = nouns[rows]
+        stems = {}
+        group_columns = []
+        for strip, suffix in templates:
+            if strip not in stems:
+                stems[strip] = strip_end(group, strip)
+            group_columns.append(np.char.add(stems[strip], suffix))
+        groups.append((rows, group_columns))
+    return _assemble(nouns, NOUN_COLUMNS, groups)
@@ -1,5 +1,8 @@
 from verbs_endings import endings_dict, tense_mapping
 from search_handler import replace_special_characters
+from paradigm_cache import memoize
+from paradigm_types import VerbParadigm
+from metrics import timed
 import re
 
 def contains_valid_verb(input_string):
@@ -72,6 +75,7 @@ def is_conditional(tense):
     return False
     
 
+@timed("generate_verb_paradigms")
 def generate_verb_paradigms(verb):
 
     conj_class = determine_conjugation_class(verb)
@@ -168,6 +172,16 @@ def generate_verb_paradigms(verb):
     return paradigms
 
 
+@timed("cached_verb_paradigms")
+@memoize("verb_paradigms", convert=None)
+def cached_verb_paradigms(verb):
+    """
+    Return generate_verb_paradigms(verb) from the paradigm cache as a read-only VerbParadigm.
+    """
+    return VerbParadigm.from_dict(generate_verb_paradigms(verb))
+
+
+@timed("format_verb_paradigms")
 def format_verb_paradigms(verb_paradigms):
     formatted_output = ""
 
@@ -204,6 +218,9 @@ def contains_standalone_pes(input_string):
 
 
 def replace_pes_forms(paradigms):
+    '''
+    Return a copy of paradigms where the reflexive 'pes' agrees with the person and number.
+    '''
     # Define pes_forms within the function
     pes_forms = {
         1: {'sg': 'man', 'pl': 'amen'},
@@ -211,15 +228,19 @@ def replace_pes_forms(paradigms):
         3: {'sg': 'pes', 'pl': 'pen'}
     }
 
+    updated_paradigms = {}
+
     # Iterate through each tense, person, and number in the paradigms dictionary
     for tense, tense_data in paradigms.items():
+        updated_paradigms[tense] = {}
         for person, person_data in tense_data.items():
+            updated_paradigms[tense][person] = {}
             for number, pes_string in person_data.items():
                 # Use regular expression to find standalone instances of 'pes'
                 updated_string = re.sub(r'\bpes\b', lambda match: pes_forms[person][number], pes_string)
-                paradigms[tense][person][number] = updated_string
+                updated_paradigms[tense][person][number] = updated_string
 
-    return paradigms
+    return updated_paradigms
 
 
 def replace_neutral_with_forms(input_string, verb, paradigms):
@@ -247,22 +268,31 @@ def replace_neutral_with_forms(input_string, verb, paradigms):
     return modified_forms
 
 
-def process_verb(input_string):
+def verb_paradigms(input_string):
     '''
-    Function that integrates all helper functions to generate paradigms for input_string
+    Return the paradigms for a verb or a phrase containing a verb, or None if input_string has no verb.
+
+    Paradigms of single verbs come from the paradigm cache and are read-only.
     '''
     if is_valid_verb(input_string):
-                paradigms = generate_verb_paradigms(input_string)
-                formatted_paradigms = format_verb_paradigms(paradigms)
-                return formatted_paradigms
+        return cached_verb_paradigms(input_string)
     elif contains_valid_verb(input_string):
-                verb = find_word_ending_with_l(input_string)
-                paradigms = generate_verb_paradigms(verb)
-                paradigms = replace_neutral_with_forms(input_string, verb, paradigms)
-                if contains_standalone_pes(input_string):
-                    paradigms = replace_pes_forms(paradigms)
-                formatted_paradigms = format_verb_paradigms(paradigms)
-                return formatted_paradigms
+        verb = find_word_ending_with_l(input_string)
+        paradigms = cached_verb_paradigms(verb)
+        paradigms = replace_neutral_with_forms(input_string, verb, paradigms)
+        if contains_standalone_pes(input_string):
+            paradigms = replace_pes_forms(paradigms)
+        return paradigms
+    return None
+
+
+def process_verb(input_string):
+    '''
+    Function that integrates all helper functions to generate paradigms for input_string
+    '''
+    paradigms = verb_paradigms(input_string)
+    if paradigms is not None:
+        return format_verb_paradigms(paradigms)
     
 
 if __name__ == '__main__':
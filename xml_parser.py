@@ -2,17 +2,44 @@
 This module parses the data from SRO.xml and returns the root element.
 
 SRO.xml file is expected to be in the 'data' directory located in the same directory as this module.
+
+Large dictionaries can be read with iter_senses, which streams one record per Sense
+and discards the parsed elements, so memory use does not grow with the file size.
+iter_lemma_chunks splits the file into Lemma elements with a content hash each, so a changed
+file can be compared Lemma by Lemma and only the changed ones parsed with parse_lemma.
+
+Data compiled from the XML (e.g. the search index) can be stored next to the XML file
+with load_compiled, which rebuilds it whenever the XML file changes. For packaged builds
+the same data can be written once into a versioned artifact (write_artifact), which
+read_artifact loads without touching the XML file after verifying its checksum.
 """
 
+import hashlib
 import os
+import pickle
+import re
 import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+from metrics import timed
+
+
+SenseRecord = namedtuple("SenseRecord", ["lemma_sk", "lemma_rom", "pos_rom", "sense_number"])
+LEMMA_START = re.compile(rb"<Lemma[\s>]")
+LEMMA_END = b"</Lemma>"
 
 
+def default_xml_path():
+    '''Return the path of the bundled SRO.xml'''
+    data_dir = os.path.join(os.path.dirname(__file__), "data")
+    return os.path.join(data_dir, "SRO.xml")
+
+
+@timed("parse_xml_data")
 def parse_xml_data(xml_file_path=None):
     '''Read the data form SRO.xml and return the root'''
     if xml_file_path is None:
-        data_dir = os.path.join(os.path.dirname(__file__), "data")
-        xml_file_path = os.path.join(data_dir, "SRO.xml")
+        xml_file_path = default_xml_path()
     try:
         tree = ET.parse(xml_file_path)
         root = tree.getroot()
@@ -21,4 +48,252 @@ def parse_xml_data(xml_file_path=None):
         raise FileNotFoundError(f"XML file not found at: {xml_file_path}") from exc
     except (ET.ParseError, IOError, PermissionError) as e:
         raise ValueError(f"Error parsing XML file at {xml_file_path}: {e}") from e
-    
\ No newline at end of file
+
+
+def _child_text(element, path):
+    child = element.find(path)
+    return None if child is None else child.text
+
+
+def iter_senses(xml_file_path=None):
+    '''
+    Stream SenseRecord(lemma_sk, lemma_rom, pos_rom, sense_number) tuples from SRO.xml.
+
+    Values are the raw element texts (None when the element is missing).
+    Every Sense is cleared once its record is built and the root is emptied after
+    each Lemma, so only the Lemma being read is ever held in memory.
+    '''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    try:
+        context = ET.iterparse(xml_file_path, events=("start", "end"))
+        _, root = next(context)
+        lemma_sk = None
+        for event, element in context:
+            if event != "end":
+                continue
+            if element.tag == "lemmaSK":
+                lemma_sk = element.text
+            elif element.tag == "Sense":
+                yield SenseRecord(
+                    lemma_sk,
+                    _child_text(element, "./Definition/lemmaROM"),
+                    _child_text(element, "./posROM"),
+                    _child_text(element, "./Sense.SenseNumber"),
+                )
+                element.clear()
+            elif element.tag == "Lemma":
+                lemma_sk = None
+                root.clear()
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"XML file not found at: {xml_file_path}") from exc
+    except (ET.ParseError, IOError, PermissionError) as e:
+        raise ValueError(f"Error parsing XML file at {xml_file_path}: {e}") from e
+
+
+def iter_example_translations(xml_file_path=None):
+    '''Stream the stripped Example.Translation texts (the Roma example sentences) of SRO.xml.'''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    try:
+        context = ET.iterparse(xml_file_path, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            if event != "end":
+                continue
+            if element.tag == "Example.Translation" and element.text and element.text.strip():
+                yield element.text.strip()
+            elif element.tag == "Lemma":
+                root.clear()
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"XML file not found at: {xml_file_path}") from exc
+    except (ET.ParseError, IOError, PermissionError) as e:
+        raise ValueError(f"Error parsing XML file at {xml_file_path}: {e}") from e
+
+
+def iter_lemma_chunks(xml_file_path=None):
+    '''
+    Yield (content hash, XML bytes) of every Lemma element of SRO.xml in document order.
+
+    The elements are found by searching for their tags instead of parsing, so hashing a
+    large dictionary is fast; identical Lemma elements have the same 16-byte BLAKE2 hash.
+    '''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    try:
+        with open(xml_file_path, "rb") as xml_file:
+            data = xml_file.read()
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"XML file not found at: {xml_file_path}") from exc
+    position = 0
+    while True:
+        match = LEMMA_START.search(data, position)
+        if match is None:
+            return
+        position = data.find(LEMMA_END, match.start())
+        if position < 0:
+            return
+        position += len(LEMMA_END)
+        chunk = data[match.start():position]
+        yield hashlib.blake2b(chunk, digest_size=16).digest(), chunk
+
+
+def parse_lemma(chunk):
+    '''Return the SenseRecord tuples of one Lemma element given as XML bytes, like iter_senses.'''
+    try:
+        element = ET.fromstring(chunk)
+    except ET.ParseError as e:
+        raise ValueError(f"Error parsing Lemma element: {e}") from e
+    lemma_sk = _child_text(element, "./lemmaSK")
+    return tuple(
+        SenseRecord(
+            lemma_sk,
+            _child_text(sense, "./Definition/lemmaROM"),
+            _child_text(sense, "./posROM"),
+            _child_text(sense, "./Sense.SenseNumber"),
+        )
+        for sense in element.iter("Sense")
+    )
+
+
+def cache_path(xml_file_path, name):
+    '''Return the path of the compiled cache called name for xml_file_path'''
+    return f"{xml_file_path}.{name}.cache"
+
+
+def file_digest(file_path):
+    '''Return the SHA-256 hex digest of a file'''
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as data_file:
+        for block in iter(lambda: data_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_cache_header(cache_file):
+    try:
+        return pickle.load(cache_file)
+    except Exception:
+        return None
+
+
+def _write_cache(cache_file_path, header, data=None, payload=None):
+    # payload, when given, is data already pickled (e.g. read back from the cache)
+    temp_path = f"{cache_file_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as cache_file:
+            pickle.dump(header, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            if payload is None:
+                pickle.dump(data, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                cache_file.write(payload)
+        os.replace(temp_path, cache_file_path)
+    except OSError:
+        # The data directory may be read-only (e.g. inside a packaged executable)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _file_state(stat):
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_compiled(name, builder, xml_file_path=None, version=1):
+    '''
+    Return builder(xml_file_path), using a pickle cache stored next to the XML file.
+
+    The cache is keyed by the XML file's size, mtime and SHA-256 digest. When only
+    the mtime differs the digest decides, so touching the file does not force a rebuild;
+    the header is then rewritten with the new mtime, so the file is hashed only once.
+    A cache that cannot be read is rebuilt, and a cache is not written when the XML file
+    changed while builder was reading it. Bump version whenever the structure returned
+    by builder changes.
+    '''
+    if xml_file_path is None:
+        xml_file_path = default_xml_path()
+    try:
+        stat = os.stat(xml_file_path)
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"XML file not found at: {xml_file_path}") from exc
+
+    cache_file_path = cache_path(xml_file_path, name)
+    digest = None
+    try:
+        with open(cache_file_path, "rb") as cache_file:
+            header = _read_cache_header(cache_file)
+            if (isinstance(header, dict) and header.get("version") == version
+                    and header.get("size") == stat.st_size):
+                if header.get("mtime_ns") == stat.st_mtime_ns:
+                    return pickle.load(cache_file)
+                digest = file_digest(xml_file_path)
+                if digest == header.get("sha256"):
+                    payload = cache_file.read()
+                    data = pickle.loads(payload)
+                    _write_cache(cache_file_path, dict(header, mtime_ns=stat.st_mtime_ns), payload=payload)
+                    return data
+    except Exception:
+        # Missing, truncated or corrupt cache: rebuild it
+        pass
+
+    header = {
+        "version": version,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest or file_digest(xml_file_path),
+    }
+    data = builder(xml_file_path)
+    try:
+        unchanged = _file_state(os.stat(xml_file_path)) == _file_state(stat)
+    except OSError:
+        unchanged = False
+    if unchanged:
+        _write_cache(cache_file_path, header, data)
+    return data
+
+
+def artifact_path(name, data_dir=None):
+    '''Return the path of the compiled artifact called name in the data directory'''
+    if data_dir is None:
+        data_dir = os.path.dirname(default_xml_path())
+    return os.path.join(data_dir, f"SRO.{name}.artifact")
+
+
+def write_artifact(file_path, name, data, version=1, source_digest=None):
+    '''
+    Write data as a compiled artifact and return its header.
+
+    The header records name, version, the SHA-256 of the pickled payload and,
+    optionally, the digest of the XML file the data was compiled from.
+    '''
+    payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    header = {
+        "name": name,
+        "version": version,
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "source_sha256": source_digest,
+    }
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as artifact_file:
+        pickle.dump(header, artifact_file, protocol=pickle.HIGHEST_PROTOCOL)
+        artifact_file.write(payload)
+    os.replace(temp_path, file_path)
+    return header
+
+
+def read_artifact(file_path, name, version=1):
+    '''
+    Return the data stored in a compiled artifact.
+
+    Raises ValueError when the artifact has another name or version or its checksum does not match.
+    '''
+    try:
+        with open(file_path, "rb") as artifact_file:
+            header = _read_cache_header(artifact_file)
+            payload = artifact_file.read()
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"Artifact not found at: {file_path}") from exc
+    if not isinstance(header, dict) or header.get("name") != name or header.get("version") != version:
+        raise ValueError(f"Artifact at {file_path} is not a {name} artifact of version {version}")
+    if hashlib.sha256(payload).hexdigest() != header.get("sha256"):
+        raise ValueError(f"Artifact at {file_path} is corrupted: checksum mismatch")
+    return pickle.loads(payload)